@@ -225,7 +225,7 @@ import pyffi.object_models
 import pyffi.object_models.xml
 import pyffi.utils.mathutils
 import pyffi.utils.tangentspace
-from pyffi.object_models.xml.basic import BasicBase
+from pyffi.object_models.xml.basic import BasicBase, ChangeCounter
 from pyffi.utils.graph import EdgeFilter
 
 class _MetaCgfFormat(pyffi.object_models.xml.MetaFileFormat):
@@ -377,6 +377,7 @@ class CgfFormat(pyffi.object_models.xml.FileFormat, metaclass=_MetaCgfFormat):
             :param value: The value to assign.
             :type value: L{CgfFormat.Chunk}
             """
+            ChangeCounter.count += 1
             if value == None:
                 self._value = None
             else:
@@ -142,7 +142,7 @@ import pyffi.object_models
 import pyffi.object_models.common
 import pyffi.object_models.xml
 import pyffi.object_models.xml.struct_
-from pyffi.object_models.xml.basic import BasicBase
+from pyffi.object_models.xml.basic import BasicBase, ChangeCounter
 from pyffi.utils.graph import EdgeFilter
 
 
@@ -183,6 +183,7 @@ class KfmFormat(pyffi.object_models.xml.FileFormat):
             return self.__value
 
         def set_value(self, value):
+            ChangeCounter.count += 1
             if str(value).startswith(";Gamebryo KFM File Version "):
                 self.__value = value
             else:
@@ -348,6 +348,8 @@ end
 #
 # ***** END LICENSE BLOCK *****
 
+import copy
+import io
 from itertools import repeat, chain
 import logging
 import math # math.pi
@@ -372,7 +374,7 @@ import pyffi.utils.quickhull
 # XXX convert the following to absolute imports
 from pyffi.object_models.editable import EditableBoolComboBox
 from pyffi.utils.graph import EdgeFilter
-from pyffi.object_models.xml.basic import BasicBase
+from pyffi.object_models.xml.basic import BasicBase, ChangeCounter
 from pyffi.object_models.xml.struct_ import StructBase
 
 
@@ -440,6 +442,7 @@ class NifFormat(FileFormat):
             return self._value
 
         def set_value(self, value):
+            ChangeCounter.count += 1
             if isinstance(value, str):
                 if value.lower() == 'false':
                     self._value = False
@@ -497,6 +500,8 @@ class NifFormat(FileFormat):
             return self._value
 
         def set_value(self, value):
+            ChangeCounter.count += 1
+            ChangeCounter.link_count += 1
             if value is None:
                 self._value = None
             else:
@@ -576,8 +581,11 @@ class NifFormat(FileFormat):
             else:
                 return []
 
+        def get_link_slots(self, data=None):
+            return [self]
+
         def replace_global_node(self, oldbranch, newbranch,
-                                edge_filter=EdgeFilter()):
+                                edge_filter=EdgeFilter(), visited=None):
             """
             >>> from pyffi.formats.nif import NifFormat
             >>> x = NifFormat.NiNode()
@@ -601,8 +609,15 @@ class NifFormat(FileFormat):
                 # set_value takes care of template type
                 self.set_value(newbranch)
                 #print("replacing", repr(oldbranch), "->", repr(newbranch))
-            if self.get_value() is not None:
-                self.get_value().replace_global_node(oldbranch, newbranch)
+            value = self.get_value()
+            if visited is None:
+                visited = set()
+            if value is not None and id(value) not in visited:
+                # shared blocks are only visited once
+                visited.add(id(value))
+                value.replace_global_node(oldbranch, newbranch,
+                                          edge_filter=edge_filter,
+                                          visited=visited)
 
         def get_detail_display(self):
             # return the node itself, if it is not None
@@ -623,6 +638,7 @@ class NifFormat(FileFormat):
             return self._value() if self._value is not None else None
 
         def set_value(self, value):
+            ChangeCounter.count += 1
             if value is None:
                 self._value = None
             else:
@@ -644,7 +660,7 @@ class NifFormat(FileFormat):
             return None
 
         def replace_global_node(self, oldbranch, newbranch,
-                              edge_filter=EdgeFilter()):
+                              edge_filter=EdgeFilter(), visited=None):
             # overridden to avoid infinite recursion
             if self.get_value() is oldbranch:
                 self.set_value(newbranch)
@@ -682,6 +698,7 @@ class NifFormat(FileFormat):
             return self._value
 
         def set_value(self, value):
+            ChangeCounter.count += 1
             self._value = pyffi.object_models.common._as_bytes(value).rstrip('\x0a'.encode("ascii"))
 
         def __str__(self):
@@ -848,6 +865,7 @@ class NifFormat(FileFormat):
             return self._value
 
         def set_value(self, value):
+            ChangeCounter.count += 1
             val = pyffi.object_models.common._as_bytes(value)
             if len(val) > 254:
                 raise ValueError('string too long')
@@ -877,6 +895,11 @@ class NifFormat(FileFormat):
     class string(SizedString):
         _has_strings = True
 
+        def set_value(self, value):
+            # blocks are indexed by name, see Data.find_by_name
+            ChangeCounter.link_count += 1
+            pyffi.object_models.common.SizedString.set_value(self, value)
+
         def get_size(self, data=None):
             ver = data.version if data else -1
             if ver >= 0x14010003:
@@ -907,12 +930,14 @@ class NifFormat(FileFormat):
                         struct.pack(data._byte_order + 'i', -1))
                 else:
                     try:
-                        stream.write(struct.pack(
-                            data._byte_order + 'i',
-                            data._string_list.index(self._value)))
-                    except ValueError:
+                        if data._string_index_dct is not None:
+                            index = data._string_index_dct[self._value]
+                        else:
+                            index = data._string_list.index(self._value)
+                    except (KeyError, ValueError):
                         raise ValueError(
                             "string '%s' not in string list" % self._value)
+                    stream.write(struct.pack(data._byte_order + 'i', index))
             else:
                 stream.write(struct.pack(data._byte_order + 'I',
                                          len(self._value)))
@@ -946,6 +971,7 @@ class NifFormat(FileFormat):
             return self._value
 
         def set_value(self, value):
+            ChangeCounter.count += 1
             self._value = pyffi.object_models.common._as_bytes(value)
 
         def get_size(self, data=None):
@@ -978,6 +1004,7 @@ class NifFormat(FileFormat):
             return self._value
 
         def set_value(self, value):
+            ChangeCounter.count += 1
             assert(isinstance(value, list))
             if value:
                 size1 = len(value[0])
@@ -1090,10 +1117,13 @@ class NifFormat(FileFormat):
         _link_stack = None
         _block_dct = None
         _string_list = None
+        _string_index_dct = None
         _block_index_dct = None
+        _name_type_index = None
 
         class VersionUInt(pyffi.object_models.common.UInt):
             def set_value(self, value):
+                ChangeCounter.count += 1
                 if value is None:
                     self._value = None
                 else:
@@ -1246,12 +1276,195 @@ class NifFormat(FileFormat):
 
         def replace_global_node(self, oldbranch, newbranch,
                               edge_filter=EdgeFilter()):
+            self.replace_global_nodes([(oldbranch, newbranch)])
+
+        def replace_global_nodes(self, replacements):
+            """Replace many blocks at once, in a single pass over the tree,
+            in which every block is visited only once. Replacements are
+            chained: if a block is replaced by a block that is replaced
+            too, then the last replacement is used.
+
+            >>> x = NifFormat.NiNode()
+            >>> y = NifFormat.NiNode()
+            >>> z = NifFormat.NiNode()
+            >>> prop = NifFormat.NiMaterialProperty()
+            >>> x.add_child(y)
+            >>> x.add_child(z)
+            >>> x.add_property(prop)
+            >>> y.add_property(prop)
+            >>> data = NifFormat.Data()
+            >>> data.roots = [x]
+            >>> data.replace_global_nodes([(y, z), (prop, None), (z, x)])
+            >>> [child is x for child in x.children]
+            [True, True]
+            >>> x.properties[0] is None, y.properties[0] is prop
+            (True, True)
+
+            :param replacements: Pairs of a block and the block which
+                replaces it, or ``None`` to remove the references to it.
+                Blocks are not hashable, so pairs are used instead of a
+                dictionary.
+            :type replacements: ``list`` of ``tuple``
+            """
+            mapping = dict((id(oldbranch), newbranch)
+                           for oldbranch, newbranch in replacements)
+            replacements = {}
+            for oldid, newbranch in mapping.items():
+                # follow chains of replacements, but not cycles
+                seen = set([oldid])
+                while (newbranch is not None and id(newbranch) not in seen
+                       and id(newbranch) in mapping):
+                    seen.add(id(newbranch))
+                    newbranch = mapping[id(newbranch)]
+                replacements[oldid] = newbranch
             for i, root in enumerate(self.roots):
-                if root is oldbranch:
-                    self.roots[i] = newbranch
-                else:
-                    root.replace_global_node(oldbranch, newbranch,
-                                           edge_filter=edge_filter)
+                if id(root) in replacements:
+                    self.roots[i] = replacements[id(root)]
+            # walking the slots applies the replacements
+            for slot in self._get_link_slots(replacements):
+                pass
+
+        def get_ref_index(self):
+            """Index all references to all blocks which can be reached
+            from the roots. The index reflects the tree at the time of
+            the call, so it must be built again when links are changed
+            by other means than through the slots of the index.
+
+            >>> x = NifFormat.NiNode()
+            >>> y = NifFormat.NiNode()
+            >>> z = NifFormat.NiNode()
+            >>> x.add_child(y)
+            >>> x.add_child(z)
+            >>> z.add_child(y)
+            >>> data = NifFormat.Data()
+            >>> data.roots = [x]
+            >>> [slot.get_value() is y for slot in data.get_ref_index()[id(y)]]
+            [True, True]
+
+            :return: Maps the id of every block to the list of refs and
+                pointers whose value is that block.
+            :rtype: ``dict``
+            """
+            index = {}
+            for slot in self._get_link_slots():
+                index.setdefault(id(slot.get_value()), []).append(slot)
+            return index
+
+        def _get_link_slots(self, replacements=None):
+            """Generator for all refs and pointers, which are not
+            ``None``, of all blocks that can be reached from the roots
+            through refs. Every block is visited only once. If
+            *replacements* is given, a dictionary which maps the id of a
+            block to its replacement, then slots are updated before they
+            are followed.
+            """
+            stack = [root for root in self.roots if root is not None]
+            visited = set(id(root) for root in stack)
+            while stack:
+                block = stack.pop()
+                for slot in block.get_link_slots():
+                    value = slot.get_value()
+                    if value is None:
+                        continue
+                    if replacements and id(value) in replacements:
+                        value = replacements[id(value)]
+                        # set_value takes care of template type
+                        slot.set_value(value)
+                        if value is None:
+                            continue
+                    yield slot
+                    if slot._has_refs and id(value) not in visited:
+                        visited.add(id(value))
+                        stack.append(value)
+
+        def find_by_name(self, name, block_type=None):
+            """Find the first block with the given name, in the order of
+            :meth:`NifFormat.NiObject.tree`, starting from the roots.
+
+            >>> root = NifFormat.NiNode()
+            >>> child = NifFormat.NiNode()
+            >>> child.name = b"Bip01"
+            >>> root.add_child(child)
+            >>> data = NifFormat.Data()
+            >>> data.roots = [root]
+            >>> data.find_by_name(b"Bip01") is child
+            True
+            >>> print(data.find_by_name(b"Bip01", NifFormat.NiTriShape))
+            None
+
+            :param name: The name of the block.
+            :type name: ``bytes``
+            :param block_type: If not ``None``, only find blocks of this
+                type.
+            :return: The block, or ``None`` if there is no such block.
+            """
+            for block in self._get_name_type_index()[1].get(name, ()):
+                if block_type is None or isinstance(block, block_type):
+                    return block
+            return None
+
+        def find_all_of_type(self, block_type):
+            """Get all blocks of the given type, in the order of
+            :meth:`NifFormat.NiObject.tree`, starting from the roots.
+
+            >>> root = NifFormat.NiNode()
+            >>> shape = NifFormat.NiTriShape()
+            >>> root.add_child(shape)
+            >>> data = NifFormat.Data()
+            >>> data.roots = [root]
+            >>> data.find_all_of_type(NifFormat.NiAVObject) == [root, shape]
+            True
+
+            :param block_type: The type of the blocks.
+            :return: The list of blocks.
+            :rtype: ``list`` of L{NifFormat.NiObject}
+            """
+            blocks, names, types = self._get_name_type_index()
+            try:
+                return list(types[block_type])
+            except KeyError:
+                pass
+            types[block_type] = [block for block in blocks
+                                 if isinstance(block, block_type)]
+            return list(types[block_type])
+
+        def _get_name_type_index(self):
+            """Get the index of all blocks which can be reached from the
+            roots. The index is built on first use, and is built again
+            only when the roots, or any links or names, have changed
+            since (see L{ChangeCounter}), so many lookups between such
+            changes cost a single traversal.
+
+            :return: A tuple C{(blocks, names, types)}, with C{blocks}
+                the list of all blocks, C{names} a dictionary mapping
+                names to lists of blocks, and C{types} a dictionary
+                mapping types to lists of blocks, filled on demand.
+            """
+            key = (ChangeCounter.link_count,
+                   tuple(id(root) for root in self.roots))
+            if (self._name_type_index is not None
+                and self._name_type_index[0] == key):
+                return self._name_type_index[1]
+            blocks = []
+            names = {}
+            visited = set()
+            for root in self.roots:
+                if root is None:
+                    continue
+                for block in root.tree(unique=True):
+                    # blocks shared between roots are indexed once
+                    if id(block) in visited:
+                        continue
+                    visited.add(id(block))
+                    blocks.append(block)
+                    name = getattr(block, "name", None)
+                    if name is not None:
+                        names.setdefault(name, []).append(block)
+            index = (blocks, names, {})
+            # reading lazy blocks may have changed the count
+            key = (ChangeCounter.link_count, key[1])
+            self._name_type_index = (key, index)
+            return index
 
         def get_detail_child_nodes(self, edge_filter=EdgeFilter()):
             yield self._version_value_
@@ -1283,11 +1496,23 @@ class NifFormat(FileFormat):
             finally:
                 stream.seek(pos)
 
-        def read(self, stream):
+        def read(self, stream, lazy=False, only_types=None):
             """Read a NIF file. Does not reset stream position.
 
             :param stream: The stream from which to read.
             :type stream: ``file``
+            :param lazy: If ``True``, and the version stores the size of
+                each block (20.2.0.7 and up), then blocks are only
+                parsed when they are first used, for instance through
+                L{blocks}, L{roots}, C{tree()}, or a link. Until then,
+                each block only keeps its raw bytes.
+            :type lazy: ``bool``
+            :param only_types: If not ``None``, then only blocks of these
+                types (or subclasses of them) are parsed when reading;
+                for 20.2.0.7 and up, all other blocks are read lazily,
+                as with C{lazy=True}, so they are only parsed if they
+                are used after all.
+            :type only_types: ``tuple`` of L{NifFormat.NiObject} subclasses
             """
             logger = logging.getLogger("pyffi.nif.data")
             # read header
@@ -1306,10 +1531,25 @@ class NifFormat(FileFormat):
             # read the blocks
             self._link_stack = [] # list of indices, as they are added to the stack
             self._string_list = [s for s in self.header.strings]
+            self._string_index_dct = None
             self._block_dct = {} # maps block index to actual block
             self.blocks = [] # records all blocks as read from file in order
             block_num = 0 # the current block numner
 
+            # lazy blocks are read with a copy of the data as it is now
+            # (so later changes to the version, the strings, etc. do not
+            # affect them); the block dictionary is shared, so links
+            # resolve to the (possibly still lazy) blocks of this file
+            if (lazy or only_types is not None) and self.version >= 0x14020007:
+                lazy_data = copy.copy(self)
+                lazy_data._version_value_ = copy.copy(self._version_value_)
+                lazy_data._user_version_value_ = copy.copy(
+                    self._user_version_value_)
+                lazy_data._user_version_2_value_ = copy.copy(
+                    self._user_version_2_value_)
+            else:
+                lazy_data = None
+
             while True:
                 if self.version < 0x0303000D:
                     # check if this is a 'Top Level Object'
@@ -1372,12 +1612,29 @@ class NifFormat(FileFormat):
                                 %(block_index, stream.tell()))
                 # create the block
                 try:
-                    block = getattr(NifFormat, block_type)()
+                    block_class = getattr(NifFormat, block_type)
                 except AttributeError:
                     raise ValueError(
                         "Unknown block type '%s'." % block_type)
+                if (lazy_data is not None and block_type != "NiDataStream"
+                    and not (only_types is not None
+                             and issubclass(block_class, only_types))):
+                    # store the raw block, it is read when first used
+                    # (see NifFormat.NiObject.__getattr__)
+                    block = block_class.__new__(block_class)
+                    block._lazy_block = (
+                        lazy_data,
+                        stream.read(self.header.block_size[block_num]))
+                    self._block_dct[block_index] = block
+                    self.blocks.append(block)
+                    block_num += 1
+                    if block_num >= self.header.num_blocks:
+                        break
+                    continue
+                block = block_class()
+                block_pos = stream.tell()
                 logger.debug("Reading %s block at 0x%08X"
-                             % (block_type, stream.tell()))
+                             % (block_type, block_pos))
                 # read the block
                 try:
                     block.read(stream, self)
@@ -1397,7 +1654,7 @@ class NifFormat(FileFormat):
                 # check block size
                 if self.version >= 0x14020007:
                     logger.debug("Checking block size")
-                    calculated_size = block.get_size(data=self)
+                    calculated_size = stream.tell() - block_pos
                     if calculated_size != self.header.block_size[block_num]:
                         extra_size = self.header.block_size[block_num] - calculated_size
                         logger.error(
@@ -1426,7 +1683,10 @@ class NifFormat(FileFormat):
                     'End of file not reached: corrupt NIF file?')
 
             # fix links in blocks and footer (header has no links)
+            # (lazy blocks fix their links when they are read)
             for block in self.blocks:
+                if block._lazy_block is not None:
+                    continue
                 block.fix_links(self)
             ftr.fix_links(self)
             # the link stack should be empty now
@@ -1451,16 +1711,19 @@ class NifFormat(FileFormat):
             self._block_index_dct = {} # maps block to block index
             block_type_list = [] # list of all block type strings
             block_type_dct = {} # maps block to block type string index
-            self._string_list = []
+            block_type_index_dct = {} # maps block type string to its index
             for root in self.roots:
                 self._makeBlockList(root,
                                     self._block_index_dct,
-                                    block_type_list, block_type_dct)
-                for block in root.tree():
-                    self._string_list.extend(
-                        block.get_strings(self))
-            self._string_list = list(set(self._string_list)) # ensure unique elements
-            #print(self._string_list) # debug
+                                    block_type_list, block_type_dct,
+                                    block_type_index_dct)
+            # unique strings, in the order in which they are first used
+            self._string_index_dct = {}
+            for block in self.blocks:
+                for s in block.get_strings(self):
+                    if s not in self._string_index_dct:
+                        self._string_index_dct[s] = len(self._string_index_dct)
+            self._string_list = list(self._string_index_dct)
 
             self.header.user_version = self.user_version # TODO dedicated type for user_version similar to FileVersion
             # for oblivion CS; apparently this is the version of the bhk blocks
@@ -1481,9 +1744,6 @@ class NifFormat(FileFormat):
             self.header.strings.update_size()
             for i, s in enumerate(self._string_list):
                 self.header.strings[i] = s
-            self.header.block_size.update_size()
-            for i, block in enumerate(self.blocks):
-                self.header.block_size[i] = block.get_size(data=self)
             #if verbose >= 2:
             #    print(hdr)
 
@@ -1494,42 +1754,59 @@ class NifFormat(FileFormat):
             for i, root in enumerate(self.roots):
                 ftr.roots[i] = root
 
-            # write the file
-            logger.debug("Writing header")
-            #logger.debug("%s" % self.header)
-            self.header.write(stream, self)
+            # write the blocks and the footer into memory first, so the
+            # block sizes can be taken from the buffer, and the file is
+            # written with a single call
+            body = io.BytesIO()
+            block_sizes = []
             for block in self.blocks:
                 # signal top level object if block is a root object
                 if self.version < 0x0303000D and block in self.roots:
                     s = NifFormat.SizedString()
                     s.set_value("Top Level Object")
-                    s.write(stream, self)
+                    s.write(body, self)
                 if self.version >= 0x05000001:
                     if self.version <= 0x0A01006A:
                         # write zero dummy separator
-                        stream.write('\x00\x00\x00\x00'.encode("ascii"))
+                        body.write('\x00\x00\x00\x00'.encode("ascii"))
                 else:
                     # write block type string
                     s = NifFormat.SizedString()
                     assert(block_type_list[block_type_dct[block]]
                            == block.__class__.__name__) # debug
                     s.set_value(block.__class__.__name__)
-                    s.write(stream, self)
+                    s.write(body, self)
                 # write block index
                 logger.debug("Writing %s block" % block.__class__.__name__)
                 if self.version < 0x0303000D:
-                    stream.write(struct.pack(self._byte_order + 'i',
-                                             self._block_index_dct[block]))
+                    body.write(struct.pack(self._byte_order + 'i',
+                                           self._block_index_dct[block]))
                 # write block
-                block.write(stream, self)
+                block_pos = body.tell()
+                block.write(body, self)
+                block_sizes.append(body.tell() - block_pos)
             if self.version < 0x0303000D:
                 s = NifFormat.SizedString()
                 s.set_value("End Of File")
-                s.write(stream, self)
-            ftr.write(stream, self)
+                s.write(body, self)
+            ftr.write(body, self)
+            self.header.block_size.update_size()
+            for i, block_size in enumerate(block_sizes):
+                self.header.block_size[i] = block_size
+
+            # write the file
+            logger.debug("Writing header")
+            #logger.debug("%s" % self.header)
+            # the header and the body are written separately, so the
+            # file is not held in memory twice
+            buf = io.BytesIO()
+            self.header.write(buf, self)
+            stream.write(buf.getbuffer())
+            stream.write(body.getbuffer())
 
         def _makeBlockList(
-            self, root, block_index_dct, block_type_list, block_type_dct):
+            self, root, block_index_dct, block_type_list, block_type_dct,
+            block_type_index_dct=None):
             """This is a helper function for write to set up the list of all blocks,
             the block index map, and the block type map.
 
@@ -1544,6 +1821,10 @@ class NifFormat(FileFormat):
             :param block_type_dct: Dictionary mapping blocks in self.blocks to
                 their block type index.
             :type block_type_dct: dict
+            :param block_type_index_dct: Dictionary mapping the block types
+                in block_type_list to their index, built from block_type_list
+                if not given.
+            :type block_type_index_dct: dict
             """
 
             def _blockChildBeforeParent(block):
@@ -1560,8 +1841,12 @@ class NifFormat(FileFormat):
                         and not isinstance(block, NifFormat.bhkConstraint))
 
             # block already listed? if so, return
-            if root in self.blocks:
+            if root in block_index_dct:
                 return
+            if block_type_index_dct is None:
+                block_type_index_dct = dict(
+                    (block_type, i)
+                    for i, block_type in enumerate(block_type_list))
             # add block type to block type dictionary
             block_type = root.__class__.__name__
             # special case: NiDataStream stores part of data in block type list
@@ -1569,9 +1854,10 @@ class NifFormat(FileFormat):
                 block_type = ("NiDataStream\x01%i\x01%i"
                               % (root.usage, root.access.get_attributes_values(self)))
             try:
-                block_type_dct[root] = block_type_list.index(block_type)
-            except ValueError:
+                block_type_dct[root] = block_type_index_dct[block_type]
+            except KeyError:
                 block_type_dct[root] = len(block_type_list)
+                block_type_index_dct[block_type] = len(block_type_list)
                 block_type_list.append(block_type)
 
             # special case: add bhkConstraint entities before bhkConstraint
@@ -1580,7 +1866,8 @@ class NifFormat(FileFormat):
                 for entity in root.entities:
                     if entity is not None:
                         self._makeBlockList(
-                            entity, block_index_dct, block_type_list, block_type_dct)
+                            entity, block_index_dct, block_type_list, block_type_dct,
+                            block_type_index_dct)
 
             children_left = []
             # add children that come before the block
@@ -1588,7 +1875,8 @@ class NifFormat(FileFormat):
             for child in root.get_refs(data=self):
                 if _blockChildBeforeParent(child):
                     self._makeBlockList(
-                        child, block_index_dct, block_type_list, block_type_dct)
+                        child, block_index_dct, block_type_list, block_type_dct,
+                        block_type_index_dct)
                 else:
                     children_left.append(child)
 
@@ -1602,7 +1890,8 @@ class NifFormat(FileFormat):
             # add children that come after the block
             for child in children_left:
                 self._makeBlockList(
-                    child, block_index_dct, block_type_list, block_type_dct)
+                    child, block_index_dct, block_type_list, block_type_dct,
+                    block_type_index_dct)
 
     # extensions of generated structures
 
@@ -5712,26 +6001,70 @@ class NifFormat(FileFormat):
             self.add_extra_data(extra)
 
     class NiObject:
+        _lazy_block = None
+        """For lazily read blocks, a tuple C{(data, raw)} to read
+        the block from."""
+        _cache_hash = True
+
+        def __getattr__(self, name):
+            """Read a lazily read block (see L{NifFormat.Data.read}) when
+            one of its attributes is first used. Note that python only
+            calls this method for attributes that are not found."""
+            if self._lazy_block is None:
+                raise AttributeError(
+                    "'%s' object has no attribute '%s'"
+                    % (self.__class__.__name__, name))
+            data, raw = self._lazy_block
+            # attributes which are missing while reading are not read again
+            self._lazy_block = None
+            logger = logging.getLogger("pyffi.nif.data")
+            logger.debug("Reading lazy %s block" % self.__class__.__name__)
+            try:
+                self.__class__.__init__(self)
+                stream = io.BytesIO(raw)
+                data._link_stack = []
+                self.read(stream, data)
+                if stream.tell() != len(raw):
+                    logger.error(
+                        "Block size check failed: corrupt NIF file "
+                        "or bad nif.xml?")
+                    logger.error("Skipping %i bytes in %s"
+                                 % (len(raw) - stream.tell(),
+                                    self.__class__.__name__))
+                self.fix_links(data)
+                if data._link_stack:
+                    raise NifFormat.NifError('not all links have been popped from the stack (bug?)')
+            except:
+                logger.exception("Reading %s failed" % self.__class__)
+                # drop the partially read values, and keep the raw block,
+                # so every later use fails in the same way
+                self.__dict__.clear()
+                self._lazy_block = (data, raw)
+                raise
+            del self._lazy_block
+            return getattr(self, name)
+
         def find(self, block_name = None, block_type = None):
-            # does this block match the search criteria?
-            if block_name and block_type:
-                if isinstance(self, block_type):
+            """Find the first block in the tree which matches the search
+            criteria, in the order of :meth:`tree`.
+
+            :param block_name: If not ``None``, the name of the block.
+            :param block_type: If not ``None``, the type of the block.
+            :return: The block, or ``None`` if no block matches or if
+                there are no search criteria."""
+            if not block_name and not block_type:
+                return None
+            for blk in self.tree(unique=True):
+                # does this block match the search criteria?
+                if block_type and not isinstance(blk, block_type):
+                    continue
+                if block_name:
                     try:
-                        if block_name == self.name: return self
+                        if block_name != blk.name:
+                            continue
                     except AttributeError:
-                        pass
-            elif block_name:
-                try:
-                    if block_name == self.name: return self
-                except AttributeError:
-                    pass
-            elif block_type:
-                if isinstance(self, block_type): return self
-
-            # ok, this block is not a match, so check further down in tree
-            for child in self.get_refs():
-                blk = child.find(block_name, block_type)
-                if blk: return blk
+                        continue
+                return blk
 
             return None
 
@@ -5745,11 +6078,26 @@ class NifFormat(FileFormat):
             :param block_type: The type that blocks should have in this chain."""
 
             if self is block: return [self]
-            for child in self.get_refs():
-                if block_type and not isinstance(child, block_type): continue
-                child_chain = child.find_chain(block, block_type)
-                if child_chain:
-                    return [self] + child_chain
+            # depth first search, in which every block is visited once:
+            # a block that is visited again has no chain to block
+            visited = set([id(self)])
+            chain = [self]
+            stack = [iter(self.get_refs())]
+            while stack:
+                for child in stack[-1]:
+                    if block_type and not isinstance(child, block_type):
+                        continue
+                    if child is block:
+                        return chain + [child]
+                    if id(child) in visited:
+                        continue
+                    visited.add(id(child))
+                    chain.append(child)
+                    stack.append(iter(child.get_refs()))
+                    break
+                else:
+                    stack.pop()
+                    chain.pop()
 
             return []
 
@@ -5768,27 +6116,26 @@ class NifFormat(FileFormat):
             :param follow_all: If C{block_type} is not ``None``, then if this is ``True`` the function will parse the whole tree. Otherwise, the function will not follow branches that start by a non-C{block_type} block.
 
             :param unique: Whether the generator can return the same block twice or not."""
-            # unique blocks: reduce this to the case of non-unique blocks
-            if unique:
-                block_list = []
-                for block in self.tree(block_type = block_type, follow_all = follow_all, unique = False):
-                    if not block in block_list:
-                        yield block
-                        block_list.append(block)
-                return
-
-            # yield self
-            if not block_type:
-                yield self
-            elif isinstance(self, block_type):
-                yield self
-            elif not follow_all:
-                return # don't recurse further
-
-            # yield tree attached to each child
-            for child in self.get_refs():
-                for block in child.tree(block_type = block_type, follow_all = follow_all):
+            # depth first, with an explicit stack of blocks still to visit
+            # (children are pushed in reverse order, to pop them in order)
+            visited = set()
+            stack = [self]
+            while stack:
+                block = stack.pop()
+                if unique:
+                    # the subtree of a visited block has been visited too
+                    if id(block) in visited:
+                        continue
+                    visited.add(id(block))
+                # yield block
+                if not block_type:
                     yield block
+                elif isinstance(block, block_type):
+                    yield block
+                elif not follow_all:
+                    continue # don't recurse further
+                # visit children
+                stack.extend(reversed(block.get_refs()))
 
         def _validateTree(self):
             """Raises ValueError if there is a cycle in the tree."""
@@ -5797,11 +6144,11 @@ class NifFormat(FileFormat):
             # will visit some child more than once (and as a consequence, infinitely
             # many times). So, walk the reference tree and check that every block is
             # only visited once.
-            children = []
+            children = set()
             for child in self.tree():
-                if child in children:
+                if id(child) in children:
                     raise ValueError('cyclic references detected')
-                children.append(child)
+                children.add(id(child))
 
         def is_interchangeable(self, other):
             """Are the two blocks interchangeable?
@@ -5816,6 +6163,31 @@ class NifFormat(FileFormat):
                 # for blocks with references: quick check only
                 return self is other
 
+        def get_interchangeable_key(self):
+            """Get a key such that blocks which are interchangeable
+            have equal keys, so candidates for :meth:`is_interchangeable`
+            can be looked up in a dictionary. Blocks with equal keys
+            need not be interchangeable.
+
+            >>> from pyffi.formats.nif import NifFormat
+            >>> prop1 = NifFormat.NiAlphaProperty()
+            >>> prop2 = NifFormat.NiAlphaProperty()
+            >>> prop1.get_interchangeable_key() == prop2.get_interchangeable_key()
+            True
+            >>> prop2.threshold = 128
+            >>> prop1.get_interchangeable_key() == prop2.get_interchangeable_key()
+            False
+            >>> print(NifFormat.NiNode().get_interchangeable_key())
+            None
+
+            :return: A hashable key, or ``None`` if the block is only
+                interchangeable with itself.
+            """
+            if isinstance(self, (NifFormat.NiProperty, NifFormat.NiSourceTexture)):
+                return (self.__class__, self.get_hash())
+            else:
+                return None
+
     class NiMaterialProperty:
         def is_interchangeable(self, other):
             """Are the two material blocks interchangeable?"""
@@ -5831,6 +6203,10 @@ class NifFormat(FileFormat):
                 # ignore name
                 return self.get_hash()[1:] == other.get_hash()[1:]
 
+        def get_interchangeable_key(self):
+            # names are not always compared, so leave out the name
+            return (self.__class__, self.get_hash()[1:])
+
     class ATextureRenderData:
         def __get_pixeldata_stream(self):
             if isinstance(self, NifFormat.NiPersistentSrcTextureRendererData):
@@ -6114,6 +6490,14 @@ class NifFormat(FileFormat):
             # looks pretty identical!
             return True
 
+        def get_interchangeable_key(self):
+            # floats are compared with a tolerance, so leave them out
+            return (self.__class__,) + tuple(
+                getattr(self, attribute) for attribute in (
+                    "num_vertices", "keep_flags", "compress_flags",
+                    "has_vertices", "num_uv_sets", "has_normals",
+                    "has_vertex_colors", "has_uv", "consistency_flags"))
+
         def get_triangle_indices(self, triangles):
             """Yield list of triangle indices (relative to
             self.get_triangles()) of given triangles. Degenerate triangles in
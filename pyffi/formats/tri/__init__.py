@@ -114,7 +114,7 @@ import re
 
 import pyffi.object_models.xml
 import pyffi.object_models.common
-from pyffi.object_models.xml.basic import BasicBase
+from pyffi.object_models.xml.basic import BasicBase, ChangeCounter
 import pyffi.object_models
 from pyffi.utils.graph import EdgeFilter
 
@@ -223,6 +223,7 @@ class TriFormat(pyffi.object_models.xml.FileFormat):
             return self._value
 
         def set_value(self, value):
+            ChangeCounter.count += 1
             self._value = int(value)
 
         def __str__(self):
@@ -179,6 +179,16 @@ class FileFormat(object):
         user_version = None
         """User version (additional version field) of the data."""
 
+        use_struct_runs = True
+        """Set to ``False`` to read and write each attribute of xml
+        structures separately, rather than reading and writing runs of
+        fixed layout attributes with a single precompiled struct call."""
+
+        use_packed_arrays = True
+        """Set to ``False`` to create the elements of xml arrays when they
+        are read, rather than keeping arrays of fixed layout elements
+        packed until their elements are accessed."""
+
         def inspect(self, stream):
             """Quickly checks whether the stream appears to contain
             data of a particular format. Resets stream to original position.
@@ -317,7 +327,7 @@ class FileFormat(object):
                        for part in cls.name_parts(name))
 
     @classmethod
-    def walkData(cls, top, topdown=True, mode='rb'):
+    def walkData(cls, top, topdown=True, mode='rb', in_memory=False):
         """A generator which yields the data of all files in
         directory top whose filename matches the regular expression
         :attr:`RE_FILENAME`. The argument top can also be a file instead of a
@@ -335,11 +345,17 @@ class FileFormat(object):
         :type topdown: ``bool``
         :param mode: The mode in which to open files.
         :type mode: ``str``
+        :param in_memory: Whether to read each file into memory when it
+            is opened, see :class:`pyffi.utils.MemoryFile`.
+        :type in_memory: ``bool``
         """
         # now walk over all these files in directory top
         for filename in pyffi.utils.walk(top, topdown, onerror=None,
                                          re_filename=cls.RE_FILENAME):
-            stream = open(filename, mode)
+            if in_memory:
+                stream = pyffi.utils.MemoryFile(filename, mode)
+            else:
+                stream = open(filename, mode)
             try:
                 # return data for the stream
                 # the caller can call data.read(stream),
@@ -349,7 +365,7 @@ class FileFormat(object):
                 stream.close()
 
     @classmethod
-    def walk(cls, top, topdown=True, mode='rb'):
+    def walk(cls, top, topdown=True, mode='rb', in_memory=False):
         """A generator which yields all files in
         directory top whose filename matches the regular expression
         :attr:`RE_FILENAME`. The argument top can also be a file instead of a
@@ -367,11 +383,17 @@ class FileFormat(object):
         :type topdown: ``bool``
         :param mode: The mode in which to open files.
         :type mode: ``str``
+        :param in_memory: Whether to read each file into memory when it
+            is opened, see :class:`pyffi.utils.MemoryFile`.
+        :type in_memory: ``bool``
         """
         # now walk over all these files in directory top
         for filename in pyffi.utils.walk(top, topdown, onerror=None,
                                          re_filename=cls.RE_FILENAME):
-            stream = open(filename, mode)
+            if in_memory:
+                stream = pyffi.utils.MemoryFile(filename, mode)
+            else:
+                stream = open(filename, mode)
             try:
                 yield stream
             finally:
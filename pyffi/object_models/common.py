@@ -40,7 +40,7 @@
 import struct
 import logging
 
-from pyffi.object_models.xml.basic import BasicBase
+from pyffi.object_models.xml.basic import BasicBase, ChangeCounter
 from pyffi.object_models.editable import EditableSpinBox
 from pyffi.object_models.editable import EditableFloatSpinBox
 from pyffi.object_models.editable import EditableLineEdit
@@ -142,6 +142,7 @@ class Int(BasicBase, EditableSpinBox):
         :param value: The value to assign.
         :type value: int
         """
+        ChangeCounter.count += 1
         try:
             val = int(value)
         except ValueError:
@@ -292,6 +293,7 @@ class Bool(UByte, EditableBoolComboBox):
         :param value: The value to assign.
         :type value: bool
         """
+        ChangeCounter.count += 1
         self._value = 1 if value else 0
 
 class Char(BasicBase, EditableLineEdit):
@@ -315,6 +317,7 @@ class Char(BasicBase, EditableLineEdit):
         :param value: The value to assign (bytes of length 1).
         :type value: bytes
         """
+        ChangeCounter.count += 1
         assert(isinstance(value, bytes))
         assert(len(value) == 1)
         self._value = value
@@ -373,6 +376,7 @@ class Float(BasicBase, EditableFloatSpinBox):
         :param value: The value to assign.
         :type value: float
         """
+        ChangeCounter.count += 1
         self._value = float(value)
 
     def read(self, stream, data):
@@ -458,6 +462,7 @@ class ZString(BasicBase, EditableLineEdit):
         :param value: The value to assign.
         :type value: ``str`` (will be encoded as default) or C{bytes}
         """
+        ChangeCounter.count += 1
         val = _as_bytes(value)
         i = val.find(b'\x00')
         if i != -1:
@@ -553,6 +558,7 @@ class FixedString(BasicBase, EditableLineEdit):
         :param value: The value to assign.
         :type value: ``str`` (encoded as default) or C{bytes}
         """
+        ChangeCounter.count += 1
         val = _as_bytes(value)
         if len(val) > self._len:
             raise ValueError("string '%s' too long" % val)
@@ -633,6 +639,7 @@ class SizedString(BasicBase, EditableLineEdit):
         :param value: The value to assign.
         :type value: str
         """
+        ChangeCounter.count += 1
         val = _as_bytes(value)
         if len(val) > 10000:
             raise ValueError('string too long')
@@ -697,6 +704,7 @@ class UndecodedData(BasicBase):
         :param value: The value to assign.
         :type value: bytes
         """
+        ChangeCounter.count += 1
         if len(value) > 16000000:
             raise ValueError('data too long')
         self._value = value
@@ -39,13 +39,18 @@ file, and xml handler for converting the xml description into Python classes.
 #
 # ***** END LICENSE BLOCK *****
 
+import hashlib
 import logging
+import marshal
+import tempfile
 import time # for timing stuff
 import types
+import os
 import os.path
 import sys
 import xml.etree.ElementTree as ET
 
+import pyffi
 import pyffi.object_models
 from pyffi.object_models.xml.struct_    import StructBase
 from pyffi.object_models.xml.basic      import BasicBase
@@ -83,6 +88,8 @@ class MetaFileFormat(pyffi.object_models.MetaFileFormat):
         cls.xml_alias = cls.xml_alias[:]
         cls.xml_bit_struct = cls.xml_bit_struct[:]
         cls.xml_struct = cls.xml_struct[:]
+        cls._attribute_names = dict(cls._attribute_names)
+        cls._parent_types = None
 
         # parse XML
 
@@ -96,7 +103,7 @@ class MetaFileFormat(pyffi.object_models.MetaFileFormat):
             xml_file = cls.openfile(xml_file_name, cls.xml_file_path)
             xmlp = XmlParser(cls)
             try:
-                xmlp.load_xml(xml_file)
+                xmlp.load_xml(xml_file, cache_path=cls.xml_cache_path)
             finally:
                 xml_file.close()
 
@@ -107,6 +114,11 @@ class FileFormat(pyffi.object_models.FileFormat, metaclass=MetaFileFormat):
     described by an xml file."""
     xml_file_name = None #: Override.
     xml_file_path = None #: Override.
+    #: Folder where the parsed xml file is cached, so the next import
+    #: skips the xml parser (the classes are still built), or ``None``
+    #: to disable the cache. The cache is disabled unless the
+    #: :envvar:`PYFFICACHEPATH` environment variable is set.
+    xml_cache_path = os.getenv('PYFFICACHEPATH') or None
     logger = logging.getLogger("pyffi.object_models.xml")
 
     # We also keep an ordered list of all classes that have been created.
@@ -123,6 +135,101 @@ class FileFormat(pyffi.object_models.FileFormat, metaclass=MetaFileFormat):
     xml_bit_struct = []
     xml_struct = []
 
+    # maps names in the xml to python attribute names
+    _attribute_names = {}
+
+    # reverse of the reference type graph, see get_parent_types
+    _parent_types = None
+
+    @classmethod
+    def name_attribute(cls, name):
+        """Converts an attribute name, as in the xml file, into a name
+        usable by python. Results are remembered, as the same names
+        occur many times in the xml.
+
+        :param name: The attribute name.
+        :type name: ``str``
+        :return: Reformatted attribute name, useable by python.
+        """
+        try:
+            return cls._attribute_names[name]
+        except KeyError:
+            attribute_name = super(FileFormat, cls).name_attribute(name)
+            cls._attribute_names[name] = attribute_name
+            return attribute_name
+
+    @classmethod
+    def get_parent_types(cls):
+        """Get the reverse of the graph of reference types of all xml
+        struct classes of the format, as a dictionary which maps every
+        struct class to the set of struct classes whose instances can
+        have an instance of that class among their global child nodes.
+        The graph is calculated once, from the attribute types (see
+        :meth:`StructBase.get_ref_types`).
+
+        :return: The parent types of every struct class.
+        :rtype: ``dict``
+        """
+        if cls._parent_types is not None:
+            return cls._parent_types
+        parent_types = dict((struct_type, set())
+                            for struct_type in cls.xml_struct)
+        subclasses = {}
+        for struct_type in cls.xml_struct:
+            if (struct_type.get_global_child_nodes
+                    is not StructBase.get_global_child_nodes):
+                ref_types = {object}
+            else:
+                ref_types = struct_type.get_ref_types()
+            for ref_type in ref_types:
+                if ref_type not in subclasses:
+                    subclasses[ref_type] = [
+                        child_type for child_type in cls.xml_struct
+                        if issubclass(child_type, ref_type)]
+                for child_type in subclasses[ref_type]:
+                    parent_types[child_type].add(struct_type)
+        cls._parent_types = parent_types
+        return parent_types
+
+    @classmethod
+    def get_reaching_types(cls, target_types, is_admissible=None):
+        """Get all xml struct classes whose instances can have an
+        instance of one of the target types among their global child
+        nodes, directly or indirectly, along with the target classes
+        themselves.
+
+        >>> from pyffi.formats.nif import NifFormat
+        >>> reaching_types = NifFormat.get_reaching_types(
+        ...     (NifFormat.NiMaterialProperty,))
+        >>> NifFormat.NiNode in reaching_types
+        True
+        >>> NifFormat.NiTriShapeData in reaching_types
+        False
+
+        :param target_types: The target types.
+        :type target_types: ``tuple`` of ``type``
+        :param is_admissible: If specified, only classes for which this
+            function returns ``True`` are included, and only paths over
+            such classes are followed.
+        :type is_admissible: ``function``
+        :return: The classes from which the targets can be reached.
+        :rtype: ``frozenset``
+        """
+        parent_types = cls.get_parent_types()
+        stack = [struct_type for struct_type in cls.xml_struct
+                 if issubclass(struct_type, target_types)
+                 and (is_admissible is None or is_admissible(struct_type))]
+        reaching_types = set(stack)
+        while stack:
+            for parent_type in parent_types[stack.pop()]:
+                if parent_type in reaching_types:
+                    continue
+                if is_admissible is not None and not is_admissible(parent_type):
+                    continue
+                reaching_types.add(parent_type)
+                stack.append(parent_type)
+        return frozenset(reaching_types)
+
 class StructAttribute(object):
     """Helper class to collect attribute data of struct add tags."""
 
@@ -247,9 +354,27 @@ class XmlError(Exception):
     parsing."""
     pass
 
+class _Element(object):
+    """An element of a cached xml tree. It has the parts of the
+    :class:`xml.etree.ElementTree.Element` interface that :class:`XmlParser`
+    uses."""
+    __slots__ = ("tag", "attrib", "text", "_children")
+
+    def __init__(self, tag, attrib, text=None, children=()):
+        self.tag = tag
+        self.attrib = attrib
+        self.text = text
+        self._children = children
+
+    def __iter__(self):
+        return iter(self._children)
+
 class XmlParser:
     struct_types = ("compound", "niobject", "struct")
     bitstruct_types = ("bitfield", "bitflags", "bitstruct")
+    # change this whenever the parser changes how it interprets the xml,
+    # to invalidate existing caches
+    cache_version = 1
     def __init__(self, cls):
         """Set up the xml parser."""
 
@@ -274,14 +399,89 @@ class XmlParser:
         # list of tuples ({tokens}, (target_attribs)) for each <token>
         self.tokens = [ ]
         self.versions = [ ([], ("versions", "until", "since")), ]
+        # set when the attributes of the tree have been replaced already
+        self.tokens_replaced = False
+
+    def load_xml(self, file, cache_path=None):
+        """Loads an XML (can be filepath or open file) and does all parsing.
 
-    def load_xml(self, file):
-        """Loads an XML (can be filepath or open file) and does all parsing"""
-        tree = ET.parse(file)
-        root = tree.getroot()
+        If cache_path is given, then the tree, with all tokens replaced,
+        is stored in that folder after parsing, and loaded from there
+        rather than parsed on later calls. The name of the cache file
+        contains a hash of the xml, of the pyffi version, and of the python
+        version, so a changed xml is parsed again.
+        """
+        if not cache_path:
+            tree = ET.parse(file)
+            root = tree.getroot()
+            self.load_root(root)
+            self.final_cleanup()
+            return
+        if isinstance(file, str):
+            with open(file) as xml_file:
+                contents = xml_file.read()
+        else:
+            contents = file.read()
+        key = hashlib.sha1(
+            ("%s %s %s\n" % (pyffi.__version__, self.cache_version,
+                              sys.version)
+             + contents).encode("utf-8")).hexdigest()
+        cache_file = os.path.join(
+            cache_path, "%s_%s.cache" % (self.cls.__name__.lower(), key[:20]))
+        root = self.load_cache(cache_file)
+        if root is not None:
+            self.tokens_replaced = True
+        else:
+            root = ET.fromstring(contents)
         self.load_root(root)
         self.final_cleanup()
-            
+        if not self.tokens_replaced:
+            # load_root has replaced the tokens in the tree
+            self.save_cache(cache_file, root)
+
+    def load_cache(self, cache_file):
+        """Returns the root of the tree stored in the given cache file,
+        or ``None`` if there is no valid cache. The attribute names that
+        were used when parsing the tree are restored as well."""
+
+        def element(tag, attrib, text, children):
+            return _Element(tag, attrib, text,
+                            [element(*child) for child in children])
+
+        try:
+            with open(cache_file, "rb") as stream:
+                tree, attribute_names = marshal.loads(stream.read())
+                root = element(*tree)
+                self.cls._attribute_names.update(attribute_names)
+                return root
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self.cls.logger.warning(
+                "Failed to load xml cache %s" % cache_file, exc_info=True)
+            return None
+
+    def save_cache(self, cache_file, root):
+        """Stores the tree, and the attribute names that were used when
+        parsing it, in the given cache file. Failure to write the file is
+        not an error."""
+
+        def element_tuple(element):
+            return (element.tag, dict(element.attrib), element.text,
+                    tuple(element_tuple(child) for child in element))
+
+        cache_path = os.path.dirname(cache_file)
+        try:
+            os.makedirs(cache_path, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                    dir=cache_path, suffix=".tmp", delete=False) as stream:
+                marshal.dump(
+                    (element_tuple(root), self.cls._attribute_names), stream)
+            os.replace(stream.name, cache_file)
+        except OSError:
+            self.cls.logger.debug(
+                "Failed to write xml cache %s" % cache_file, exc_info=True)
+
     def load_root(self, root):
         """Goes over all children of the root node and calls the appropriate function depending on type of the child"""
         for child in root:
@@ -514,7 +714,12 @@ class XmlParser:
             setattr(self.cls, "_"+self.class_name, gen_klass)
             # recreate the class, to ensure that the metaclass is called!!
             # (otherwise, cls_klass does not have correct _attribute_list, etc.)
-            cls_klass = type(cls_klass.__name__, (gen_klass,) + cls_klass.__bases__, dict(cls_klass.__dict__))
+            # (the __dict__ and __weakref__ descriptors of the old class
+            # do not apply to instances of the new class, so skip them)
+            cls_dict = dict(cls_klass.__dict__)
+            cls_dict.pop("__dict__", None)
+            cls_dict.pop("__weakref__", None)
+            cls_klass = type(cls_klass.__name__, (gen_klass,) + cls_klass.__bases__, cls_dict)
             setattr(self.cls, self.class_name, cls_klass)
             # if the class derives from Data, then make an alias
             if issubclass(cls_klass, pyffi.object_models.FileFormat.Data):
@@ -537,6 +742,8 @@ class XmlParser:
             
     def replace_tokens(self, attr_dict):
         """Update attr_dict with content of tokens+versions list."""
+        if self.tokens_replaced:
+            return attr_dict
         # replace versions after tokens because tokens include versions
         for tokens, target_attribs in self.tokens + self.versions:
             for target_attrib in target_attribs:
@@ -41,6 +41,7 @@
 
 # note: some imports are defined at the end to avoid problems with circularity
 import logging
+import struct
 import weakref
 
 from pyffi.utils.graph import DetailNode, EdgeFilter
@@ -159,6 +160,10 @@ class Array(_ListWrap):
         self._elementTypeArgument = element_type_argument
         self._count1 = count1
         self._count2 = count2
+        # compiled count expressions, used by _len1 and _len2
+        self._count1_function = count1.compile()
+        self._count2_function = (
+            count2.compile() if count2 is not None else None)
 
         if self._count2 is None:
             for i in range(self._len1()):
@@ -181,46 +186,54 @@ class Array(_ListWrap):
     def _len1(self):
         """The length the array should have, obtained by evaluating the count1 expression."""
         if self._parent is None:
-            return self._count1.eval()
+            return self._count1_function()
         else:
-            return self._count1.eval(self._parent())
+            return self._count1_function(self._parent())
 
     def _len2(self, index1):
         """The length the array should have, obtained by evaluating the count2 expression."""
         if self._count2 is None:
             raise ValueError('single array treated as double array (bug?)')
         if self._parent is None:
-            expr = self._count2.eval()
+            expr = self._count2_function()
         else:
-            expr = self._count2.eval(self._parent())
+            expr = self._count2_function(self._parent())
         if isinstance(expr, int):
             return expr
         else:
             return expr[index1]
 
-    def deepcopy(self, block):
-        """Copy attributes from a given array which needs to have at least as many elements (possibly more) as self."""
+    def deepcopy(self, block, memo=None):
+        """Copy attributes from a given array which needs to have at least as many elements (possibly more) as self.
+
+        Packed elements are copied as raw bytes, and values of basic
+        elements are copied directly. The size of the array is updated
+        first, so a packed array is only unpacked when its elements
+        are copied one by one. For C{memo}, see L{StructBase.clone}."""
+        ChangeCounter.count += 1
+        ChangeCounter.link_count += 1
         if self._count2 is None:
-            for i in range(self._len1()):
-                attrvalue = self[i]
-                if isinstance(attrvalue, StructBase):
-                    attrvalue.deepcopy(block[i])
-                elif isinstance(attrvalue, Array):
-                    attrvalue.update_size()
-                    attrvalue.deepcopy(block[i])
-                else:
-                    self[i] = block[i]
+            len1 = self._len1()
+            if (isinstance(block, _PackedArray)
+                and block._elementType is self._elementType
+                and len(block) >= len1):
+                # share the packed bytes, which are immutable
+                raw, byte_order, run = block._packed
+                list.__delitem__(self, slice(None))
+                self.__class__ = _PackedArray
+                self._packed = (raw[:len1 * run.size], byte_order, run)
+                return
+            if isinstance(self, _PackedArray):
+                self._materialize()
+            if isinstance(block, _PackedArray):
+                block._materialize()
+            self.update_size()
+            _copy_elements(self, block, memo)
         else:
-            for i in range(self._len1()):
-                for j in range(self._len2(i)):
-                    attrvalue = self[i][j]
-                    if isinstance(attrvalue, StructBase):
-                        attrvalue.deepcopy(block[i][j])
-                    elif isinstance(attrvalue, Array):
-                        attrvalue.update_size()
-                        attrvalue.deepcopy(block[i][j])
-                    else:
-                        self[i][j] = block[i][j]
+            self.update_size()
+            for elemlist, other in zip(list.__iter__(self),
+                                       list.__iter__(block)):
+                _copy_elements(elemlist, other, memo)
 
     # string of the array
     def __str__(self):
@@ -283,18 +296,33 @@ class Array(_ListWrap):
 
     def read(self, stream, data):
         """Read array from stream."""
+        ChangeCounter.count += 1
+        ChangeCounter.link_count += 1
         # parse arguments
         self._elementTypeArgument = self.arg
 
         # check array size
         len1 = self._len1()
-        self.logger.debug("Reading array of size " + str(len1))
+        self.logger.debug("Reading array of size %i", len1)
         if len1 > 0x10000000:
             raise ValueError('array too long (%i)' % len1)
         del self[0:self.__len__()]
 
         # read array
         if self._count2 is None:
+            # elements of fixed layout are kept packed until accessed
+            run = (_get_fixed_run(self._elementType, data)
+                   if len1 and getattr(data, "use_packed_arrays", False)
+                   else None)
+            if run is not None:
+                raw = stream.read(len1 * run.size)
+                if len(raw) != len1 * run.size:
+                    raise struct.error(
+                        'array requires a buffer of %i bytes'
+                        % (len1 * run.size))
+                self._packed = (raw, data._byte_order, run)
+                self.__class__ = _PackedArray
+                return
             for i in range(len1):
                 elem = self._elementType(
                     template=self._elementTypeTemplate,
@@ -378,6 +406,16 @@ class Array(_ListWrap):
             links.extend(elem.get_refs(data))
         return links
 
+    def get_link_slots(self, data=None):
+        """Return all link slots in the array by calling C{get_link_slots}
+        on all elements of the array."""
+        slots = []
+        if not self._elementType._has_links:
+            return slots
+        for elem in self._elementList():
+            slots.extend(elem.get_link_slots(data))
+        return slots
+
     def get_size(self, data=None):
         """Calculate the sum of the size of all elements in the array."""
         return sum(
@@ -406,5 +444,136 @@ class Array(_ListWrap):
                     yield elem
 
 
-from pyffi.object_models.xml.basic import BasicBase
-from pyffi.object_models.xml.struct_ import StructBase
+def _copy_elements(elemlist, other, memo):
+    """Copy the elements of the list C{other} to the elements of the
+    list C{elemlist}, for L{Array.deepcopy}."""
+    elements = list.__iter__(elemlist)
+    other_elements = list.__iter__(other)
+    element_type = elemlist._elementType
+    if issubclass(element_type, BasicBase):
+        if memo is not None and element_type._has_links:
+            for elem, other_elem in zip(elements, other_elements):
+                elem.set_value(_copy_link(elem, other_elem, memo))
+        else:
+            for elem, other_elem in zip(elements, other_elements):
+                elem.set_value(other_elem.get_value())
+    elif issubclass(element_type, StructBase):
+        for elem, other_elem in zip(elements, other_elements):
+            elem.deepcopy(other_elem, memo)
+    else:
+        for elem, other_elem in zip(elements, other_elements):
+            elem.deepcopy(other_elem)
+
+
+class _PackedArray(Array):
+    """An array of elements of fixed layout, whose elements are still
+    packed in the bytes that were read. All methods which need the
+    elements first unpack them, and turn the instance back into a
+    regular L{Array}. Writing the array, and getting its length or
+    its size, does not need the elements.
+
+    The C{_packed} attribute holds a tuple C{(raw, byte_order, run)},
+    with C{run} the L{_StructRun} of a single element.
+    """
+
+    def _materialize(self):
+        """Create the elements from the packed bytes, and turn the
+        instance into a regular L{Array}."""
+        raw, byte_order, run = self._packed
+        del self._packed
+        self.__class__ = Array
+        assign = run.assign
+        elements = []
+        for values in run.iter_unpack[byte_order](raw):
+            elem = self._elementType(
+                template=self._elementTypeTemplate,
+                argument=self._elementTypeArgument,
+                parent=self)
+            assign(elem, values)
+            elements.append(elem)
+        list.extend(self, elements)
+
+    def __len__(self):
+        raw, byte_order, run = self._packed
+        return len(raw) // run.size
+
+    def read(self, stream, data):
+        """Read array from stream."""
+        del self._packed
+        self.__class__ = Array
+        Array.read(self, stream, data)
+
+    def write(self, stream, data):
+        """Write array to stream."""
+        raw, byte_order, run = self._packed
+        if byte_order != data._byte_order:
+            self._materialize()
+            return self.write(stream, data)
+        self._elementTypeArgument = self.arg
+        len1 = self._len1()
+        if len1 != self.__len__():
+            raise ValueError('array size (%i) different from to field describing number of elements (%i)' %
+                             (self.__len__(), len1))
+        stream.write(raw)
+
+    def get_size(self, data=None):
+        """Calculate the sum of the size of all elements in the array."""
+        raw, byte_order, run = self._packed
+        return len(raw)
+
+
+def _changing(name):
+    """Create a list method which counts a change (see
+    L{ChangeCounter}) before calling the list method."""
+    list_method = getattr(list, name)
+    def method(self, *args, **kwargs):
+        ChangeCounter.count += 1
+        if self._elementType._has_refs:
+            ChangeCounter.link_count += 1
+        return list_method(self, *args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = list_method.__doc__
+    return method
+
+for _name in (
+    "__delitem__", "__iadd__", "__imul__", "append", "extend", "insert",
+    "pop", "remove", "sort", "reverse", "clear"):
+    setattr(_ListWrap, _name, _changing(_name))
+del _name
+
+
+def _materializing(name):
+    """Create a method which unpacks the elements of the array, and then
+    calls the regular method of the array. Packed arrays in the
+    arguments are unpacked too, as list methods access their elements
+    directly."""
+    def method(self, *args, **kwargs):
+        self._materialize()
+        for arg in args:
+            if isinstance(arg, _PackedArray):
+                arg._materialize()
+        return getattr(self, name)(*args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = getattr(Array, name).__doc__
+    return method
+
+for _name in (
+    # list methods
+    "__getitem__", "__setitem__", "__delitem__", "__iter__",
+    "__reversed__", "__contains__", "__eq__", "__ne__", "__lt__",
+    "__le__", "__gt__", "__ge__", "__add__", "__mul__", "__rmul__",
+    "__iadd__", "__imul__", "__repr__", "__reduce_ex__",
+    "append", "extend", "insert", "pop", "remove", "index", "count",
+    "sort", "reverse", "clear", "copy",
+    # array methods
+    "__str__", "update_size", "get_hash",
+    "replace_global_node", "fix_links", "get_links", "get_strings",
+    "get_refs", "get_link_slots", "_elementList",
+    "get_detail_child_nodes", "get_detail_child_names"):
+    setattr(_PackedArray, _name, _materializing(_name))
+del _name
+
+
+from pyffi.object_models.xml.basic import BasicBase, ChangeCounter
+from pyffi.object_models.xml.struct_ import (
+    StructBase, _get_fixed_run, _copy_link)
@@ -41,6 +41,26 @@
 
 from pyffi.utils.graph import DetailNode
 
+class ChangeCounter(object):
+    """Counts the changes of values in all structures and arrays, so
+    results which are computed from these values, such as the hashes of
+    blocks, can be cached for as long as the count does not change.
+    Values are counted as changed when they are read, whenever
+    C{set_value} is called on a basic value or on a bit of a bit
+    structure, when attributes of a structure are replaced, and when
+    the list methods of an array are called. Subclasses of L{BasicBase}
+    must count their changes in C{set_value}.
+
+    Separately, C{link_count} counts only the changes which can change
+    which blocks are linked, or their names: structures and arrays
+    which are read, copied, or replaced, arrays of references whose
+    list methods are called, and references and strings which are set.
+    Indices of blocks by link or name stay valid for as long as this
+    count does not change.
+    """
+    count = 0
+    link_count = 0
+
 class BasicBase(DetailNode):
     """Base class from which all basic types are derived.
 
@@ -125,6 +145,11 @@ class BasicBase(DetailNode):
         object."""
         return []
 
+    def get_link_slots(self, data=None):
+        """Return all objects in this object which hold a link, that is,
+        whose value is a block which can be replaced."""
+        return []
+
     def get_value(self):
         """Return object value."""
         raise NotImplementedError
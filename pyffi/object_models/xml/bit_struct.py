@@ -46,6 +46,7 @@ from functools import partial
 import struct
 
 from pyffi.object_models.editable import EditableSpinBox  # for Bits
+from pyffi.object_models.xml.basic import ChangeCounter
 from pyffi.utils.graph import DetailNode, EdgeFilter
 
 
@@ -111,6 +112,7 @@ class Bits(DetailNode, EditableSpinBox):
 
     def set_value(self, value):
         """Set value to C{value}."""
+        ChangeCounter.count += 1
         if not isinstance(value, int):
             raise TypeError("bitstruct attribute must be integer")
         if value >> self._numbits:
@@ -40,7 +40,7 @@
 import logging
 import struct
 
-from pyffi.object_models.xml.basic import BasicBase
+from pyffi.object_models.xml.basic import BasicBase, ChangeCounter
 from pyffi.object_models.editable import EditableComboBox
 
 class _MetaEnumBase(type):
@@ -140,6 +140,7 @@ class EnumBase(BasicBase, EditableComboBox, metaclass=_MetaEnumBase):
 
     def set_value(self, value):
         """Set value to C{value}."""
+        ChangeCounter.count += 1
         try:
             val = int(value)
         except ValueError:
@@ -40,6 +40,7 @@
 # ***** END LICENSE BLOCK *****
 # --------------------------------------------------------------------------
 
+import keyword
 import re
 import sys  # stderr (for debugging)
 
@@ -78,6 +79,10 @@ class Expression(object):
     operators = set(('==', '!=', '>=', '<=', '&&', '||', '&', '|', '-', '!',
                      '<', '>', '/', '*', '+', '%'))
 
+    # python equivalents of the operators, used by compile
+    # (expressions act on integers, so division rounds down)
+    _python_operators = {'&&': 'and', '||': 'or', '/': '//'}
+
     def __init__(self, expr_str, name_filter=None):
         try:
             left, self._op, right = self._partition(expr_str)
@@ -86,12 +91,85 @@ class Expression(object):
         except:
             print("error while parsing expression '%s'" % expr_str)
             raise
+        # compiled function, see compile
+        self._function = None
 
     def eval(self, data=None):
-        """Evaluate the expression to an integer."""
+        """Evaluate the expression to an integer. The expression is
+        compiled into a python function upon first evaluation.
+        """
+        function = self._function
+        if function is None:
+            function = self.compile()
+        return function(data)
+
+    def compile(self):
+        """Compile the expression into a python function which takes
+        the data as single argument, and which evaluates the expression
+        on that data. Names are resolved by direct attribute access.
+        The function is cached, so compiling is done only once.
+
+        >>> class A(object):
+        ...     x = 3
+        >>> f = Expression('(x + 1) * 2').compile()
+        >>> f(A())
+        8
+        >>> Expression('x.real >= 3').compile()(A())
+        True
+        >>> print(Expression('!((x & 1) || y)')._get_source({}))
+        (not ((data.x & 1) or data.y))
+        """
+        if self._function is None:
+            namespace = {}
+            self._function = eval(
+                compile("lambda data=None: %s" % self._get_source(namespace),
+                        "<expression '%s'>" % self, "eval"),
+                namespace)
+        return self._function
+
+    def _get_source(self, namespace):
+        """Python source code of the expression, evaluated on a variable
+        called C{data}. Types are stored in C{namespace}.
+        """
+        left = self._get_operand_source(self._left, namespace)
+        if not self._op:
+            return left
+        right = self._get_operand_source(self._right, namespace)
+        if self._op == '!':
+            return "(not %s)" % right
+        return "(%s %s %s)" % (
+            left, self._python_operators.get(self._op, self._op), right)
+
+    @staticmethod
+    def _get_operand_source(operand, namespace):
+        """Python source code of an operand of the expression."""
+        if isinstance(operand, Expression):
+            return operand._get_source(namespace)
+        elif isinstance(operand, str):
+            if (not operand) or operand == '""':
+                return '""'
+            source = "data"
+            for part in operand.split("."):
+                if part.isidentifier() and not keyword.iskeyword(part):
+                    source += "." + part
+                else:
+                    source = "getattr(%s, %r)" % (source, part)
+            return source
+        elif isinstance(operand, type):
+            name = "_type%i" % len(namespace)
+            namespace[name] = operand
+            return "isinstance(data, %s)" % name
+        else:
+            # int or None
+            return repr(operand)
+
+    def _eval_tree(self, data=None):
+        """Evaluate the expression by walking the expression tree,
+        without compiling it (used for testing the compiler).
+        """
 
         if isinstance(self._left, Expression):
-            left = self._left.eval(data)
+            left = self._left._eval_tree(data)
         elif isinstance(self._left, str):
             if self._left == '""':
                 left = ""
@@ -111,7 +189,7 @@ class Expression(object):
             return left
 
         if isinstance(self._right, Expression):
-            right = self._right.eval(data)
+            right = self._right._eval_tree(data)
         elif isinstance(self._right, str):
             if (not self._right) or self._right == '""':
                 right = ""
@@ -150,7 +228,7 @@ class Expression(object):
         elif self._op == '<':
             return left < right
         elif self._op == '/':
-            return left / right
+            return left // right
         elif self._op == '*':
             return left * right
         elif self._op == '+':
@@ -341,6 +419,8 @@ class Expression(object):
         return start_pos, end_pos
 
     def map_(self, func):
+        # the function must be compiled again
+        self._function = None
         if isinstance(self._left, Expression):
             self._left.map_(func)
         else:
@@ -40,13 +40,33 @@
 # --------------------------------------------------------------------------
 
 # note: some imports are defined at the end to avoid problems with circularity
+import hashlib
 import logging
+import struct
 from functools import partial
 
 
 from pyffi.utils.graph import DetailNode, GlobalNode, EdgeFilter
 import pyffi.object_models.common
 
+# blake2b is only available from python 3.6, and md5 has the same size
+_new_digest = getattr(hashlib, "blake2b", None)
+if _new_digest is not None:
+    _new_digest = partial(_new_digest, digest_size=16)
+else:
+    _new_digest = hashlib.md5
+
+def _copy_link(attrvalue, other, memo):
+    """Get the value to copy from the link C{other} to the link
+    C{attrvalue}, when cloning with C{memo}, see L{StructBase.clone}."""
+    block = other.get_value()
+    if block is None:
+        return None
+    elif attrvalue._has_refs:
+        return block.clone(memo)
+    else:
+        return memo.get(id(block), block)
+
 class _MetaStructBase(type):
     """This metaclass checks for the presence of _attrs and _is_template
     attributes. For each attribute in _attrs, an
@@ -134,6 +154,10 @@ class _MetaStructBase(type):
         # precalculate the attribute name list
         cls._names = cls._get_names()
 
+        # attribute plans are calculated on demand, per version
+        cls._attribute_plans = {}
+        cls._struct_steps = {}
+
     def __repr__(cls):
         return "<struct '%s'>"%(cls.__name__)
 
@@ -225,6 +249,13 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
     _attrs = []
     _games = {}
     arg = None
+    _template = None
+    """The template type, see L{__init__}."""
+    _cache_hash = False
+    """Whether to keep the hash of instances until any value changes.
+    Set this for blocks, whose hashes are calculated repeatedly."""
+    _hash_cache = None
+    """A tuple C{(key, hash, digest)} with the cached hash."""
     logger = logging.getLogger("pyffi.nif.data.struct")
 
     # initialize all attributes
@@ -245,6 +276,9 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
         names = set()
         # initialize argument
         self.arg = argument
+        # keep template, for clone
+        if template is not None:
+            self._template = template
         # save parent (note: disabled for performance)
         #self._parent = weakref.ref(parent) if parent else None
         # initialize item list
@@ -296,9 +330,13 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
             # add instance to item list
             self._items.append(attr_instance)
 
-    def deepcopy(self, block):
+    def deepcopy(self, block, memo=None):
         """Copy attributes from a given block (one block class must be a
-        subclass of the other). Returns self."""
+        subclass of the other). Returns self.
+
+        Values are copied directly, rather than through the attribute
+        properties. Links are copied as they are, so linked blocks are
+        shared with C{block}, unless C{memo} is given, see L{clone}."""
         # check class lineage
         if isinstance(self, block.__class__):
             attrlist = block._get_filtered_attribute_list()
@@ -307,19 +345,66 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
         else:
             raise ValueError("deepcopy: classes %s and %s unrelated"
                              % (self.__class__.__name__, block.__class__.__name__))
+        # basic values are set directly, so count the change here
+        ChangeCounter.count += 1
+        ChangeCounter.link_count += 1
         # copy the attributes
         for attr in attrlist:
-            attrvalue = getattr(self, attr.name)
-            if isinstance(attrvalue, StructBase):
-                attrvalue.deepcopy(getattr(block, attr.name))
-            elif isinstance(attrvalue, Array):
-                attrvalue.update_size()
-                attrvalue.deepcopy(getattr(block, attr.name))
+            name = "_%s_value_" % attr.name
+            attrvalue = getattr(self, name)
+            other = getattr(block, name)
+            if isinstance(attrvalue, BasicBase):
+                if memo is not None and attrvalue._has_links:
+                    attrvalue.set_value(_copy_link(attrvalue, other, memo))
+                else:
+                    attrvalue.set_value(other.get_value())
+            elif isinstance(attrvalue, (StructBase, Array)):
+                # arrays update their size themselves
+                attrvalue.deepcopy(other, memo)
             else:
-                setattr(self, attr.name, getattr(block, attr.name))
+                attrvalue.deepcopy(other)
 
         return self
 
+    def clone(self, memo=None):
+        """Create a copy of the structure, see L{deepcopy}.
+
+        If C{memo} is a dictionary, then blocks that are linked through
+        refs are cloned as well, and weak pointers are set to the clones
+        of the blocks they point to, if these have been cloned already.
+        The dictionary maps the id of each block to its clone, so every
+        block is cloned only once, even when it is shared.
+
+        >>> from pyffi.formats.nif import NifFormat
+        >>> node = NifFormat.NiNode()
+        >>> child1 = NifFormat.NiNode()
+        >>> child2 = NifFormat.NiNode()
+        >>> shape = NifFormat.NiTriShape()
+        >>> node.add_child(child1)
+        >>> node.add_child(child2)
+        >>> child1.add_child(shape)
+        >>> child2.add_child(shape)
+        >>> node_copy = node.clone()
+        >>> node_copy.children[0] is child1
+        True
+        >>> node_copy = node.clone(memo={})
+        >>> node_copy.children[0] is child1
+        False
+        >>> (node_copy.children[0].children[0]
+        ...  is node_copy.children[1].children[0])
+        True
+        """
+        if memo is not None:
+            try:
+                return memo[id(self)]
+            except KeyError:
+                pass
+        result = self.__class__(template=self._template, argument=self.arg)
+        if memo is not None:
+            # register first, so cycles end at the clone
+            memo[id(self)] = result
+        return result.deepcopy(self, memo)
+
     # string of all attributes
     def __str__(self):
         text = '%s instance at 0x%08X\n' % (self.__class__, id(self))
@@ -356,10 +441,18 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
 
     def read(self, stream, data):
         """Read structure from stream."""
+        ChangeCounter.count += 1
+        ChangeCounter.link_count += 1
+        # only build debug messages if they are actually logged
+        log = self.logger.isEnabledFor(logging.DEBUG)
         # read all attributes
-        for attr in self._get_filtered_attribute_list(data):
-            # skip abstract attributes
-            if attr.is_abstract:
+        for attr, cond, run in (self._get_struct_steps(data)
+                                or self._get_generic_steps(data)):
+            # read fixed layout runs in one go
+            if run is not None:
+                run.read(self, stream, data)
+                continue
+            if cond is not None and not cond(self):
                 continue
             # get attribute argument (can only be done at runtime)
             rt_arg = attr.arg if isinstance(attr.arg, (int, type(None))) \
@@ -369,16 +462,23 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
             attr_value.arg = rt_arg
             # if hasattr(attr, "type_"):
             #     attr_value._elementType = attr.type_
-            self._log_struct(stream, attr)
+            if log:
+                self._log_struct(stream, attr)
             attr_value.read(stream, data)
 
 
     def write(self, stream, data):
         """Write structure to stream."""
+        # only build debug messages if they are actually logged
+        log = self.logger.isEnabledFor(logging.DEBUG)
         # write all attributes
-        for attr in self._get_filtered_attribute_list(data):
-            # skip abstract attributes
-            if attr.is_abstract:
+        for attr, cond, run in (self._get_struct_steps(data)
+                                or self._get_generic_steps(data)):
+            # write fixed layout runs in one go
+            if run is not None:
+                run.write(self, stream, data)
+                continue
+            if cond is not None and not cond(self):
                 continue
             # get attribute argument (can only be done at runtime)
             rt_arg = attr.arg if isinstance(attr.arg, (int, type(None))) \
@@ -387,7 +487,8 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
             attr_value = getattr(self, "_%s_value_" % attr.name)
             attr_value.arg = rt_arg
             getattr(self, "_%s_value_" % attr.name).write(stream, data)
-            self._log_struct(stream, attr)
+            if log:
+                self._log_struct(stream, attr)
 
     def fix_links(self, data):
         """Fix links in the structure."""
@@ -397,7 +498,7 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
             # check if there are any links at all, commonly this speeds things up considerably
             if not attr.type_._has_links:
                 continue
-            self.logger.debug("fixlinks %s" % attr.name)
+            self.logger.debug("fixlinks %s", attr.name)
             # fix the links in the attribute
             getattr(self, "_%s_value_" % attr.name).fix_links(data)
 
@@ -447,27 +548,132 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
         # return the list of all refs in all attributes
         return refs
 
+    def get_link_slots(self, data=None):
+        """Get list of all objects in the structure which hold a link,
+        such as refs and pointers. Unlike :meth:`get_links`, which returns
+        the blocks that are linked to, this returns the objects whose
+        value can be set to another block."""
+        slots = []
+        for attr in self._get_filtered_attribute_list(data):
+            # check if there are any links at all
+            # (this speeds things up considerably)
+            if (not attr.type_ is type(None)) and (not attr.type_._has_links):
+                continue
+            slots.extend(
+                getattr(self, "_%s_value_" % attr.name).get_link_slots(data))
+        return slots
+
+    @classmethod
+    def get_ref_types(cls, template=None, _visited=None):
+        """Get the types of the references of instances of this
+        structure: every item returned by :meth:`get_refs` is an instance
+        of one of these types. The types follow from the attribute types
+        alone, so they hold for all versions. If a reference can have any
+        type, then ``object`` is included.
+
+        :param template: The template type of the structure, if any.
+        :return: The types.
+        :rtype: ``set``
+        """
+        if cls.get_refs is not StructBase.get_refs:
+            # customized, so anything goes
+            return {object}
+        # structures can contain arrays of themselves, so keep track of
+        # the structures that are being visited
+        if _visited is None:
+            _visited = set()
+        elif (cls, template) in _visited:
+            return set()
+        _visited.add((cls, template))
+        ref_types = set()
+        for attr in cls._attribute_list:
+            rt_type = attr.type_ if attr.type_ != type(None) else template
+            rt_template = (attr.template if attr.template != type(None)
+                           else template)
+            if rt_type is None:
+                ref_types.add(object)
+            elif issubclass(rt_type, StructBase):
+                ref_types |= rt_type.get_ref_types(rt_template, _visited)
+            elif rt_type._has_refs:
+                # a reference to an instance of the template type
+                ref_types.add(rt_template if rt_template else object)
+        return ref_types
+
     def get_size(self, data=None):
         """Calculate the structure size in bytes."""
         # calculate size
         size = 0
-        for attr in self._get_filtered_attribute_list(data):
-            # skip abstract attributes
-            if attr.is_abstract:
+        for attr, cond, run in (self._get_struct_steps(data)
+                                or self._get_generic_steps(data)):
+            if run is not None:
+                size += run.size
+                continue
+            if cond is not None and not cond(self):
                 continue
             size += getattr(self, "_%s_value_" % attr.name).get_size(data)
         return size
 
     def get_hash(self, data=None):
-        """Calculate a hash for the structure, as a tuple."""
+        """Calculate a hash for the structure, as a tuple. If
+        C{_cache_hash} is set, then the hash is kept until any value
+        changes, see L{ChangeCounter}."""
+        if self._cache_hash:
+            key = (ChangeCounter.count, self._get_version_key(data))
+            if self._hash_cache is not None and self._hash_cache[0] == key:
+                return self._hash_cache[1]
         # calculate hash
         hsh = []
         for attr in self._get_filtered_attribute_list(data):
             hsh.append(
                 getattr(self, "_%s_value_" % attr.name).get_hash(data))
-        return tuple(hsh)
+        hsh = tuple(hsh)
+        if self._cache_hash:
+            # nothing may have changed while calculating the hash
+            if key[0] == ChangeCounter.count:
+                self._hash_cache = (key, hsh, None)
+        return hsh
+
+    def get_digest(self, data=None):
+        """Calculate a digest of the hash of the structure, as a
+        hexadecimal string of fixed size. Unlike the hash, the digest
+        can be stored and compared between files and between runs, for
+        instance to find blocks which occur in many files. It is cached
+        along with the hash.
+
+        >>> from pyffi.formats.nif import NifFormat
+        >>> prop1 = NifFormat.NiAlphaProperty()
+        >>> prop2 = NifFormat.NiAlphaProperty()
+        >>> len(prop1.get_digest())
+        32
+        >>> prop1.get_digest() == prop2.get_digest()
+        True
+        >>> prop2.threshold = 128
+        >>> prop1.get_digest() == prop2.get_digest()
+        False
+        """
+        hsh = self.get_hash(data)
+        if (self._cache_hash and self._hash_cache is not None
+            and self._hash_cache[1] is hsh
+            and self._hash_cache[2] is not None):
+            return self._hash_cache[2]
+        digest = _new_digest(repr(hsh).encode("utf-8")).hexdigest()
+        if self._cache_hash and self._hash_cache is not None:
+            if self._hash_cache[1] is hsh:
+                self._hash_cache = self._hash_cache[:2] + (digest,)
+        return digest
+
+    @staticmethod
+    def _get_version_key(data):
+        """The fields of C{data} on which the attribute list depends,
+        see L{_get_attribute_plan}."""
+        if data is None:
+            return None
+        return (data.version, data.user_version,
+                getattr(data, "user_version_2", None))
 
     def replace_global_node(self, oldbranch, newbranch, **kwargs):
+        # blocks that are shared by several branches are visited only once
+        kwargs.setdefault("visited", set())
         for attr in self._get_filtered_attribute_list():
             # check if there are any links at all
             # (this speeds things up considerably)
@@ -517,62 +723,180 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
                 names.append(attr.name)
         return names
 
-    def _get_filtered_attribute_list(self, data=None):
-        """Generator for listing all 'active' attributes, that is,
-        attributes whose condition evaluates ``True``, whose version
-        interval contains C{version}, and whose user version is
-        C{user_version}. ``None`` for C{version} or C{user_version} means
-        that these checks are ignored. Duplicate names are skipped as
-        well.
-
-        Note: version and user_version arguments are deprecated, use
-        the data argument instead.
+    @classmethod
+    def _get_attribute_plan(cls, data=None):
+        """Get the list of all attributes whose version interval
+        contains C{data.version}, whose user version is
+        C{data.user_version}, and whose version condition holds for
+        C{data}. Only the C{cond} expressions of these attributes
+        still need to be checked on the instance.
+
+        The result is cached per C{(version, user_version,
+        user_version_2)} triple, so version conditions must only
+        depend on these three fields.
+
+        :param data: The data, or ``None`` to skip all version checks.
+        :return: A tuple C{(attrs, unique)}, where C{attrs} is a tuple of
+            C{(attr, cond)} pairs, with C{cond} the compiled condition of
+            the attribute (or ``None`` if it has no condition), and
+            C{unique} is ``True`` if all attributes have distinct names.
         """
         if data is not None:
             version = data.version
             user_version = data.user_version
+            key = (version, user_version,
+                   getattr(data, "user_version_2", None))
         else:
             version = None
             user_version = None
-        names = set()
-        for attr in self._attribute_list:
-            #print(attr.name, version, attr.ver1, attr.ver2) # debug
-
+            key = None
+        try:
+            return cls._attribute_plans[key]
+        except KeyError:
+            pass
+        attrs = []
+        seen = set()
+        for attr in cls._attribute_list:
+            # python subclasses of generated classes inherit _attrs, so
+            # the same attribute can occur twice: keep the first one only
+            if id(attr) in seen:
+                continue
+            seen.add(id(attr))
             # check version
             if version is not None:
                 if attr.ver1 is not None and version < attr.ver1:
                     continue
                 if attr.ver2 is not None and version > attr.ver2:
                     continue
-            #print("version check passed") # debug
-
             # check user version
             if (attr.userver is not None and user_version is not None
                 and user_version != attr.userver):
                 continue
-            #print("user version check passed") # debug
-
-            # check conditions
-            if attr.cond is not None and not attr.cond.eval(self):
-                continue
-
+            # check version condition
             if (version is not None and user_version is not None
                 and attr.vercond is not None):
                 if not attr.vercond.eval(data):
                     continue
+            attrs.append(
+                (attr, attr.cond.compile() if attr.cond is not None else None))
+        unique = (len(set(attr.name for attr, cond in attrs)) == len(attrs))
+        plan = (tuple(attrs), unique)
+        cls._attribute_plans[key] = plan
+        return plan
 
-            #print("condition passed") # debug
+    def _get_filtered_attribute_list(self, data=None):
+        """Generator for listing all 'active' attributes, that is,
+        attributes whose condition evaluates ``True``, whose version
+        interval contains C{version}, and whose user version is
+        C{user_version}. ``None`` for C{version} or C{user_version} means
+        that these checks are ignored. Duplicate names are skipped as
+        well.
 
-            # skip dupiclate names
+        Note: version and user_version arguments are deprecated, use
+        the data argument instead.
+        """
+        # version checks are done once per version, see _get_attribute_plan
+        attrs, unique = self._get_attribute_plan(data)
+        if unique:
+            for attr, cond in attrs:
+                if cond is None or cond(self):
+                    yield attr
+        else:
+            names = set()
+            for attr, cond in attrs:
+                # check conditions
+                if cond is not None and not cond(self):
+                    continue
+                # skip dupiclate names
+                if attr.name in names:
+                    continue
+                names.add(attr.name)
+                yield attr
 
-            if attr.name in names:
+    @classmethod
+    def _get_struct_steps(cls, data):
+        """Get the steps for reading, writing, and sizing this structure
+        for C{data}, with consecutive unconditional attributes of fixed
+        layout merged into a L{_StructRun}. Each step is a tuple
+        C{(attr, cond, run)}: either C{run} is ``None`` and C{attr} must
+        be handled if its compiled condition C{cond} holds (or is
+        ``None``), or C{run} handles a whole run of attributes.
+
+        Abstract attributes are not included. The result is cached
+        per version, just like L{_get_attribute_plan}.
+
+        :param data: The data.
+        :return: A tuple of steps, or ``None`` if the generic code
+            must be used, for instance because C{data.use_struct_runs}
+            is ``False``, or because some attributes have the same name.
+        """
+        if data is None or not getattr(data, "use_struct_runs", False):
+            return None
+        key = (data.version, data.user_version,
+               getattr(data, "user_version_2", None))
+        try:
+            return cls._struct_steps[key]
+        except KeyError:
+            pass
+        attrs, unique = cls._get_attribute_plan(data)
+        if not unique:
+            cls._struct_steps[key] = None
+            return None
+        steps = []
+        run_attrs = []
+        run_fields = []
+        for attr, cond in attrs:
+            # skip abstract attributes
+            if attr.is_abstract:
                 continue
-            #print("duplicate check passed") # debug
-
-            names.add(attr.name)
-            # passed all tests
-            # so yield the attribute
-            yield attr
+            fields = (cls._get_fixed_layout(attr, data)
+                      if cond is None else None)
+            if fields is not None:
+                run_attrs.append(attr)
+                run_fields.extend(fields)
+                continue
+            if run_attrs:
+                steps.append((None, None, _StructRun(run_attrs, run_fields)))
+                run_attrs = []
+                run_fields = []
+            steps.append((attr, cond, None))
+        if run_attrs:
+            steps.append((None, None, _StructRun(run_attrs, run_fields)))
+        steps = tuple(steps)
+        cls._struct_steps[key] = steps
+        return steps
+
+    @staticmethod
+    def _get_fixed_layout(attr, data):
+        """Get the layout of an unconditional attribute, if its type
+        has a fixed layout, see L{_get_fixed_run}.
+
+        :param attr: The attribute.
+        :param data: The data.
+        :return: A list of C{(path, code)} pairs, where C{path} is a
+            tuple of C{_<name>_value_} attribute names leading to the
+            basic value, and C{code} is its struct format character,
+            or ``None`` if the attribute has no fixed layout.
+        """
+        value_name = "_%s_value_" % attr.name
+        if (attr.arr1 is not None or attr.arg is not None
+            or not value_name.isidentifier()):
+            return None
+        run = _get_fixed_run(attr.type_, data)
+        if run is None:
+            return None
+        return [((value_name,) + path, code) for path, code in run.fields]
+
+    def _get_generic_steps(self, data):
+        """Generator for the steps of the generic code, in the same
+        format as L{_get_struct_steps}, but without runs, and with
+        conditions already evaluated.
+        """
+        for attr in self._get_filtered_attribute_list(data):
+            # skip abstract attributes
+            if attr.is_abstract:
+                continue
+            yield attr, None, None
 
     def get_attribute(self, name):
         """Get a (non-basic) attribute."""
@@ -589,6 +913,8 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
                             % (attr.__class__.__name__,
                                value.__class__.__name__))
         # set it
+        ChangeCounter.count += 1
+        ChangeCounter.link_count += 1
         setattr(self, "_" + name + "_value_", value)
 
     def get_basic_attribute(self, name):
@@ -647,5 +973,117 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
         for branch in self.get_refs():
             yield branch
 
-from pyffi.object_models.xml.basic import BasicBase
+class _StructRun(object):
+    """A run of consecutive structure attributes of fixed layout,
+    which is read and written with a single precompiled struct call.
+    The read and write functions are generated for each run.
+
+    :ivar attrs: The attributes in the run.
+    :ivar fields: List of C{(path, code)} pairs describing each basic
+        value in the run, see L{StructBase._get_fixed_layout}. An
+        empty path refers to the instance itself, which happens for
+        the run of a basic type.
+    :ivar size: Number of bytes occupied by the run.
+    :ivar iter_unpack: Maps byte order to a function which unpacks
+        the values of consecutive runs from a buffer.
+    """
+
+    def __init__(self, attrs, fields):
+        self.attrs = tuple(attrs)
+        self.fields = tuple(fields)
+        fmt = "".join(code for path, code in self.fields)
+        structs = dict((byte_order, struct.Struct(byte_order + fmt))
+                       for byte_order in "<>")
+        self.size = structs["<"].size
+        self.iter_unpack = dict((byte_order, precompiled.iter_unpack)
+                                for byte_order, precompiled in structs.items())
+        values = ", ".join(".".join(("self",) + path + ("_value",))
+                           for path, code in self.fields)
+        namespace = {
+            "_unpack": dict((byte_order, precompiled.unpack)
+                            for byte_order, precompiled in structs.items()),
+            "_pack": dict((byte_order, precompiled.pack)
+                          for byte_order, precompiled in structs.items()),
+            }
+        exec(compile(
+            "def read(self, stream, data):\n"
+            "    (%s,) = _unpack[data._byte_order](stream.read(%i))\n"
+            "def pack(self, data):\n"
+            "    return _pack[data._byte_order](%s)\n"
+            "def assign(self, values):\n"
+            "    (%s,) = values\n"
+            % (values, self.size, values, values),
+            "<struct run '%s'>" % fmt, "exec"), namespace)
+        # stored on the instance, so read is called unbound
+        self.read = namespace["read"]
+        self.assign = namespace["assign"]
+        self._pack = namespace["pack"]
+
+    def write(self, instance, stream, data):
+        """Write the run of the structure C{instance} to C{stream}."""
+        try:
+            packed = self._pack(instance, data)
+        except (struct.error, OverflowError):
+            # let each attribute deal with the problem, for instance,
+            # floats that overflow are written as NaN
+            for attr in self.attrs:
+                getattr(instance, "_%s_value_" % attr.name).write(
+                    stream, data)
+        else:
+            stream.write(packed)
+
+def _get_struct_code(type_):
+    """Get the struct format character of a basic type whose value
+    is read and written with a single struct call, or ``None`` if the
+    type does something else (for instance, because it overrides
+    the read method).
+    """
+    Int = pyffi.object_models.common.Int
+    Float = pyffi.object_models.common.Float
+    if issubclass(type_, Int):
+        base = Int
+    elif issubclass(type_, EnumBase):
+        base = EnumBase
+    elif issubclass(type_, Float):
+        return 'f' if (type_.read is Float.read
+                       and type_.write is Float.write) else None
+    else:
+        return None
+    if type_.read is not base.read or type_.write is not base.write:
+        return None
+    return type_._struct
+
+_basic_runs = {}
+
+def _get_fixed_run(type_, data):
+    """Get the run of a type with fixed layout for C{data}, that is,
+    a basic type which is read and written with a single struct
+    call, or a structure which consists of a single run.
+
+    :param type_: The type.
+    :param data: The data.
+    :return: A L{_StructRun}, or ``None`` if the type has no fixed layout.
+    """
+    if issubclass(type_, BasicBase):
+        code = _get_struct_code(type_)
+        if code is None:
+            return None
+        try:
+            return _basic_runs[code]
+        except KeyError:
+            run = _basic_runs[code] = _StructRun((), [((), code)])
+            return run
+    elif (issubclass(type_, StructBase)
+          and type_.read is StructBase.read
+          and type_.write is StructBase.write
+          and type_.get_size is StructBase.get_size):
+        steps = type_._get_struct_steps(data)
+        if not steps or len(steps) != 1:
+            return None
+        return steps[0][2]
+    else:
+        return None
+
+from pyffi.object_models.xml.basic import BasicBase, ChangeCounter
 from pyffi.object_models.xml.array import Array
+from pyffi.object_models.xml.enum import EnumBase
@@ -47,10 +47,11 @@ toaster.
 
 .. autoclass:: Spell
    :show-inheritance:
-   :members: READONLY, SPELLNAME, data, stream, toaster,
+   :members: READONLY, SPELLNAME, TARGET_TYPES, CHANGES_TOPOLOGY,
+             data, stream, toaster,
              __init__, recurse, _datainspect, datainspect, _branchinspect,
              branchinspect, dataentry, dataexit, branchentry,
-             branchexit, toastentry, toastexit
+             branchexit, toastentry, toastexit, toastresult, toastmerge
 
 Grouping spells together
 ------------------------
@@ -63,6 +64,8 @@ be used for this purpose.
 
 .. autofunction:: SpellGroupSeries
 
+.. autofunction:: SpellGroupFused
+
 .. autoclass:: SpellGroupBase
    :show-inheritance:
    :members:
@@ -80,6 +83,11 @@ be used for this purpose.
    :members:
    :undoc-members:
 
+.. autoclass:: SpellGroupFusedBase
+   :show-inheritance:
+   :members:
+   :undoc-members:
+
 Creating toaster scripts
 ------------------------
 
@@ -138,6 +146,8 @@ the file format class of the files it can toast.
 from configparser import ConfigParser
 from copy import deepcopy
 import gc
+import hashlib  # sha1
+import inspect  # signature
 
 import logging  # Logger
 import concurrent.futures  # ProcessPoolExecutor
@@ -149,9 +159,12 @@ import re  # for regex parsing (--skip, --only)
 import shlex  # shlex.split for parsing option lists in ini files
 import subprocess
 import tempfile
+import time  # perf_counter
 
 import pyffi  # for pyffi.__version__
 import pyffi.object_models  # pyffi.object_models.FileFormat
+import pyffi.utils.manifest  # Manifest
+import pyffi.utils.profiler  # Profiler
 
 
 class Spell(object):
@@ -194,6 +207,29 @@ class Spell(object):
     Override this class attribute when subclassing.
     """
 
+    TARGET_TYPES = None
+    """A ``tuple`` of the branch types that :meth:`branchentry` acts on,
+    or ``None`` if the spell may act on any branch. If specified, then
+    :meth:`recurse` skips all branches that are not of these types and
+    that cannot have a branch of these types below them, as determined
+    from the format description. Override this class attribute when
+    subclassing.
+    """
+
+    CHANGES_TOPOLOGY = False
+    """A ``bool`` which determines whether the spell adds, removes, or
+    replaces branches anywhere else than among the children of the branch
+    that it enters, for instance with
+    :meth:`~pyffi.utils.graph.DetailNode.replace_global_node` on
+    :attr:`data`. Such spells cannot share their traversal of the tree
+    with other spells in a :func:`SpellGroupFused`, and are cast on their
+    own instead. Override this class attribute, and set to ``True``, when
+    subclassing such a spell.
+    """
+
+    _skip_types = frozenset()
+    _log_branches = True
+
     def __init__(self, toaster=None, data=None, stream=None):
         """Initialize the spell data.
 
@@ -258,6 +294,17 @@ class Spell(object):
         """
         return True
 
+    def _get_skip_types(self):
+        """Get the branch classes that :meth:`recurse` need not visit,
+        based on :attr:`TARGET_TYPES`.
+
+        :return: The branch classes to skip.
+        :rtype: ``frozenset``
+        """
+        if self.TARGET_TYPES is None:
+            return frozenset()
+        return self.toaster.get_skip_branch_classes(self.TARGET_TYPES)
+
     def recurse(self, branch=None):
         """Helper function which calls :meth:`_branchinspect` and :meth:`branchinspect`
         on the branch,
@@ -280,30 +327,43 @@ class Spell(object):
             branch = self.data
         # the root data element: datainspect has already been called
         if branch is self.data:
-            self.toaster.msgblockbegin(
-                "--- %s ---" % self.SPELLNAME)
+            start = time.perf_counter()
+            # messages are only formatted if they are logged
+            self._log_branches = self.toaster.is_logging()
+            if self._log_branches:
+                self.toaster.msgblockbegin(
+                    "--- %s ---" % self.SPELLNAME)
             if self.dataentry():
+                self._skip_types = self._get_skip_types()
                 # spell returned True so recurse to children
                 # we use the abstract tree functions to parse the tree
                 # these are format independent!
                 for child in branch.get_global_child_nodes():
-                    self.recurse(child)
+                    if child.__class__ not in self._skip_types:
+                        self.recurse(child)
                 self.dataexit()
-            self.toaster.msgblockend()
+            if self._log_branches:
+                self.toaster.msgblockend()
+            if self.toaster.profiler is not None:
+                self.toaster.profiler.add_spell_time(
+                    self.SPELLNAME, time.perf_counter() - start)
         elif self._branchinspect(branch) and self.branchinspect(branch):
-            self.toaster.msgblockbegin(
-                """~~~ %s [%s] ~~~"""
-                % (branch.__class__.__name__,
-                   branch.get_global_display()))
+            if self._log_branches:
+                self.toaster.msgblockbegin(
+                    """~~~ %s [%s] ~~~"""
+                    % (branch.__class__.__name__,
+                       branch.get_global_display()))
             # cast the spell on the branch
             if self.branchentry(branch):
                 # spell returned True so recurse to children
                 # we use the abstract tree functions to parse the tree
                 # these are format independent!
                 for child in branch.get_global_child_nodes():
-                    self.recurse(child)
+                    if child.__class__ not in self._skip_types:
+                        self.recurse(child)
                 self.branchexit(branch)
-            self.toaster.msgblockend()
+            if self._log_branches:
+                self.toaster.msgblockend()
 
     def dataentry(self):
         """Called before all blocks are recursed.
@@ -388,6 +448,34 @@ class Spell(object):
         """
         pass
 
+    @classmethod
+    def toastresult(cls, toaster):
+        """Called in a worker process after every file, when the
+        toaster runs more than one job. Override this method if the spell
+        aggregates statistics in the toaster: return the statistics gathered
+        since the previous call, and clear them. The main process passes
+        the result to :meth:`toastmerge`, so it must be picklable.
+        The default implementation returns ``None``.
+
+        :param toaster: The toaster of the worker process.
+        :type toaster: :class:`Toaster`
+        :return: The statistics gathered from the last file, or ``None``.
+        """
+        return None
+
+    @classmethod
+    def toastmerge(cls, toaster, result):
+        """Called in the main process for every result of
+        :meth:`toastresult` that is not ``None``, before :meth:`toastexit`
+        is called. Override this method to merge the statistics into the
+        toaster.
+
+        :param toaster: The toaster this spell is called from.
+        :type toaster: :class:`Toaster`
+        :param result: The result of :meth:`toastresult` in a worker process.
+        """
+        pass
+
     @classmethod
     def get_toast_stream(cls, toaster, filename, test_exists=False):
         """Returns the stream that the toaster will write to. The
@@ -455,6 +543,20 @@ class SpellGroupBase(Spell):
         for spellclass in cls.ACTIVESPELLCLASSES:
             spellclass.toastexit(toaster)
 
+    @classmethod
+    def toastresult(cls, toaster):
+        results = [spellclass.toastresult(toaster)
+                   for spellclass in cls.ACTIVESPELLCLASSES]
+        if all(result is None for result in results):
+            return None
+        return results
+
+    @classmethod
+    def toastmerge(cls, toaster, result):
+        for spellclass, spellresult in zip(cls.ACTIVESPELLCLASSES, result):
+            if spellresult is not None:
+                spellclass.toastmerge(toaster, spellresult)
+
 
 class SpellGroupSeriesBase(SpellGroupBase):
     """Base class for running spells in series."""
@@ -516,6 +618,142 @@ class SpellGroupParallelBase(SpellGroupBase):
         for spell in self.spells:
             spell.dataexit()
 
+    def _get_skip_types(self):
+        """Skip the branch classes that all spells skip."""
+        skip_types = None
+        for spell in self.spells:
+            if skip_types is None:
+                skip_types = spell._get_skip_types()
+            else:
+                skip_types &= spell._get_skip_types()
+        return skip_types if skip_types is not None else frozenset()
+
+    @property
+    def changed(self):
+        return any(spell.changed for spell in self.spells)
+
+
+class SpellGroupFusedBase(SpellGroupBase):
+    """Base class for running spells in a single traversal of the tree.
+    Unlike :class:`SpellGroupParallelBase`, every spell only sees the
+    branches that it would see when cast on its own: it is only entered
+    on branches which pass its own :meth:`Spell._branchinspect` and
+    :meth:`Spell.branchinspect`, and below branches for which its own
+    :meth:`Spell.branchentry` returned ``True``. Which spells can act on
+    which branch classes is looked up in a table that is built as the
+    tree is traversed (:meth:`Spell._branchinspect` must only depend on
+    the class of the branch). Spells which declare
+    :attr:`Spell.CHANGES_TOPOLOGY`, and spell groups, are cast on their
+    own, in between the traversals of the other spells.
+    """
+
+    def _get_runs(self):
+        """Split the spells into runs of spells which are cast in the same
+        traversal.
+
+        :return: The runs of spells.
+        :rtype: ``list`` of ``list`` of :class:`Spell`
+        """
+        runs = []
+        run = []
+        for spell in self.spells:
+            if spell.CHANGES_TOPOLOGY or isinstance(spell, SpellGroupBase):
+                if run:
+                    runs.append(run)
+                    run = []
+                runs.append([spell])
+            else:
+                run.append(spell)
+        if run:
+            runs.append(run)
+        return runs
+
+    def recurse(self, branch=None):
+        """Cast all spells, in as few traversals of the tree as possible."""
+        if branch is not None and branch is not self.data:
+            for spell in self.spells:
+                spell.recurse(branch)
+            return
+        for run in self._get_runs():
+            if len(run) == 1:
+                run[0].recurse()
+            else:
+                self._recurse_run(run)
+
+    # the following functions must NEVER be called in fused spells
+    # everything is handled by the recurse function
+
+    def branchinspect(self, branch):
+        raise RuntimeError("use recurse")
+
+    def branchentry(self, branch):
+        raise RuntimeError("use recurse")
+
+    def branchexit(self, branch):
+        raise RuntimeError("use recurse")
+
+    def dataentry(self):
+        raise RuntimeError("use recurse")
+
+    def dataexit(self):
+        raise RuntimeError("use recurse")
+
+    def _recurse_run(self, spells):
+        """Cast the given spells in a single traversal of the tree."""
+        start = time.perf_counter()
+        spellname = " & ".join(spell.SPELLNAME for spell in spells)
+        self._log_branches = self.toaster.is_logging()
+        if self._log_branches:
+            self.toaster.msgblockbegin("--- %s ---" % spellname)
+        spells = tuple(spell for spell in spells if spell.dataentry())
+        if spells:
+            for spell in spells:
+                spell._skip_types = spell._get_skip_types()
+            # maps branch class and active spells to the spells which
+            # can act on the branch
+            dispatch = {}
+            for child in self.data.get_global_child_nodes():
+                self._recurse_branch(child, spells, dispatch)
+            for spell in spells:
+                spell.dataexit()
+        if self._log_branches:
+            self.toaster.msgblockend()
+        if self.toaster.profiler is not None:
+            self.toaster.profiler.add_spell_time(
+                spellname, time.perf_counter() - start)
+
+    def _recurse_branch(self, branch, spells, dispatch):
+        """Cast the given spells on a branch, and recurse into its children
+        for every spell whose :meth:`Spell.branchentry` returns ``True``.
+        """
+        key = (branch.__class__, spells)
+        try:
+            candidates = dispatch[key]
+        except KeyError:
+            candidates = dispatch[key] = tuple(
+                spell for spell in spells
+                if branch.__class__ not in spell._skip_types
+                and spell._branchinspect(branch))
+        spells = tuple(spell for spell in candidates
+                       if spell.branchinspect(branch))
+        if not spells:
+            return
+        if self._log_branches:
+            self.toaster.msgblockbegin(
+                """~~~ %s [%s] ~~~"""
+                % (branch.__class__.__name__,
+                   branch.get_global_display()))
+        # not using a generator: we want all entry code to be executed
+        spells = tuple([spell for spell in spells
+                        if spell.branchentry(branch)])
+        if spells:
+            for child in branch.get_global_child_nodes():
+                self._recurse_branch(child, spells, dispatch)
+            for spell in spells:
+                spell.branchexit(branch)
+        if self._log_branches:
+            self.toaster.msgblockend()
+
     @property
     def changed(self):
         return any(spell.changed for spell in self.spells)
@@ -542,6 +780,20 @@ def SpellGroupParallel(*args):
                  "READONLY": 
                       all(spellclass.READONLY for spellclass in args)})
 
+
+def SpellGroupFused(*args):
+    """Class factory for grouping spells in a single traversal of the tree,
+    see :class:`SpellGroupFusedBase`."""
+    return type("".join(spellclass.__name__ for spellclass in args),
+                (SpellGroupFusedBase,),
+                {"SPELLCLASSES": args,
+                 "SPELLNAME":
+                     " & ".join(spellclass.SPELLNAME for spellclass in args),
+                 "READONLY":
+                      all(spellclass.READONLY for spellclass in args),
+                 "CHANGES_TOPOLOGY":
+                      any(spellclass.CHANGES_TOPOLOGY for spellclass in args)})
+
 class SpellApplyPatch(Spell):
     """A spell for applying a patch on files."""
 
@@ -603,37 +855,83 @@ class fake_logger:
     def setLevel(cls, level):
         cls.level = level
 
+    @classmethod
+    def isEnabledFor(cls, level):
+        return level >= cls.level
 
-def _toaster_job(args):
-    """For multiprocessing. This function creates a new toaster, with the
-    given options and spells, and calls the toaster on filename.
-    """
 
-    class multiprocessing_fake_logger(fake_logger):
-        """Simple logger which works well along with multiprocessing on all platforms."""
-        @classmethod
-        def _log(cls, level, level_str, msg):
-            # do not actually log, just print
-            if level >= cls.level:
-                print("pyffi.toaster:%i:%s:%s"
-                      % (multiprocessing.current_process().pid,
-                         level_str, msg))
-
-    toasterclass, filename, options, spellnames = args
+class _multiprocessing_fake_logger(fake_logger):
+    """Simple logger which works well along with multiprocessing on all platforms."""
+    @classmethod
+    def _log(cls, level, level_str, msg):
+        # do not actually log, just print
+        if level >= cls.level:
+            print("pyffi.toaster:%i:%s:%s"
+                  % (multiprocessing.current_process().pid,
+                     level_str, msg))
+
+
+_toaster = None
+"""The toaster of a worker process, see :func:`_toaster_init`."""
+
+
+def _toaster_init(toasterclass, options, spellnames):
+    """For multiprocessing. This function creates the toaster of a worker
+    process, with the given options and spells, and runs the toast entry
+    code. The toast exit code is only run by the main process, on the
+    results that are merged from all workers.
+    """
+    global _toaster
     toaster = toasterclass(options=options, spellnames=spellnames,
-                           logger=multiprocessing_fake_logger)
+                           logger=_multiprocessing_fake_logger)
+    if options["profile"] or options["profilestats"]:
+        # records are sent to the main process, which writes them
+        toaster.profiler = pyffi.utils.profiler.Profiler(
+            cprofile=bool(options["profilestats"]))
 
     # toast entry code
     if not toaster.spellclass.toastentry(toaster):
         print("pyffi.toaster:%s" % "Spell does not apply! quiting early...")
         return
+    _toaster = toaster
 
-    # toast single file
-    stream = open(filename, mode='rb' if toaster.spellclass.READONLY else 'r+b')
-    toaster._toast(stream)
 
-    # toast exit code
-    toaster.spellclass.toastexit(toaster)
+def _toaster_job(filename):
+    """For multiprocessing. This function calls the toaster of the worker
+    process on filename, and returns the results for the file, as a tuple
+    with the files done, skipped, and failed, the result of
+    :meth:`Spell.toastresult`, the time taken in seconds, and the
+    profile of the file if profiling, to be merged by
+    :meth:`Toaster.merge`.
+    """
+    if _toaster is None:
+        # spell does not apply
+        return None
+
+    # toast single file
+    mode = 'rb' if _toaster.spellclass.READONLY else 'r+b'
+    if _toaster.options["inmemory"]:
+        stream = pyffi.utils.MemoryFile(filename, mode)
+    else:
+        stream = open(filename, mode)
+    start = time.perf_counter()
+    try:
+        _toaster._toast(stream)
+    finally:
+        stream.close()
+    elapsed = time.perf_counter() - start
+    result = (_toaster.files_done, _toaster.files_skipped,
+              _toaster.files_failed,
+              _toaster.spellclass.toastresult(_toaster), elapsed,
+              _toaster.profiler.pop() if _toaster.profiler is not None
+              else None)
+    _toaster.files_done = {}
+    _toaster.files_skipped = set()
+    _toaster.files_failed = set()
+    if _toaster.options["gccollect"]:
+        # force free memory (helps when parsing many files)
+        gc.collect()
+    return result
 
 # CPU_COUNT is used for default number of jobs
 if multiprocessing:
@@ -671,12 +969,15 @@ class Toaster(object):
         helpspell=False, dryrun=False, prefix="", suffix="", arg="",
         createpatch=False, applypatch=False, diffcmd="", patchcmd="",
         series=False,
-        skip=[], only=[],
+        skip=[], only=[], onlytypes=[],
         jobs=CPU_COUNT, refresh=32,
         sourcedir="", destdir="",
         archives=False,
         resume=False,
         gccollect=False,
+        inmemory=False,
+        manifest="",
+        profile="", profilestats="",
         inifile="")
     """List of spell classes of the particular :class:`Toaster` instance."""
 
@@ -686,6 +987,21 @@ class Toaster(object):
     spellnames = []
     """A list of the names of the spells."""
 
+    MANIFEST_IGNORED_OPTIONS = frozenset([
+        "raisetesterror", "verbose", "pause", "examples", "spells",
+        "interactive", "helpspell", "jobs", "refresh", "resume", "gccollect",
+        "inmemory", "manifest", "profile", "profilestats", "inifile"])
+    """Options which do not affect the toasted files, and so are left
+    out of the options hash of the manifest."""
+
+    manifest = None
+    """The :class:`~pyffi.utils.manifest.Manifest` of files that need
+    not be toasted again, while toasting with the manifest option."""
+
+    profiler = None
+    """The :class:`~pyffi.utils.profiler.Profiler` which times every file,
+    while toasting with the profile or profilestats option."""
+
     top = ""
     """Name of the top folder to toast."""
 
@@ -701,12 +1017,20 @@ class Toaster(object):
     exclude_types = []
     """Tuple of types corresponding to the exclude key of :attr:`options`."""
 
+    only_types = []
+    """Tuple of types corresponding to the onlytypes key of :attr:`options`."""
+
     only_regexs = []
     """Tuple of regular expressions corresponding to the only key of :attr:`options`."""
 
     skip_regexs = []
     """Tuple of regular expressions corresponding to the skip key of :attr:`options`."""
 
+    file_times = {}
+    """Dictionary mapping the name of every file toasted by a worker process
+    to its expected and actual toasting time in seconds. The expected time
+    is ``None`` for the first file."""
+
     def __init__(self, spellclass=None, options=None, spellnames=None,
                  logger=None):
         """Initialize the toaster.
@@ -737,6 +1061,7 @@ class Toaster(object):
         self.files_done = {}
         self.files_skipped = set()
         self.files_failed = set()
+        self.file_times = {}
 
     def _update_options(self):
         """Synchronize some fields with given options."""
@@ -760,6 +1085,11 @@ class Toaster(object):
         if self.options["patchcmd"] and not(self.options["applypatch"]):
             raise ValueError(
                 "option --patch-cmd can only be used with --patch")
+        if self.options["onlytypes"] and "only_types" not in (
+                inspect.signature(self.FILEFORMAT.Data.read).parameters):
+            raise ValueError(
+                "option --only-types is not supported for %s files"
+                % self.FILEFORMAT.__name__)
         # multiprocessing available?
         if (multiprocessing is None) and self.options["jobs"] > 1:
             self.logger.warn(
@@ -772,6 +1102,11 @@ class Toaster(object):
         self.exclude_types = tuple(
             getattr(self.FILEFORMAT, block_type)
             for block_type in self.options["exclude"])
+        self.only_types = tuple(
+            getattr(self.FILEFORMAT, block_type)
+            for block_type in self.options["onlytypes"])
+        self._admissible_branch_classes = {}
+        self._skip_branch_classes = {}
         # update skip and only regular expressions
         self.skip_regexs = tuple(
             re.compile(regex) for regex in self.options["skip"])
@@ -818,9 +1153,22 @@ class Toaster(object):
         :param message: The message to write.
         :type message: ``str``
         """
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
         for line in message.split("\n"):
             self.logger.info("  " * self.indent + line)
 
+    def is_logging(self):
+        """Check whether messages written with :meth:`msg` are actually
+        logged. If not, then callers can skip formatting their messages,
+        along with the corresponding :meth:`msgblockbegin` and
+        :meth:`msgblockend` calls.
+
+        :return: ``True`` if info messages are logged.
+        :rtype: ``bool``
+        """
+        return self.logger.isEnabledFor(logging.INFO)
+
     def msgblockbegin(self, message):
         """Acts like :meth:`msg`, but also increases :attr:`indent` after writing the
         message."""
@@ -863,21 +1211,64 @@ class Toaster(object):
         >>> toaster.is_admissible_branch_class(NifFormat.NiAlphaProperty)
         True
         """
-        # print("checking %s" % branchtype.__name__) # debug
-        # check that block is not in exclude...
-        if not issubclass(branchtype, self.exclude_types):
-            # not excluded!
-            # check if it is included
-            if not self.include_types:
-                # if no include list is given, then assume included by default
-                # so, the block is admissible
-                return True
-            elif issubclass(branchtype, self.include_types):
-                # included as well! the block is admissible
-                return True
-        # not admissible
-        # print("not admissible") # debug
-        return False
+        # the result is remembered for every type
+        try:
+            return self._admissible_branch_classes[branchtype]
+        except KeyError:
+            pass
+        self._admissible_branch_classes[branchtype] = admissible = (
+            # check that block is not in exclude...
+            not issubclass(branchtype, self.exclude_types)
+            # and that it is included
+            # (if no include list is given, then assume included by default)
+            and (not self.include_types
+                 or issubclass(branchtype, self.include_types)))
+        return admissible
+
+    def get_skip_branch_classes(self, target_types):
+        """Get the branch classes below which there is no admissible
+        branch of any of the target types, as found from the reference
+        types of the file format (see
+        :meth:`pyffi.object_models.xml.FileFormat.get_reaching_types`).
+        Spells which act on the target types only need not recurse into
+        branches of these classes. The result is remembered for every
+        tuple of target types.
+
+        >>> from pyffi.formats.nif import NifFormat
+        >>> class MyToaster(Toaster):
+        ...     FILEFORMAT = NifFormat
+        >>> toaster = MyToaster()
+        >>> skip_types = toaster.get_skip_branch_classes(
+        ...     (NifFormat.NiMaterialProperty,))
+        >>> NifFormat.NiTriShapeData in skip_types
+        True
+        >>> NifFormat.NiNode in skip_types
+        False
+        >>> toaster = MyToaster(options={"exclude": ["NiNode"]})
+        >>> skip_types = toaster.get_skip_branch_classes(
+        ...     (NifFormat.NiMaterialProperty,))
+        >>> NifFormat.NiNode in skip_types
+        True
+
+        :param target_types: The target types.
+        :type target_types: ``tuple`` of ``type``
+        :return: The branch classes to skip.
+        :rtype: ``frozenset``
+        """
+        try:
+            return self._skip_branch_classes[target_types]
+        except KeyError:
+            pass
+        if hasattr(self.FILEFORMAT, "get_reaching_types"):
+            reaching_types = self.FILEFORMAT.get_reaching_types(
+                target_types, self.is_admissible_branch_class)
+            skip_types = frozenset(
+                struct_type for struct_type in self.FILEFORMAT.xml_struct
+                if struct_type not in reaching_types)
+        else:
+            skip_types = frozenset()
+        self._skip_branch_classes[target_types] = skip_types
+        return skip_types
 
     @staticmethod
     def parse_inifile(option, opt, value, parser, toaster=None):
@@ -977,11 +1368,23 @@ class Toaster(object):
             help="read all options from FILE; if specified, all other arguments"
                  " are ignored; to take options from multiple ini files, specify"
                  " more than once")
+        parser.add_option(
+            "--in-memory", dest="inmemory",
+            action="store_true",
+            help="read each file into memory before parsing it"
+                 " (faster on slow disks, but uses more memory)")
         parser.add_option(
             "-j", "--jobs", dest="jobs",
             type="int",
             metavar="JOBS",
             help="allow JOBS jobs at once [default: %default]")
+        parser.add_option(
+            "--manifest", dest="manifest",
+            type="string",
+            metavar="FILE",
+            help="record toasted files in the database FILE, and skip files"
+                 " that have not changed since they were last toasted with"
+                 " the same spells and options")
         parser.add_option(
             "--noninteractive", dest="interactive",
             action="store_false",
@@ -995,6 +1398,16 @@ class Toaster(object):
                  " (i) contain the regular expression REGEX, and"
                  " (ii) do not contain any regular expression specified with --skip;"
                  " if specified multiple times, the expressions are 'ored'")
+        parser.add_option(
+            "--only-types", dest="onlytypes",
+            type="string",
+            action="append",
+            metavar="BLOCK",
+            help="only parse blocks of type BLOCK when reading a file, and"
+                 " skip files without such blocks; other blocks are only"
+                 " parsed if a spell uses them (nif files of version"
+                 " 20.2.0.7 and up only); parse multiple block types by"
+                 " specifying this option more than once")
         parser.add_option(
             "--overwrite", dest="resume",
             action="store_false",
@@ -1019,6 +1432,20 @@ class Toaster(object):
             metavar="PREFIX",
             help="prepend PREFIX to file name when saving modification"
                  " instead of overwriting the original")
+        parser.add_option(
+            "--profile", dest="profile",
+            type="string",
+            metavar="FILE",
+            help="write the time spent in every stage and spell, the number"
+                 " of blocks, and the peak memory of every file to FILE,"
+                 " as JSON lines, and summarize the slowest files and"
+                 " spells when done")
+        parser.add_option(
+            "--profile-stats", dest="profilestats",
+            type="string",
+            metavar="FILE",
+            help="collect cProfile statistics over all files and processes,"
+                 " and write them to FILE, for use with pstats")
         parser.add_option(
             "-r", "--raise", dest="raisetesterror",
             action="store_true",
@@ -1027,10 +1454,8 @@ class Toaster(object):
             "--refresh", dest="refresh",
             type="int",
             metavar="REFRESH",
-            help="start new process pool every JOBS * REFRESH files"
-                 " if JOBS is 2 or more"
-                 " (when processing a large number of files, this prevents"
-                 " leaking memory on some operating systems) [default: %default]")
+            help="queue at most JOBS * REFRESH files for the worker"
+                 " processes if JOBS is 2 or more [default: %default]")
         parser.add_option(
             "--resume", dest="resume",
             action="store_true",
@@ -1172,25 +1597,6 @@ class Toaster(object):
         :type top: str
         """
 
-        def file_pools(chunksize):
-            """Helper function which generates list of files, sorted by size,
-            in chunks of given size.
-            """
-            all_files = pyffi.utils.walk(
-                top, onerror=None,
-                re_filename=self.FILEFORMAT.RE_FILENAME)
-            while True:
-                # fetch chunksize files from all files
-                file_pool = [
-                    filename for i, filename in zip(
-                        range(chunksize), all_files)]
-                if not file_pool:
-                    # done!
-                    break
-                # sort files by size
-                file_pool.sort(key=os.path.getsize, reverse=True)
-                yield file_pool
-
         # toast entry code
         if not self.spellclass.toastentry(self):
             self.msg("spell does not apply! quiting early...")
@@ -1246,31 +1652,144 @@ class Toaster(object):
                     input("Press enter...")
                 return
 
-        # walk over all streams, and create a data instance for each of them
-        # inspect the file but do not yet read in full
-        if jobs == 1:
-            for stream in self.FILEFORMAT.walk(top, mode='rb' if self.spellclass.READONLY else 'r+b'):
-                self._toast(stream)
-                if self.options["gccollect"]:
-                    # force free memory (helps when parsing many files)
-                    gc.collect()
-        else:
-            chunksize = self.options["refresh"] * self.options["jobs"]
-            self.msg("toasting with %i threads in chunks of %i files"
-                     % (jobs, chunksize))
-            for file_pool in file_pools(chunksize):
-                self.logger.debug("process file pool:")
-                for filename in file_pool:
-                    self.logger.debug("  " + filename)
-                with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
-                    list(executor.map(
-                        _toaster_job,
-                        ((self.__class__, filename, self.options, self.spellnames)
-                         for filename in file_pool)))
+        if self.options["manifest"]:
+            self.manifest = pyffi.utils.manifest.Manifest(
+                self.options["manifest"], ",".join(self.spellnames),
+                self.get_options_hash())
+        if self.options["profile"] or self.options["profilestats"]:
+            self.profiler = pyffi.utils.profiler.Profiler(
+                self.options["profile"],
+                cprofile=bool(self.options["profilestats"]))
+        try:
+            # walk over all streams, and create a data instance for each
+            # of them, inspect the file but do not yet read in full
+            if jobs == 1:
+                for stream in self.FILEFORMAT.walk(
+                        top, mode='rb' if self.spellclass.READONLY else 'r+b',
+                        in_memory=self.options["inmemory"]):
+                    self._toast(stream)
+                    if (self.manifest is not None
+                            and stream.name in self.files_done):
+                        self.manifest.record(stream.name)
+                    if self.options["gccollect"]:
+                        # force free memory (helps when parsing many files)
+                        gc.collect()
+            else:
+                self._toast_jobs(top, jobs)
+        finally:
+            if self.manifest is not None:
+                self.manifest.close()
+                self.manifest = None
+            if self.profiler is not None:
+                self.profiler.close()
 
         # toast exit code
         self.spellclass.toastexit(self)
 
+        if self.profiler is not None:
+            self.msg("\n".join(self.profiler.summary()))
+            if self.options["profilestats"]:
+                self.profiler.dump_stats(self.options["profilestats"])
+            self.profiler = None
+
+    def _toast_jobs(self, top, jobs):
+        """Toast all files under top with a pool of jobs worker processes.
+
+        The whole tree is scanned once, and files are queued largest
+        first, so the slowest files do not end up at the tail of the run
+        while other workers are idle. Workers take the next file from the
+        shared queue as soon as they are done with their previous one.
+        The expected and the actual time of every file are stored in
+        :attr:`file_times`.
+        """
+        files = sorted(
+            pyffi.utils.walk_sizes(
+                top, onerror=None, re_filename=self.FILEFORMAT.RE_FILENAME),
+            key=lambda filename_size: filename_size[1], reverse=True)
+        if self.manifest is not None:
+            num_files = len(files)
+            files = [(filename, size) for filename, size in files
+                     if not self.manifest.is_unchanged(filename)]
+            self.msg("skipping %i unchanged files"
+                     % (num_files - len(files)))
+        # keep a single pool of worker processes for the whole run,
+        # and keep at most max_pending files queued for them
+        max_pending = self.options["refresh"] * jobs
+        self.msg("toasting %i files with %i processes, with up to %i files"
+                 " queued" % (len(files), jobs, max_pending))
+        # total size and time of all finished files, to estimate the time
+        # of the next ones
+        total = [0, 0.0]
+        pending = {}
+
+        def finish(future):
+            filename, size = pending.pop(future)
+            result = future.result()
+            self.merge(result)
+            if result is None:
+                return
+            if self.manifest is not None:
+                for done_filename in result[0]:
+                    self.manifest.record(done_filename)
+            elapsed = result[4]
+            expected = size * total[1] / total[0] if total[0] else None
+            self.file_times[filename] = (expected, elapsed)
+            total[0] += size
+            total[1] += elapsed
+            if expected is not None:
+                self.logger.debug("%s: expected %.3fs, took %.3fs"
+                                  % (filename, expected, elapsed))
+
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=jobs, initializer=_toaster_init,
+                initargs=(self.__class__, self.options,
+                          self.spellnames)) as executor:
+            for filename, size in files:
+                if len(pending) >= max_pending:
+                    done, not_done = concurrent.futures.wait(
+                        pending,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        finish(future)
+                self.logger.debug("queueing %s (%i bytes)" % (filename, size))
+                pending[executor.submit(_toaster_job, filename)] = (
+                    filename, size)
+            for future in concurrent.futures.as_completed(list(pending)):
+                finish(future)
+
+    def get_options_hash(self):
+        """Get a hash of all options which affect the toasted files, that
+        is, all options except for :attr:`MANIFEST_IGNORED_OPTIONS`.
+
+        :return: The hex digest of the options.
+        :rtype: ``str``
+        """
+        options = sorted(
+            (key, value) for key, value in self.options.items()
+            if key not in self.MANIFEST_IGNORED_OPTIONS)
+        return hashlib.sha1(repr(options).encode("utf-8")).hexdigest()
+
+    def merge(self, result):
+        """Merge the result of a file that was toasted by a worker
+        process into this toaster.
+
+        :param result: The files done, skipped, and failed, the result
+            of :meth:`Spell.toastresult`, the time taken, and the profile
+            of the file, or ``None`` if the spell does not apply.
+        :type result: ``tuple``
+        """
+        if result is None:
+            return
+        (files_done, files_skipped, files_failed, spellresult, elapsed,
+         profile) = result
+        self.files_done.update(files_done)
+        self.files_skipped.update(files_skipped)
+        self.files_failed.update(files_failed)
+        if spellresult is not None:
+            self.spellclass.toastmerge(self, spellresult)
+        if profile is not None and self.profiler is not None:
+            self.profiler.merge(profile)
+
     def toast_archives(self, top):
         """Toast all files in all archives."""
         if not self.FILEFORMAT.ARCHIVE_CLASSES:
@@ -1311,6 +1830,12 @@ class Toaster(object):
             self.files_skipped.add(stream.name)
             return
 
+        # check if file has changed since it was last toasted
+        if (self.manifest is not None
+                and self.manifest.is_unchanged(stream.name)):
+            self.msg("=== %s (unchanged) ===" % stream.name)
+            return
+
         # check if file exists
         if self.options["resume"]:
             if self.spellclass.get_toast_stream(self, stream.name, test_exists=True):
@@ -1320,9 +1845,16 @@ class Toaster(object):
         data = self.FILEFORMAT.Data()
 
         self.msgblockbegin("=== %s ===" % stream.name)
+        if self.profiler is not None:
+            self.profiler.begin(stream.name)
+            timer = self.profiler.timer
+        else:
+            timer = pyffi.utils.profiler.no_timer
+        failed = False
         try:
             # inspect the file (reads only the header)
-            data.inspect(stream)
+            with timer("inspect"):
+                data.inspect(stream)
 
             # create spell instance
             spell = self.spellclass(toaster=self, data=data, stream=stream)
@@ -1330,21 +1862,28 @@ class Toaster(object):
             # inspect the spell instance
             if spell._datainspect() and spell.datainspect():
                 # read the full file
-                data.read(stream)
+                with timer("read"):
+                    if self.only_types:
+                        data.read(stream, only_types=self.only_types)
+                    else:
+                        data.read(stream)
                 
                 # cast the spell on the data tree
-                spell.recurse()
+                with timer("recurse"):
+                    spell.recurse()
 
                 # save file back to disk if not readonly and the spell
                 # changed the file
                 if (not self.spellclass.READONLY) and spell.changed:
-                    if self.options["createpatch"]:
-                        self.writepatch(stream, data)
-                    else:
-                        self.write(stream, data)
+                    with timer("write"):
+                        if self.options["createpatch"]:
+                            self.writepatch(stream, data)
+                        else:
+                            self.write(stream, data)
             self.files_done[stream.name] = spell.reports
 
         except Exception as expt:
+            failed = True
             self.files_failed.add(stream.name)
             self.logger.error("FAILED ON {0} - with the follow exception".format(stream.name))
             self.logger.error("EXPT MSG : " + str(expt))
@@ -1354,6 +1893,11 @@ class Toaster(object):
             if self.options["raisetesterror"]:
                 raise
         finally:
+            if self.profiler is not None:
+                blocks = getattr(data, "blocks", None)
+                self.profiler.end(
+                    blocks=len(blocks) if blocks is not None else None,
+                    failed=failed)
             self.msgblockend()
 
     def get_toast_head_root_ext(self, filename):
@@ -1398,6 +1942,10 @@ class Toaster(object):
         file. More specifically, if test_exists is True, then no
         streams are created, and True is returned if the file
         already exists, and False is returned otherwise.
+
+        Except on a dry run, the stream is a
+        :class:`~pyffi.utils.AtomicFile`, which only replaces the
+        destination file when it is closed.
         """
         if self.options["dryrun"]:
             if test_exists:
@@ -1422,41 +1970,34 @@ class Toaster(object):
                 self.msg("overwriting %s" % filename)
             else:
                 self.msg("writing %s" % filename)
-            return open(filename, "wb")
+            return pyffi.utils.AtomicFile(filename)
 
     def write(self, stream, data):
-        """Writes the data to data and raises an exception if the
-        write fails, but restores file if fails on overwrite.
+        """Writes the data to the stream from :meth:`get_toast_stream`
+        and raises an exception if the write fails. The data is written
+        to a temporary file first, which only replaces the destination
+        once it is complete, so if the write fails, then any original
+        file is left untouched.
         """
         outstream = self.spellclass.get_toast_stream(self, stream.name)
-        if stream is outstream:
-            # make backup
-            stream.seek(0)
-            backup = stream.read(-1)
-            stream.seek(0)
         try:
-            try:
-                data.write(outstream)
-            except:  # not just Exception, also CTRL-C
-                self.msg("write failed!!!")
-                if stream is outstream:
-                    self.msg("attempting to restore original file...")
-                    stream.seek(0)
-                    stream.write(backup)
-                    stream.truncate()
-                else:
-                    outstream_name = outstream.name
-                    self.msg("removing incompletely written file...")
-                    outstream.close()
-                    # temporary streams are removed on close
-                    # so check if it exists before removing
-                    if os.path.exists(outstream_name):
-                        os.remove(outstream_name)
-                raise
-            if stream is outstream:
-                stream.truncate()
-        finally:
-            outstream.close()
+            data.write(outstream)
+        except:  # not just Exception, also CTRL-C
+            self.msg("write failed!!!")
+            if isinstance(outstream, pyffi.utils.AtomicFile):
+                self.msg("removing incompletely written file...")
+                outstream.discard()
+            else:
+                # temporary streams are removed on close
+                outstream.close()
+            raise
+        if (isinstance(outstream, pyffi.utils.AtomicFile)
+                and os.path.abspath(outstream.name)
+                == os.path.abspath(stream.name)):
+            # the original file is replaced, and on windows this
+            # fails if it is still open
+            stream.close()
+        outstream.close()
 
     def writepatch(self, stream, data):
         """Creates a binary patch for the updated file."""
@@ -1472,10 +2013,13 @@ class Toaster(object):
             data.write(newfile)
         except: # not just Exception, also CTRL-C
             self.msg("write failed!!!")
+            if isinstance(newfile, pyffi.utils.AtomicFile):
+                newfile.discard()
             raise
         # use external diff command
         oldfile = stream
         oldfilename = oldfile.name
+        newfilename = newfile.name
         patchfilename = newfile.name[:-4] + ".patch"
         # close all files before calling external command
         oldfile.close()
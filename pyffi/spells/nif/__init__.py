@@ -70,6 +70,12 @@ class NifSpell(pyffi.spells.Spell):
         if not pyffi.spells.Spell._datainspect(self):
             return False
 
+        # with --only-types, skip files that have none of these types
+        if (self.toaster.only_types and self.header_types
+            and not any(issubclass(header_type, self.toaster.only_types)
+                        for header_type in self.header_types)):
+            return False
+
         # shortcut for common case (speeds up the check in most cases)
         if not self.toaster.include_types and not self.toaster.exclude_types:
             return True
@@ -116,12 +122,11 @@ class SpellVisitSkeletonRoots(NifSpell):
     def dataentry(self):
         # make list of skeleton roots
         self._skelroots = set()
-        for branch in self.data.get_global_iterator():
-            if isinstance(branch, NifFormat.NiGeometry):
-                if branch.skin_instance:
-                    skelroot = branch.skin_instance.skeleton_root
-                    if skelroot and not(id(skelroot) in self._skelroots):
-                        self._skelroots.add(id(skelroot))
+        for branch in self.data.find_all_of_type(NifFormat.NiGeometry):
+            if branch.skin_instance:
+                skelroot = branch.skin_instance.skeleton_root
+                if skelroot and not(id(skelroot) in self._skelroots):
+                    self._skelroots.add(id(skelroot))
         # only apply spell if there are skeleton roots
         if self._skelroots:
             return True
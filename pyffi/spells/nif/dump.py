@@ -66,7 +66,7 @@ def dumpArray(arr):
     """
     text = ""
     if arr._count2 == None:
-        for i, element in enumerate(list.__iter__(arr)):
+        for i, element in enumerate(arr._elementList()):
             if i > 16:
                 text += "etc...\n"
                 break
@@ -273,6 +273,21 @@ class SpellHtmlReport(NifSpell):
         else:
             toaster.msg('No Report Generated')
 
+    @classmethod
+    def toastresult(cls, toaster):
+        reports_per_blocktype = toaster.reports_per_blocktype
+        toaster.reports_per_blocktype = {}
+        return reports_per_blocktype
+
+    @classmethod
+    def toastmerge(cls, toaster, result):
+        for blocktype, reports in result.items():
+            if blocktype in toaster.reports_per_blocktype:
+                # skip the header row
+                toaster.reports_per_blocktype[blocktype] += reports[1:]
+            else:
+                toaster.reports_per_blocktype[blocktype] = reports
+
     @classmethod
     def browser(cls, htmlstr):
         """Display html in the default web browser without creating a
@@ -443,7 +458,8 @@ class SpellDumpPython(NifSpell):
             if _value:
                 self.print_("%s.update_size()" % name)
                 if _value._count2 is None:
-                    for i, elem in enumerate(list.__iter__(_value)):
+                    # _elementList also unpacks packed arrays
+                    for i, elem in enumerate(_value._elementList()):
                         if self.print_instance(
                             "%s[%i]" % (name, i), elem):
 
@@ -132,6 +132,7 @@ class SpellDelTangentSpace(NifSpell):
 
     SPELLNAME = "fix_deltangentspace"
     READONLY = False
+    TARGET_TYPES = (NifFormat.NiTriBasedGeom,)
 
     def datainspect(self):
         return self.inspectblocktype(NifFormat.NiBinaryExtraData)
@@ -160,6 +161,7 @@ class SpellAddTangentSpace(NifSpell):
 
     SPELLNAME = "fix_addtangentspace"
     READONLY = False
+    TARGET_TYPES = (NifFormat.NiTriBasedGeom,)
 
     def datainspect(self):
         return self.inspectblocktype(NifFormat.NiTriBasedGeom)
@@ -193,6 +195,8 @@ class SpellFFVT3RSkinPartition(NifSpell):
 
     SPELLNAME = "fix_ffvt3rskinpartition"
     READONLY = False
+    TARGET_TYPES = (NifFormat.NiTriBasedGeom,)
+    CHANGES_TOPOLOGY = True
 
     def datainspect(self):
         return self.inspectblocktype(NifFormat.NiSkinInstance)
@@ -224,6 +228,7 @@ class SpellParseTexturePath(NifSpell):
 
     # abstract spell, so no spell name
     READONLY = False
+    TARGET_TYPES = (NifFormat.NiSourceTexture, NifFormat.BSShaderTextureSet)
 
     def substitute(self, old_path):
         """Helper function to allow subclasses of this spell to
@@ -305,6 +310,7 @@ class SpellDetachHavokTriStripsData(NifSpell):
 
     SPELLNAME = "fix_detachhavoktristripsdata"
     READONLY = False
+    TARGET_TYPES = (NifFormat.bhkNiTriStripsShape,)
 
     def __init__(self, *args, **kwargs):
         NifSpell.__init__(self, *args, **kwargs)
@@ -348,6 +354,7 @@ class SpellClampMaterialAlpha(NifSpell):
 
     SPELLNAME = "fix_clampmaterialalpha"
     READONLY = False
+    TARGET_TYPES = (NifFormat.NiMaterialProperty,)
 
     def datainspect(self):
         # only run the spell if there are material property blocks
@@ -422,6 +429,7 @@ class SpellMergeSkeletonRoots(NifSpell):
     """
     SPELLNAME = "fix_mergeskeletonroots"
     READONLY = False
+    CHANGES_TOPOLOGY = True
 
     def datainspect(self):
         # only run the spell if there are skinned geometries
@@ -430,12 +438,11 @@ class SpellMergeSkeletonRoots(NifSpell):
     def dataentry(self):
         # make list of skeleton roots
         skelroots = []
-        for branch in self.data.get_global_iterator():
-            if isinstance(branch, NifFormat.NiGeometry):
-                if branch.skin_instance:
-                    skelroot = branch.skin_instance.skeleton_root
-                    if skelroot and not skelroot in skelroots:
-                        skelroots.append(skelroot)
+        for branch in self.data.find_all_of_type(NifFormat.NiGeometry):
+            if branch.skin_instance:
+                skelroot = branch.skin_instance.skeleton_root
+                if skelroot and not skelroot in skelroots:
+                    skelroots.append(skelroot)
         # find the 'root' skeleton roots (those that have no other skeleton
         # roots as child)
         self.skelrootlist = set()
@@ -762,6 +769,7 @@ class SpellDelUnusedRoots(pyffi.spells.nif.NifSpell):
 
     SPELLNAME = "fix_delunusedroots"
     READONLY = False
+    CHANGES_TOPOLOGY = True
 
     def datainspect(self):
         if self.inspectblocktype(NifFormat.NiAVObject):
@@ -803,6 +811,7 @@ class SpellFixBhkSubShapes(NifSpell):
 
     SPELLNAME = "fix_bhksubshapes"
     READONLY = False
+    TARGET_TYPES = (NifFormat.bhkPackedNiTriStripsShape,)
 
     def datainspect(self):
         return self.inspectblocktype(NifFormat.bhkPackedNiTriStripsShape)
@@ -857,6 +866,7 @@ class SpellFixEmptySkeletonRoots(NifSpell):
 
     SPELLNAME = "fix_emptyskeletonroots"
     READONLY = False
+    TARGET_TYPES = (NifFormat.NiSkinInstance,)
 
     def datainspect(self):
         # only run the spell if there is a skin instance block
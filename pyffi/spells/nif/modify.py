@@ -531,6 +531,7 @@ class SpellDelBranches(NifSpell):
 
     SPELLNAME = "modify_delbranches"
     READONLY = False
+    CHANGES_TOPOLOGY = True
 
     def is_branch_to_be_deleted(self, branch):
         """Returns ``True`` for those branches that must be deleted.
@@ -1130,6 +1131,7 @@ class SpellDelInterpolatorTransformData(NifSpell):
 
     SPELLNAME = "modify_delinterpolatortransformdata"
     READONLY = False
+    CHANGES_TOPOLOGY = True
 
     @classmethod
     def toastentry(cls, toaster):
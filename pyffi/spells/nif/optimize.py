@@ -96,6 +96,7 @@ class SpellCleanRefLists(pyffi.spells.nif.NifSpell):
 
     SPELLNAME = "opt_cleanreflists"
     READONLY = False
+    TARGET_TYPES = (NifFormat.NiObjectNET,)
 
     def datainspect(self):
         # see MadCat221's metstaff.nif:
@@ -161,11 +162,14 @@ class SpellMergeDuplicates(pyffi.spells.nif.NifSpell):
 
     SPELLNAME = "opt_mergeduplicates"
     READONLY = False
+    CHANGES_TOPOLOGY = True
 
     def __init__(self, *args, **kwargs):
         pyffi.spells.nif.NifSpell.__init__(self, *args, **kwargs)
-        # list of all branches visited so far
-        self.branches = []
+        # all branches visited so far, by interchangeable key
+        self.branches = {}
+        # maps id of each duplicate branch to the branch replacing it
+        self.replacements = {}
 
     def datainspect(self):
         # see MadCat221's metstaff.nif:
@@ -186,29 +190,41 @@ class SpellMergeDuplicates(pyffi.spells.nif.NifSpell):
                                    NifFormat.NiGeometryData))
 
     def branchentry(self, branch):
-        for otherbranch in self.branches:
-            if (branch is not otherbranch and
-                branch.is_interchangeable(otherbranch)):
-                # skip properties that have controllers (the
-                # controller data cannot always be reliably checked,
-                # see also issue #2106668)
-                if (isinstance(branch, NifFormat.NiProperty)
-                    and branch.controller):
-                    continue
-                # skip BSShaderProperty blocks (see niftools issue #3009832)
-                if isinstance(branch, NifFormat.BSShaderProperty):
-                    continue
-                # interchangeable branch found!
-                self.toaster.msg("removing duplicate branch")
-                self.data.replace_global_node(branch, otherbranch)
-                self.changed = True
-                # branch has been replaced, so no need to recurse further
-                return False
-        else:
-            # no duplicate found, add to list of visited branches
-            self.branches.append(branch)
-            # continue recursion
+        if id(branch) in self.replacements:
+            # duplicate already found through another parent
+            return False
+        key = branch.get_interchangeable_key()
+        if key is None:
+            # only interchangeable with itself
             return True
+        otherbranches = self.branches.setdefault(key, [])
+        # skip properties that have controllers (the
+        # controller data cannot always be reliably checked,
+        # see also issue #2106668)
+        # skip BSShaderProperty blocks (see niftools issue #3009832)
+        if not ((isinstance(branch, NifFormat.NiProperty)
+                 and branch.controller)
+                or isinstance(branch, NifFormat.BSShaderProperty)):
+            for otherbranch in otherbranches:
+                if (branch is not otherbranch and
+                    branch.is_interchangeable(otherbranch)):
+                    # interchangeable branch found!
+                    self.toaster.msg("removing duplicate branch")
+                    self.replacements[id(branch)] = (branch, otherbranch)
+                    self.changed = True
+                    # branch has been replaced, so no need to recurse further
+                    return False
+        # no duplicate found, add to list of visited branches
+        otherbranches.append(branch)
+        # continue recursion
+        return True
+
+    def dataexit(self):
+        # replace all duplicates in a single pass over the tree
+        if self.replacements:
+            self.data.replace_global_nodes(self.replacements.values())
+            self.replacements = {}
+        pyffi.spells.nif.NifSpell.dataexit(self)
 
 class SpellOptimizeGeometry(pyffi.spells.nif.NifSpell):
     """Optimize all geometries:
@@ -220,6 +236,7 @@ class SpellOptimizeGeometry(pyffi.spells.nif.NifSpell):
 
     SPELLNAME = "opt_geometry"
     READONLY = False
+    CHANGES_TOPOLOGY = True
 
     # spell parameters
     VERTEXPRECISION = 3
@@ -522,6 +539,7 @@ class SpellSplitGeometry(pyffi.spells.nif.NifSpell):
     """
     SPELLNAME = "opt_split"
     READONLY = False
+    CHANGES_TOPOLOGY = True
     THRESHOLD_RADIUS = 100 #: Threshold where to split geometry.
 
     # XXX todo
@@ -599,7 +617,7 @@ class SpellSplitGeometry(pyffi.spells.nif.NifSpell):
         # this will be used as the list of triangles still to add
         triangles = geom.data.get_triangles()
         node = NifFormat.NiNode().deepcopy(
-            NifFormat.NiAVObject.deepcopy(geom))
+            NifFormat.NiAVObject().deepcopy(geom))
         geomsplit = None
         # while there are still triangles to add...
         while triangles:
@@ -684,6 +702,7 @@ class SpellDelUnusedBones(pyffi.spells.nif.NifSpell):
 
     SPELLNAME = "opt_delunusedbones"
     READONLY = False
+    CHANGES_TOPOLOGY = True
 
     def datainspect(self):
         # only run the spell if there are skinned geometries
@@ -719,6 +738,7 @@ class SpellDelZeroScale(pyffi.spells.nif.NifSpell):
 
     SPELLNAME = "opt_delzeroscale"
     READONLY = False
+    CHANGES_TOPOLOGY = True
 
     def datainspect(self):
         # only run the spell if there are scaled objects
@@ -768,6 +788,7 @@ class SpellOptimizeCollisionBox(pyffi.spells.nif.NifSpell):
     """
     SPELLNAME = "opt_collisionbox"
     READONLY = False
+    CHANGES_TOPOLOGY = True
     VERTEXPRECISION = 3
 
     def __init__(self, *args, **kwargs):
@@ -935,6 +956,7 @@ class SpellOptimizeCollisionGeometry(pyffi.spells.nif.NifSpell):
 
     SPELLNAME = "opt_collisiongeometry"
     READONLY = False
+    CHANGES_TOPOLOGY = True
     VERTEXPRECISION = 3
 
     def __init__(self, *args, **kwargs):
@@ -1299,7 +1321,7 @@ class SpellOptimizeAnimation(pyffi.spells.nif.NifSpell):
 class SpellOptimize(
     pyffi.spells.SpellGroupSeries(
         pyffi.spells.nif.modify.SpellCleanFarNif,
-        pyffi.spells.SpellGroupParallel(
+        pyffi.spells.SpellGroupFused(
             pyffi.spells.nif.fix.SpellDelUnusedRoots,
             SpellCleanRefLists,
             pyffi.spells.nif.fix.SpellDetachHavokTriStripsData,
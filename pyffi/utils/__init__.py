@@ -41,8 +41,10 @@
 #
 # ***** END LICENSE BLOCK *****
 
+import io
 import os
 from distutils.cmd import Command
+import tempfile
 
 
 class BuildDoc(Command): # pragma: no cover
@@ -99,6 +101,58 @@ def walk(top, topdown=True, onerror=None, re_filename=None):
                     yield os.path.join(dirpath, filename)
 
 
+def walk_sizes(top, onerror=None, re_filename=None):
+    """Like :func:`walk`, but yields pairs of full path and file size.
+    The tree is scanned with :func:`os.scandir`, so the size of every file
+    comes from the directory scan rather than from a separate call to
+    :func:`os.stat` on most platforms.
+
+    >>> import tempfile
+    >>> top = tempfile.mkdtemp()
+    >>> os.mkdir(os.path.join(top, "sub"))
+    >>> for name, size in (("b.txt", 3), ("a.txt", 1), ("sub/c.txt", 2)):
+    ...     with open(os.path.join(top, name), "wb") as f:
+    ...         f.write(b"x" * size) and None
+    >>> sorted((os.path.relpath(name, top), size)
+    ...        for name, size in walk_sizes(top))
+    [('a.txt', 1), ('b.txt', 3), ('sub/c.txt', 2)]
+    >>> import shutil
+    >>> shutil.rmtree(top)
+
+    :param top: The top directory or file.
+    :type top: str
+    :param onerror: Which function to call when an error occurs.
+    :type onerror: function
+    :param re_filename: Regular expression to match file names.
+    :type re_filename: compiled regular expression (see re module)
+    """
+    if os.path.isfile(top):
+        if not re_filename or re_filename.match(os.path.basename(top)):
+            yield top, os.path.getsize(top)
+        return
+    try:
+        entries = sorted(os.scandir(top), key=lambda entry: entry.name)
+    except OSError as err:
+        if onerror is not None:
+            onerror(err)
+        return
+    dirs = []
+    for entry in entries:
+        try:
+            if entry.is_dir():
+                # like walk, do not follow links to folders
+                if not entry.is_symlink():
+                    dirs.append(entry.path)
+            elif not re_filename or re_filename.match(entry.name):
+                yield entry.path, entry.stat().st_size
+        except OSError as err:
+            if onerror is not None:
+                onerror(err)
+    for dirpath in dirs:
+        for filename_size in walk_sizes(dirpath, onerror, re_filename):
+            yield filename_size
+
+
 # table = "."*32
 # for c in [chr(i) for i in range(32,128)]:
 #     table += c
@@ -106,6 +160,149 @@ def walk(top, topdown=True, onerror=None, re_filename=None):
 chartable = '................................ !"#$%&\'()*+,-./0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_`abcdefghijklmnopqrstuvwxyz{|}~.................................................................................................................................'.encode("ascii")
 
 
+class MemoryFile(io.BytesIO):
+    """A file whose contents are read into memory when it is opened,
+    so parsing it does not go back to the operating system for every
+    small read. Writes go to both the memory buffer and the file on disk.
+
+    >>> import tempfile
+    >>> with tempfile.NamedTemporaryFile(delete=False) as f:
+    ...     f.write(b"abcdef") and None
+    >>> stream = MemoryFile(f.name, "r+b")
+    >>> stream.read(3)
+    b'abc'
+    >>> stream.write(b"X") and None
+    >>> stream.truncate() and None
+    >>> stream.getvalue()
+    b'abcX'
+    >>> stream.close()
+    >>> with open(f.name, "rb") as g:
+    ...     g.read()
+    b'abcX'
+    >>> os.remove(f.name)
+    """
+
+    def __init__(self, name, mode='rb'):
+        if 'r' not in mode or 'b' not in mode:
+            raise ValueError("invalid mode for memory file: %s" % mode)
+        self._file = open(name, mode)
+        try:
+            io.BytesIO.__init__(self, self._file.read())
+        except:
+            self._file.close()
+            raise
+        self.name = name
+        self.mode = mode
+
+    def write(self, b):
+        self._file.seek(self.tell())
+        self._file.write(b)
+        return io.BytesIO.write(self, b)
+
+    def truncate(self, size=None):
+        if size is None:
+            size = self.tell()
+        self._file.truncate(size)
+        return io.BytesIO.truncate(self, size)
+
+    def flush(self):
+        self._file.flush()
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+        io.BytesIO.close(self)
+
+
+class AtomicFile(object):
+    """A file for writing, which is written to a temporary file in the same
+    folder, and which replaces the file of the given name only when it is
+    closed, so the file is never left half written. Call :meth:`discard`
+    instead of :meth:`close` to remove the temporary file, and to leave
+    the original file untouched.
+
+    >>> with tempfile.NamedTemporaryFile(delete=False) as f:
+    ...     f.write(b"abcdef") and None
+    >>> stream = AtomicFile(f.name)
+    >>> stream.write(b"ghi") and None
+    >>> with open(f.name, "rb") as g:
+    ...     g.read()
+    b'abcdef'
+    >>> stream.close()
+    >>> with open(f.name, "rb") as g:
+    ...     g.read()
+    b'ghi'
+    >>> stream = AtomicFile(f.name)
+    >>> stream.write(b"jkl") and None
+    >>> stream.discard()
+    >>> with open(f.name, "rb") as g:
+    ...     g.read()
+    b'ghi'
+    >>> os.path.exists(stream.temp_name)
+    False
+    >>> os.remove(f.name)
+    """
+
+    def __init__(self, name):
+        head, tail = os.path.split(name)
+        fd, self.temp_name = tempfile.mkstemp(
+            prefix="." + tail + ".", suffix=".tmp", dir=head or os.curdir)
+        self._file = os.fdopen(fd, "w+b")
+        self.name = name
+        self.mode = "wb"
+
+    def __getattr__(self, name):
+        # seek, tell, and so on
+        return getattr(self._file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _type, value, traceback):
+        if _type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def write(self, b):
+        return self._file.write(b)
+
+    def close(self):
+        """Write the temporary file to disk, and rename it to the file."""
+        if self._file.closed:
+            return
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            # mkstemp only gives access to the owner
+            if os.path.exists(self.name):
+                mode = os.stat(self.name).st_mode & 0o7777
+            else:
+                umask = os.umask(0)
+                os.umask(umask)
+                mode = 0o666 & ~umask
+            os.chmod(self.temp_name, mode)
+            os.replace(self.temp_name, self.name)
+        except:  # not just Exception, also CTRL-C
+            self.discard()
+            raise
+
+    def discard(self):
+        """Close and remove the temporary file."""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.temp_name):
+            os.remove(self.temp_name)
+
+
 def hex_dump(f, num_lines=8):
     """A function for hexdumping."""
 
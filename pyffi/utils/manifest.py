@@ -0,0 +1,192 @@
+"""A persistent record of toasted files, so unchanged files can be skipped
+when the same spells are cast again.
+
+The manifest is a SQLite database with one row per file: its path, size,
+modification time, and content hash, along with the pyffi version, the
+spells, and a hash of the options that it was toasted with.
+
+>>> import os
+>>> import tempfile
+>>> top = tempfile.mkdtemp()
+>>> filename = os.path.join(top, "test.nif")
+>>> with open(filename, "wb") as f:
+...     f.write(b"abc") and None
+>>> with Manifest(os.path.join(top, "manifest.db"),
+...               "fix_strip", "0123") as manifest:
+...     manifest.is_unchanged(filename)
+...     manifest.record(filename)
+...     manifest.is_unchanged(filename)
+False
+True
+>>> with Manifest(os.path.join(top, "manifest.db"),
+...               "fix_strip", "0123") as manifest:
+...     manifest.is_unchanged(filename)
+True
+>>> with Manifest(os.path.join(top, "manifest.db"),
+...               "fix_strip,opt_geometry", "0123") as manifest:
+...     manifest.is_unchanged(filename)
+False
+>>> with open(filename, "wb") as f:
+...     f.write(b"abd") and None
+>>> with Manifest(os.path.join(top, "manifest.db"),
+...               "fix_strip", "0123") as manifest:
+...     manifest.is_unchanged(filename)
+False
+>>> import shutil
+>>> shutil.rmtree(top)
+"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import hashlib
+import os
+import sqlite3
+
+import pyffi
+
+
+def file_hash(filename):
+    """Return the sha1 hex digest of the contents of a file.
+
+    :param filename: The name of the file.
+    :type filename: ``str``
+    :return: The hex digest.
+    :rtype: ``str``
+    """
+    sha1 = hashlib.sha1()
+    with open(filename, "rb") as stream:
+        for chunk in iter(lambda: stream.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class Manifest(object):
+    """A SQLite database of files that were toasted with a particular
+    spell configuration.
+    """
+
+    COMMIT_INTERVAL = 100
+    """Number of records after which the database is committed, so an
+    interrupted run does not lose all of its records."""
+
+    def __init__(self, filename, spells, options):
+        """Open the manifest, creating it if it does not exist.
+
+        :param filename: The name of the database file.
+        :type filename: ``str``
+        :param spells: The spells that are cast, for instance as comma
+            separated names.
+        :type spells: ``str``
+        :param options: A hash of the options that affect the result.
+        :type options: ``str``
+        """
+        self.spells = spells
+        self.options = options
+        self.version = pyffi.__version__
+        self.num_uncommitted = 0
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, hash TEXT,"
+            " version TEXT, spells TEXT, options TEXT)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _type, value, traceback):
+        self.close()
+        return False
+
+    def is_unchanged(self, filename):
+        """Check whether a file was recorded with the same contents and
+        the same spell configuration. If only the modification time
+        changed, then the file is hashed to compare its contents.
+
+        :param filename: The name of the file.
+        :type filename: ``str``
+        :return: ``True`` if the file need not be toasted again.
+        :rtype: ``bool``
+        """
+        path = os.path.abspath(filename)
+        row = self.connection.execute(
+            "SELECT size, mtime, hash, version, spells, options FROM files"
+            " WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return False
+        size, mtime, hash_, version, spells, options = row
+        if (version, spells, options) != (
+                self.version, self.spells, self.options):
+            return False
+        stat = os.stat(path)
+        if stat.st_size != size:
+            return False
+        if stat.st_mtime_ns == mtime:
+            return True
+        if file_hash(path) != hash_:
+            return False
+        # same contents, so remember the new time to avoid hashing again
+        self.connection.execute(
+            "UPDATE files SET mtime = ? WHERE path = ?",
+            (stat.st_mtime_ns, path))
+        self._changed()
+        return True
+
+    def record(self, filename):
+        """Record the current state of a file, after it has been toasted.
+
+        :param filename: The name of the file.
+        :type filename: ``str``
+        """
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime_ns, file_hash(path),
+             self.version, self.spells, self.options))
+        self._changed()
+
+    def _changed(self):
+        self.num_uncommitted += 1
+        if self.num_uncommitted >= self.COMMIT_INTERVAL:
+            self.connection.commit()
+            self.num_uncommitted = 0
+
+    def close(self):
+        """Commit all records and close the database."""
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,286 @@
+"""Record where the time goes while toasting files.
+
+For every file, the :class:`Profiler` records the time spent in each stage
+of toasting (inspecting, reading, casting the spells, and writing), the
+time spent in every spell, the number of blocks, and the peak memory of
+the process. Records are written as JSON lines, one line per file.
+Optionally, :mod:`cProfile` statistics are collected as well, and merged
+over all files, also when files are toasted by worker processes.
+
+>>> import json
+>>> import os
+>>> import tempfile
+>>> top = tempfile.mkdtemp()
+>>> with Profiler(os.path.join(top, "profile.jsonl")) as profiler:
+...     profiler.begin("test.nif")
+...     with profiler.timer("read"):
+...         pass
+...     profiler.add_spell_time("fix_strip", 0.5)
+...     profiler.end(blocks=3)
+>>> with open(os.path.join(top, "profile.jsonl")) as stream:
+...     record = json.loads(stream.readline())
+>>> record["file"], record["blocks"], sorted(record["times"])
+('test.nif', 3, ['read', 'total'])
+>>> record["spells"]
+{'fix_strip': 0.5}
+>>> profiler.summary() # doctest: +ELLIPSIS
+['slowest files:', '  ...s test.nif', 'slowest spells:', '  0.500s fix_strip (1 files)']
+>>> import shutil
+>>> shutil.rmtree(top)
+"""
+
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import cProfile
+import json
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # not available on windows
+    resource = None
+
+
+def peak_rss():
+    """Return the peak resident set size of the current process.
+
+    :return: The peak memory in kilobytes, or ``None`` if it is not
+        available on this platform.
+    :rtype: ``int``
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on mac os x, kilobytes elsewhere
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+@contextmanager
+def no_timer(stage):
+    """Context manager with the signature of :meth:`Profiler.timer`, for
+    when there is no profiler.
+    """
+    yield
+
+
+class _RawStats(object):
+    """Wraps the raw statistics of a profile, as they are sent by a worker
+    process, so they can be loaded by :class:`pstats.Stats`."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class Profiler(object):
+    """Times the stages of toasting, per file and per spell."""
+
+    def __init__(self, filename=None, cprofile=False):
+        """Initialize the profiler.
+
+        :param filename: The name of the file to which the records are
+            written as JSON lines, or ``None`` to only keep the records
+            in :attr:`records`.
+        :type filename: ``str``
+        :param cprofile: Whether to collect :mod:`cProfile` statistics.
+        :type cprofile: ``bool``
+        """
+        self.records = []
+        """List of records of all files, as ``dict``."""
+        self.stats = None
+        """The merged :class:`pstats.Stats` of all files, or ``None``."""
+        self.cprofile = cprofile
+        self.stream = open(filename, "w") if filename else None
+        self._record = None
+        self._profile = None
+        self._start = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _type, value, traceback):
+        self.close()
+        return False
+
+    def begin(self, filename):
+        """Start the record of a file.
+
+        :param filename: The name of the file.
+        :type filename: ``str``
+        """
+        self._record = dict(file=filename, times={}, spells={},
+                            blocks=None, rss=None, failed=False)
+        if self.cprofile:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def timer(self, stage):
+        """Context manager which adds the time spent in its body to the
+        given stage of the current file.
+
+        :param stage: The name of the stage, such as ``"read"``.
+        :type stage: ``str``
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            times = self._record["times"]
+            times[stage] = (
+                times.get(stage, 0.0) + time.perf_counter() - start)
+
+    def add_spell_time(self, spellname, elapsed):
+        """Add the time spent in a spell to the current file.
+
+        :param spellname: The name of the spell.
+        :type spellname: ``str``
+        :param elapsed: The time in seconds.
+        :type elapsed: ``float``
+        """
+        spells = self._record["spells"]
+        spells[spellname] = spells.get(spellname, 0.0) + elapsed
+
+    def end(self, blocks=None, failed=False):
+        """Finish the record of the current file.
+
+        :param blocks: The number of blocks of the file, if known.
+        :type blocks: ``int``
+        :param failed: Whether toasting the file failed.
+        :type failed: ``bool``
+        """
+        record = self._record
+        record["times"]["total"] = time.perf_counter() - self._start
+        if self._profile is not None:
+            self._profile.disable()
+            if self.stats is None:
+                self.stats = pstats.Stats(self._profile)
+            else:
+                self.stats.add(self._profile)
+            self._profile = None
+        record["blocks"] = blocks
+        record["rss"] = peak_rss()
+        record["failed"] = failed
+        self._record = None
+        self._add_records([record])
+
+    def _add_records(self, records):
+        self.records.extend(records)
+        if self.stream is not None:
+            for record in records:
+                self.stream.write(json.dumps(record, sort_keys=True))
+                self.stream.write("\n")
+
+    def pop(self):
+        """Take all records and statistics, so they can be sent from a
+        worker process to :meth:`merge`.
+
+        :return: The records, and the raw statistics.
+        :rtype: ``tuple``
+        """
+        result = (self.records,
+                  self.stats.stats if self.stats is not None else None)
+        self.records = []
+        self.stats = None
+        return result
+
+    def merge(self, result):
+        """Merge records and statistics from :meth:`pop`.
+
+        :param result: The records, and the raw statistics.
+        :type result: ``tuple``
+        """
+        records, stats = result
+        self._add_records(records)
+        if stats is not None:
+            if self.stats is None:
+                self.stats = pstats.Stats(_RawStats(stats))
+            else:
+                self.stats.add(_RawStats(stats))
+
+    def summary(self, num=10):
+        """Summarize the slowest files, and the spells which took the
+        most time over all files.
+
+        :param num: The number of files and spells to list.
+        :type num: ``int``
+        :return: The lines of the summary.
+        :rtype: ``list`` of ``str``
+        """
+        lines = ["slowest files:"]
+        records = sorted(self.records, reverse=True,
+                         key=lambda record: record["times"]["total"])
+        for record in records[:num]:
+            lines.append("  %.3fs %s"
+                         % (record["times"]["total"], record["file"]))
+        spell_times = {}
+        for record in self.records:
+            for spellname, elapsed in record["spells"].items():
+                total, num_files = spell_times.get(spellname, (0.0, 0))
+                spell_times[spellname] = (total + elapsed, num_files + 1)
+        lines.append("slowest spells:")
+        for spellname, (total, num_files) in sorted(
+                spell_times.items(), key=lambda item: item[1][0],
+                reverse=True)[:num]:
+            lines.append("  %.3fs %s (%i files)"
+                         % (total, spellname, num_files))
+        return lines
+
+    def dump_stats(self, filename):
+        """Write the merged :mod:`cProfile` statistics, for use with
+        :mod:`pstats`.
+
+        :param filename: The name of the file.
+        :type filename: ``str``
+        """
+        if self.stats is not None:
+            self.stats.dump_stats(filename)
+
+    def close(self):
+        """Close the file with the records."""
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
@@ -0,0 +1,2 @@
+"""Reproducible benchmarks of the object model and of spells, on
+synthetic files of configurable size; see :mod:`tests.benchmark.run`."""
@@ -0,0 +1,291 @@
+"""Generate synthetic files of configurable size for benchmarks.
+
+All files are built from the classes that are generated from the xml
+descriptions of the formats, so they can be regenerated identically on
+any commit. Sizes are set through keyword arguments, such as the number
+of vertices, blocks, bones, and animation keys.
+
+>>> data = nif_data(num_shapes=2, num_vertices=16, num_bones=2, num_keys=3)
+>>> stream = io.BytesIO()
+>>> data.write(stream)
+>>> if stream.seek(0): pass
+>>> data = NifFormat.Data()
+>>> data.read(stream)
+>>> [block.__class__.__name__ for block in data.roots[0].tree()
+...  if isinstance(block, NifFormat.NiTriShape)]
+['NiTriShape', 'NiTriShape']
+>>> data.roots[0].children[-1].data.num_vertices
+16
+"""
+
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import io
+import math
+import os
+
+from pyffi.formats.cgf import CgfFormat
+from pyffi.formats.kfm import KfmFormat
+from pyffi.formats.nif import NifFormat
+from pyffi.formats.tga import TgaFormat
+
+
+def _grid(num_vertices):
+    """Return vertices, normals, uvs, and triangles of a wavy grid with
+    about num_vertices vertices."""
+    side = max(2, int(math.sqrt(num_vertices)))
+    vertices = []
+    normals = []
+    uvs = []
+    for i in range(side):
+        for j in range(side):
+            vertices.append((i, j, math.sin(0.3 * i) * math.cos(0.2 * j)))
+            normals.append((0.0, 0.0, 1.0))
+            uvs.append((i / (side - 1.0), j / (side - 1.0)))
+    triangles = []
+    for i in range(side - 1):
+        for j in range(side - 1):
+            v = i * side + j
+            triangles.append((v, v + side, v + 1))
+            triangles.append((v + 1, v + side, v + side + 1))
+    return vertices, normals, uvs, triangles
+
+
+def _nif_keyframe_controller(num_keys):
+    """Return a transform controller with num_keys translation and
+    rotation keys."""
+    keydata = NifFormat.NiTransformData()
+    keydata.num_rotation_keys = num_keys
+    keydata.rotation_type = NifFormat.KeyType.LINEAR_KEY
+    keydata.quaternion_keys.update_size()
+    for i, key in enumerate(keydata.quaternion_keys):
+        angle = 0.1 * i
+        key.time = i / 30.0
+        key.value.w = math.cos(angle)
+        key.value.z = math.sin(angle)
+    keydata.translations.num_keys = num_keys
+    keydata.translations.interpolation = NifFormat.KeyType.LINEAR_KEY
+    keydata.translations.keys.update_size()
+    for i, key in enumerate(keydata.translations.keys):
+        key.time = i / 30.0
+        key.value.x = 0.1 * i
+    interpolator = NifFormat.NiTransformInterpolator()
+    interpolator.data = keydata
+    interpolator.rotation.w = 1.0
+    interpolator.scale = 1.0
+    controller = NifFormat.NiTransformController()
+    controller.interpolator = interpolator
+    controller.flags = 8
+    controller.frequency = 1.0
+    controller.stop_time = (num_keys - 1) / 30.0
+    return controller
+
+
+def nif_data(num_shapes=8, num_vertices=1024, num_bones=0, num_keys=0,
+             version=0x14000005, user_version=11):
+    """Create nif data with a root node, and num_shapes shapes below it.
+    Every shape has its own copy of the same geometry and material, so
+    there is something to merge. If num_bones is not zero, then all
+    shapes are skinned on a chain of num_bones bones. If num_keys is not
+    zero, then every bone is animated with num_keys keys.
+
+    :return: The nif data.
+    :rtype: :class:`~pyffi.formats.nif.NifFormat.Data`
+    """
+    data = NifFormat.Data(version=version, user_version=user_version,
+                          user_version_2=user_version)
+    id44 = NifFormat.Matrix44()
+    id44.set_identity()
+    root = NifFormat.NiNode()
+    root.name = "Scene Root"
+    root.set_transform(id44)
+    data.roots = [root]
+    bones = []
+    parent = root
+    for i in range(num_bones):
+        bone = NifFormat.NiNode()
+        bone.name = "Bone%i" % i
+        bone.set_transform(id44)
+        bone.translation.z = 1.0 if i else 0.0
+        if num_keys:
+            bone.add_controller(_nif_keyframe_controller(num_keys))
+        parent.add_child(bone)
+        bones.append(bone)
+        parent = bone
+    vertices, normals, uvs, triangles = _grid(num_vertices)
+    for i in range(num_shapes):
+        shape = NifFormat.NiTriShape()
+        shape.name = "Shape%i" % i
+        shape.set_transform(id44)
+        shapedata = NifFormat.NiTriShapeData()
+        shapedata.num_vertices = len(vertices)
+        shapedata.has_vertices = True
+        shapedata.vertices.update_size()
+        shapedata.has_normals = True
+        shapedata.normals.update_size()
+        shapedata.num_uv_sets = 1
+        shapedata.has_uv = True
+        shapedata.uv_sets.update_size()
+        for vertex, normal, uv, v, n, t in zip(
+                shapedata.vertices, shapedata.normals, shapedata.uv_sets[0],
+                vertices, normals, uvs):
+            vertex.x, vertex.y, vertex.z = v
+            normal.x, normal.y, normal.z = n
+            uv.u, uv.v = t
+        shapedata.set_triangles(triangles)
+        shapedata.update_center_radius()
+        shape.data = shapedata
+        material = NifFormat.NiMaterialProperty()
+        material.name = "Material"
+        material.glossiness = 10.0
+        material.alpha = 1.0
+        shape.add_property(material)
+        texture = NifFormat.NiSourceTexture()
+        texture.file_name = "textures/benchmark.dds"
+        texture.use_external = 1
+        texprop = NifFormat.NiTexturingProperty()
+        texprop.has_base_texture = True
+        texprop.base_texture.source = texture
+        shape.add_property(texprop)
+        root.add_child(shape)
+        if bones:
+            skininst = NifFormat.NiSkinInstance()
+            skininst.data = NifFormat.NiSkinData()
+            skininst.skeleton_root = root
+            shape.skin_instance = skininst
+            for j, bone in enumerate(bones):
+                # every bone influences a band of the grid
+                shape.add_bone(bone, dict(
+                    (k, 1.0) for k in range(len(vertices))
+                    if k * len(bones) // len(vertices) == j))
+            shape.update_bind_position()
+            shape.update_skin_center_radius()
+    return data
+
+
+def cgf_data(num_meshes=8, num_vertices=1024):
+    """Create cgf data with num_meshes nodes, each with a mesh.
+
+    :return: The cgf data.
+    :rtype: :class:`~pyffi.formats.cgf.CgfFormat.Data`
+    """
+    vertices, normals, uvs, triangles = _grid(num_vertices)
+    data = CgfFormat.Data()
+    for i in range(num_meshes):
+        mesh = CgfFormat.MeshChunk()
+        mesh.set_geometry(verticeslist=[vertices], normalslist=[normals],
+                          triangleslist=[triangles], uvslist=[uvs],
+                          matlist=[0])
+        # the data streams are only used by later games
+        mesh.mesh_subsets = None
+        mesh.vertices_data = None
+        mesh.normals_data = None
+        mesh.indices_data = None
+        mesh.uvs_data = None
+        node = CgfFormat.NodeChunk()
+        node.name = "Node%i" % i
+        node.object = mesh
+        data.chunks.extend([node, mesh])
+    return data
+
+
+def kfm_data(num_animations=64, num_transitions=8):
+    """Create kfm data with num_animations animations, each with
+    num_transitions transitions.
+
+    :return: The kfm data.
+    :rtype: :class:`~pyffi.formats.kfm.KfmFormat.Data`
+    """
+    data = KfmFormat.Data()
+    data.nif_file_name = "benchmark.nif"
+    data.num_animations = num_animations
+    data.animations.update_size()
+    for i, anim in enumerate(data.animations):
+        anim.event_code = i
+        anim.kf_file_name = "benchmark_%i.kf" % i
+        anim.num_transitions = num_transitions
+        anim.transitions.update_size()
+        for j, transition in enumerate(anim.transitions):
+            transition.animation = (i + j + 1) % num_animations
+    return data
+
+
+def tga_data(width=256, height=256):
+    """Create uncompressed 24 bit tga data with a gradient image.
+
+    :return: The tga data.
+    :rtype: :class:`~pyffi.formats.tga.TgaFormat.Data`
+    """
+    data = TgaFormat.Data()
+    data.header.image_type = TgaFormat.ImageType.RGB
+    data.header.width = width
+    data.header.height = height
+    data.header.pixel_size = 24
+    for i in range(width * height):
+        pixel = TgaFormat.Pixel(argument=24)
+        pixel.data[0] = i % width & 0xff
+        pixel.data[1] = i // width & 0xff
+        pixel.data[2] = 128
+        data.image.children.append(pixel)
+    return data
+
+
+GENERATORS = dict(nif=nif_data, cgf=cgf_data, kfm=kfm_data, tga=tga_data)
+"""Maps file extension to the function which generates data."""
+
+
+def write_files(directory, sizes):
+    """Generate data with every generator and write it to a file.
+
+    :param directory: The folder in which the files are written.
+    :type directory: ``str``
+    :param sizes: Maps file extension to the keyword arguments of its
+        generator; extensions that are missing are not generated.
+    :type sizes: ``dict``
+    :return: Maps file extension to the name of its file.
+    :rtype: ``dict``
+    """
+    filenames = {}
+    for ext, kwargs in sorted(sizes.items()):
+        filename = os.path.join(directory, "benchmark.%s" % ext)
+        data = GENERATORS[ext](**kwargs)
+        with open(filename, "wb") as stream:
+            data.write(stream)
+        filenames[ext] = filename
+    return filenames
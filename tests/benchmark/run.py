@@ -0,0 +1,311 @@
+"""Time reading, writing, and casting spells on synthetic files, and
+store the results as JSON, so they can be compared across commits.
+
+Run the benchmarks, for instance, with::
+
+    python -m tests.benchmark.run --output before.json
+    python -m tests.benchmark.run --output after.json --compare before.json
+
+File sizes are set with ``--size``, as in ``--size nif.num_vertices=4096``
+(see :mod:`tests.benchmark.generate` for all parameters).
+"""
+
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import json
+import optparse
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import pyffi
+import pyffi.spells.nif
+import pyffi.spells.nif.check
+import pyffi.spells.nif.fix
+import pyffi.spells.nif.optimize
+import pyffi.utils.profiler
+from pyffi.formats.cgf import CgfFormat
+from pyffi.formats.kfm import KfmFormat
+from pyffi.formats.nif import NifFormat
+from pyffi.formats.tga import TgaFormat
+
+from tests.benchmark import generate
+
+
+FORMATS = dict(nif=NifFormat, cgf=CgfFormat, kfm=KfmFormat, tga=TgaFormat)
+"""Maps file extension to file format."""
+
+DEFAULT_SIZES = dict(
+    nif=dict(num_shapes=8, num_vertices=4096, num_bones=16, num_keys=100),
+    cgf=dict(num_meshes=8, num_vertices=4096),
+    kfm=dict(num_animations=256, num_transitions=8),
+    tga=dict(width=256, height=256))
+"""Keyword arguments of the generators of all files."""
+
+SPELLS = [
+    pyffi.spells.nif.optimize.SpellOptimizeGeometry,
+    pyffi.spells.nif.optimize.SpellMergeDuplicates,
+    pyffi.spells.nif.fix.SpellAddTangentSpace,
+    pyffi.spells.nif.check.SpellReadWrite,
+]
+"""Spells which are cast on the nif file."""
+
+
+def _measure(func, setup, repeat, memory):
+    """Call setup and then func, repeat times, and return the times of
+    func in seconds, and the peak memory of func in kilobytes, measured
+    in a separate call because tracing memory slows down func.
+    """
+    times = []
+    for i in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    if not memory:
+        return times, None
+    args = setup()
+    tracemalloc.start()
+    try:
+        func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return times, peak // 1024
+
+
+def _result(times, peak_kb, num_bytes):
+    times = sorted(times)
+    best = times[0]
+    return dict(
+        times=times, best=best, median=times[len(times) // 2],
+        mb_per_s=num_bytes / best / 1e6 if best else None,
+        peak_kb=peak_kb)
+
+
+def _git_commit():
+    """Return the commit of the working tree, if available."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode("ascii").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(sizes=None, repeat=3, memory=True):
+    """Generate all files, and time inspect, read, and write of every
+    file, and every spell of :data:`SPELLS` on the nif file.
+
+    :param sizes: Maps file extension to the keyword arguments of its
+        generator, overriding :data:`DEFAULT_SIZES`.
+    :type sizes: ``dict``
+    :param repeat: Number of times every operation is timed.
+    :type repeat: ``int``
+    :param memory: Whether to measure the peak memory of every operation,
+        which takes an extra, much slower, call.
+    :type memory: ``bool``
+    :return: The results, with the times in seconds, the throughput in
+        megabytes per second, and the peak memory in kilobytes of every
+        operation, as ``dict``.
+    :rtype: ``dict``
+    """
+    all_sizes = dict(
+        (ext, dict(kwargs, **(sizes or {}).get(ext, {})))
+        for ext, kwargs in DEFAULT_SIZES.items())
+    results = {}
+    directory = tempfile.mkdtemp()
+    try:
+        filenames = generate.write_files(directory, all_sizes)
+        for ext, filename in sorted(filenames.items()):
+            fileformat = FORMATS[ext]
+            num_bytes = os.path.getsize(filename)
+
+            def opened():
+                return open(filename, "rb"), fileformat.Data()
+
+            def inspect(stream, data):
+                with stream:
+                    data.inspect(stream)
+
+            def read(stream, data):
+                with stream:
+                    data.inspect(stream)
+                    data.read(stream)
+
+            def read_data():
+                stream, data = opened()
+                read(stream, data)
+                return (open(os.path.join(directory, "out." + ext), "wb"),
+                        data)
+
+            def write(stream, data):
+                with stream:
+                    data.write(stream)
+
+            for name, func, setup in (("inspect", inspect, opened),
+                                      ("read", read, opened),
+                                      ("write", write, read_data)):
+                results["%s.%s" % (ext, name)] = _result(
+                    *_measure(func, setup, repeat, memory),
+                    num_bytes=num_bytes)
+
+        # spells
+        toaster = pyffi.spells.nif.NifToaster(options=dict(verbose=0))
+        num_bytes = os.path.getsize(filenames["nif"])
+        for spellclass in SPELLS:
+            if not spellclass.toastentry(toaster):
+                continue
+
+            def cast_setup():
+                stream = open(filenames["nif"], "rb")
+                data = NifFormat.Data()
+                data.inspect(stream)
+                data.read(stream)
+                spell = spellclass(toaster=toaster, data=data, stream=stream)
+                return spell, stream
+
+            def cast(spell, stream):
+                with stream:
+                    if spell._datainspect() and spell.datainspect():
+                        spell.recurse()
+
+            results["nif.%s" % spellclass.SPELLNAME] = _result(
+                *_measure(cast, cast_setup, repeat, memory),
+                num_bytes=num_bytes)
+    finally:
+        shutil.rmtree(directory)
+    return dict(
+        pyffi=pyffi.__version__, commit=_git_commit(),
+        python=platform.python_version(), platform=platform.platform(),
+        date=time.strftime("%Y-%m-%dT%H:%M:%S"), repeat=repeat,
+        sizes=all_sizes, peak_rss_kb=pyffi.utils.profiler.peak_rss(),
+        results=results)
+
+
+def compare(old, new):
+    """Compare the best times of two benchmark runs.
+
+    >>> old = dict(results={"nif.read": dict(best=2.0)})
+    >>> new = dict(results={"nif.read": dict(best=1.0),
+    ...                     "nif.write": dict(best=1.0)})
+    >>> for line in compare(old, new):
+    ...     print(line)
+    nif.read: 2.000s -> 1.000s (0.50x)
+    nif.write: 1.000s (new)
+
+    :return: One line per operation.
+    :rtype: ``list`` of ``str``
+    """
+    lines = []
+    for name, result in sorted(new["results"].items()):
+        old_result = old["results"].get(name)
+        if old_result is None:
+            lines.append("%s: %.3fs (new)" % (name, result["best"]))
+        else:
+            lines.append("%s: %.3fs -> %.3fs (%.2fx)"
+                         % (name, old_result["best"], result["best"],
+                            result["best"] / old_result["best"]))
+    return lines
+
+
+def _parse_size(value):
+    """Parse a size option such as ``nif.num_vertices=4096``."""
+    key, _, number = value.partition("=")
+    ext, _, param = key.partition(".")
+    if ext not in DEFAULT_SIZES or not param or not number:
+        raise ValueError("invalid size %s" % value)
+    return ext, param, int(number)
+
+
+def main():
+    parser = optparse.OptionParser(
+        usage="python -m tests.benchmark.run [options]",
+        description=__doc__.splitlines()[0])
+    parser.add_option(
+        "--compare", dest="compare", type="string", metavar="FILE",
+        help="compare the results with those in FILE")
+    parser.add_option(
+        "--no-memory", dest="memory", action="store_false", default=True,
+        help="do not measure the peak memory of every operation")
+    parser.add_option(
+        "-o", "--output", dest="output", type="string", metavar="FILE",
+        help="write the results to FILE, as JSON")
+    parser.add_option(
+        "-r", "--repeat", dest="repeat", type="int", default=3,
+        metavar="N",
+        help="time every operation N times [default: %default]")
+    parser.add_option(
+        "--size", dest="sizes", type="string", action="append", default=[],
+        metavar="EXT.PARAM=N",
+        help="set parameter PARAM of the generator for the EXT file to N,"
+             " for instance nif.num_vertices=4096")
+    options, args = parser.parse_args()
+    if args:
+        parser.error("no arguments expected")
+    sizes = {}
+    for value in options.sizes:
+        try:
+            ext, param, number = _parse_size(value)
+        except ValueError as exc:
+            parser.error(str(exc))
+        sizes.setdefault(ext, {})[param] = number
+    result = benchmark(sizes=sizes, repeat=options.repeat,
+                       memory=options.memory)
+    for name, value in sorted(result["results"].items()):
+        print("%s: %.3fs, %s MB/s, %s KB"
+              % (name, value["best"],
+                 "%.2f" % value["mb_per_s"] if value["mb_per_s"] else "-",
+                 value["peak_kb"] if value["peak_kb"] is not None else "-"))
+    if options.output:
+        with open(options.output, "w") as stream:
+            json.dump(result, stream, indent=2, sort_keys=True)
+    if options.compare:
+        with open(options.compare) as stream:
+            old = json.load(stream)
+        print("\n".join(compare(old, result)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Tests for the benchmarks"""
+
+from nose.tools import assert_equal, assert_true
+
+from tests.benchmark import run
+
+
+SIZES = dict(
+    nif=dict(num_shapes=1, num_vertices=16, num_bones=2, num_keys=2),
+    cgf=dict(num_meshes=1, num_vertices=16),
+    kfm=dict(num_animations=2, num_transitions=1),
+    tga=dict(width=4, height=4))
+
+
+def test_benchmark():
+    result = run.benchmark(sizes=SIZES, repeat=2)
+    assert_equal(
+        sorted(result["results"]),
+        ['cgf.inspect', 'cgf.read', 'cgf.write',
+         'kfm.inspect', 'kfm.read', 'kfm.write',
+         'nif.check_readwrite', 'nif.fix_addtangentspace', 'nif.inspect',
+         'nif.opt_geometry', 'nif.opt_mergeduplicates', 'nif.read',
+         'nif.write',
+         'tga.inspect', 'tga.read', 'tga.write'])
+    for value in result["results"].values():
+        assert_equal(len(value["times"]), 2)
+        assert_true(value["peak_kb"] is not None)
+    assert_equal(result["sizes"]["nif"], SIZES["nif"])
+    assert_equal(len(run.compare(result, result)), len(result["results"]))
@@ -0,0 +1,59 @@
+from pyffi.formats.nif import NifFormat
+from nose.tools import assert_equals, assert_true, assert_false
+
+
+class TestClone:
+    """Tests for StructBase.clone on nif structures and blocks"""
+
+    def test_template(self):
+        """Clone a structure that takes a template"""
+
+        keys = NifFormat.KeyGroup(template=NifFormat.Vector3)
+        keys.num_keys = 2
+        keys.keys.update_size()
+        keys.keys[1].time = 0.5
+        keys.keys[1].value.x = 3.0
+        keys_copy = keys.clone()
+        assert_true(isinstance(keys_copy.keys[1].value, NifFormat.Vector3))
+        assert_false(keys_copy.keys[1] is keys.keys[1])
+        assert_equals(keys_copy.keys[1].value.x, 3.0)
+        assert_equals(keys_copy.get_hash(), keys.get_hash())
+
+    def test_memo(self):
+        """Clone a tree, with shared blocks and pointers"""
+
+        root = NifFormat.NiNode()
+        bone = NifFormat.NiNode()
+        shape = NifFormat.NiTriShape()
+        prop = NifFormat.NiMaterialProperty()
+        outside = NifFormat.NiNode()
+        root.add_child(bone)
+        root.add_child(shape)
+        bone.add_property(prop)
+        shape.add_property(prop)
+        skininst = NifFormat.NiSkinInstance()
+        skininst.skeleton_root = root
+        skininst.num_bones = 2
+        skininst.bones.update_size()
+        skininst.bones[0] = bone
+        skininst.bones[1] = outside
+        shape.skin_instance = skininst
+        memo = {}
+        root_copy = root.clone(memo=memo)
+        bone_copy, shape_copy = root_copy.children
+        # every block in the tree is cloned once
+        assert_equals(len(memo), 5)
+        assert_false(bone_copy is bone)
+        assert_false(shape_copy is shape)
+        assert_false(bone_copy.properties[0] is prop)
+        assert_true(bone_copy.properties[0] is shape_copy.properties[0])
+        # pointers to cloned blocks point to the clones
+        skininst_copy = shape_copy.skin_instance
+        assert_false(skininst_copy is skininst)
+        assert_true(skininst_copy.skeleton_root is root_copy)
+        assert_true(skininst_copy.bones[0] is bone_copy)
+        # other pointers are kept
+        assert_true(skininst_copy.bones[1] is outside)
+        # the original tree is unchanged
+        assert_true(skininst.skeleton_root is root)
+        assert_true(skininst.bones[0] is bone)
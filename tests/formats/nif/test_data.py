@@ -0,0 +1,233 @@
+import io
+import os
+import struct
+
+from nose.tools import assert_equals, assert_true, assert_false, assert_raises
+
+from pyffi.formats.nif import NifFormat
+from tests.utils import test_root
+
+
+def _read(name, **kwargs):
+    data = NifFormat.Data()
+    with open(os.path.join(test_root, 'spells', 'nif', 'files', name),
+              'rb') as stream:
+        data.read(stream, **kwargs)
+    return data
+
+
+def _write(data):
+    stream = io.BytesIO()
+    data.write(stream)
+    return stream.getvalue()
+
+
+class TestLazyRead:
+    """Tests for NifFormat.Data.read with lazy=True"""
+
+    def test_lazy_blocks(self):
+        data = _read('test_check_tangentspace2.nif', lazy=True)
+        assert_true(all(block._lazy_block is not None
+                        for block in data.blocks))
+        # the root is the first block, and blocks are read when used
+        root = data.roots[0]
+        assert_true(root is data.blocks[0])
+        assert_equals(root.name, b'Scene Root')
+        assert_true(root._lazy_block is None)
+        assert_true(all(block._lazy_block is not None
+                        for block in data.blocks[1:]))
+        # links resolve to the blocks of the file
+        assert_true(root.children[0] is data.blocks[1])
+
+    def test_lazy_write(self):
+        eager_data = _read('test_check_tangentspace2.nif')
+        lazy_data = _read('test_check_tangentspace2.nif', lazy=True)
+        assert_equals(_write(lazy_data), _write(eager_data))
+
+    def test_lazy_version_change(self):
+        # blocks are read with the version of the file
+        eager_data = _read('test_check_tangentspace4.nif')
+        lazy_data = _read('test_check_tangentspace4.nif', lazy=True)
+        eager_data.version = 0x14000005
+        lazy_data.version = 0x14000005
+        assert_equals(_write(lazy_data), _write(eager_data))
+
+    def test_old_version(self):
+        # no block sizes, so all blocks are read
+        data = _read('test.nif', lazy=True)
+        assert_false(any(block._lazy_block is not None
+                         for block in data.blocks))
+
+    def test_only_types(self):
+        data = _read('test_check_tangentspace2.nif',
+                     only_types=(NifFormat.NiGeometryData,))
+        assert_equals(
+            [block.__class__.__name__ for block in data.blocks
+             if block._lazy_block is None],
+            ['NiTriStripsData'])
+        # other blocks are still read when they are used
+        eager_data = _read('test_check_tangentspace2.nif')
+        assert_equals(_write(data), _write(eager_data))
+
+    def test_lazy_read_error(self):
+        data = _read('test_check_tangentspace2.nif', lazy=True)
+        block = data.blocks[-1]
+        lazy_data, raw = block._lazy_block
+        block._lazy_block = (lazy_data, raw[:8])
+        # the error is raised on every use, not only on the first one
+        for i in range(2):
+            assert_raises(struct.error, getattr, block, "num_vertices")
+            assert_true(block._lazy_block is not None)
+        assert_raises(struct.error, _write, data)
+        # restoring the block makes it readable again
+        block._lazy_block = (lazy_data, raw)
+        eager_data = _read('test_check_tangentspace2.nif')
+        assert_equals(_write(data), _write(eager_data))
+
+
+class TestWrite:
+    """Tests for NifFormat.Data.write"""
+
+    def test_buffered_write(self):
+        data = _read('test_check_tangentspace2.nif')
+
+        class Stream(io.BytesIO):
+            num_writes = 0
+
+            def write(self, b):
+                self.num_writes += 1
+                return io.BytesIO.write(self, b)
+
+        stream = Stream()
+        data.write(stream)
+        # one write for the header, and one for all blocks
+        assert_equals(stream.num_writes, 2)
+        # block sizes are taken from the written blocks
+        assert_equals(list(data.header.block_size),
+                      [block.get_size(data) for block in data.blocks])
+
+    def test_write_order(self):
+        # blocks and strings are written in the order of the original file
+        data = _read('test_check_tangentspace2.nif')
+        with open(os.path.join(test_root, 'spells', 'nif', 'files',
+                               'test_check_tangentspace2.nif'),
+                  'rb') as stream:
+            assert_equals(_write(data), stream.read())
+
+    def test_shared_blocks(self):
+        root = NifFormat.NiNode()
+        child = NifFormat.NiNode()
+        data = NifFormat.Data()
+        root.add_child(child)
+        root.add_child(child)
+        data.roots = [root, child]
+        _write(data)
+        assert_equals(data.blocks, [root, child])
+        assert_equals(list(data.header.block_types), [b'NiNode'])
+
+
+def _chain(depth):
+    # every node refers to the next one twice, so there are
+    # 2 ** depth paths from the root to the last node
+    nodes = [NifFormat.NiNode() for i in range(depth)]
+    for i, node in enumerate(nodes):
+        node.name = ("Node%i" % i).encode("ascii")
+    for node, nextnode in zip(nodes, nodes[1:]):
+        node.num_children = 2
+        node.children.update_size()
+        node.children[0] = nextnode
+        node.children[1] = nextnode
+    data = NifFormat.Data()
+    data.roots = [nodes[0]]
+    return data, nodes
+
+
+class TestReplaceGlobalNodes:
+    """Tests for NifFormat.Data.replace_global_nodes"""
+
+    def test_shared_subtree(self):
+        data, nodes = _chain(40)
+        newnode = NifFormat.NiNode()
+        data.replace_global_node(nodes[-1], newnode)
+        assert_equals(list(nodes[-2].children), [newnode, newnode])
+        nodes[0].replace_global_node(newnode, None)
+        assert_equals(list(nodes[-2].children), [None, None])
+
+    def test_ref_index(self):
+        data, nodes = _chain(40)
+        index = data.get_ref_index()
+        assert_equals(len(index), 39)
+        assert_equals(len(index[id(nodes[-1])]), 2)
+        assert_false(id(nodes[0]) in index)
+
+    def test_many(self):
+        data, nodes = _chain(40)
+        prop = NifFormat.NiMaterialProperty()
+        for node in nodes:
+            node.add_property(prop)
+        copies = [NifFormat.NiMaterialProperty() for node in nodes]
+        for node, copy in zip(nodes, copies):
+            node.properties[0] = copy
+        data.replace_global_nodes(
+            [(copy, prop) for copy in copies] + [(nodes[-1], None)])
+        # the last node is no longer in the tree
+        assert_true(all(node.properties[0] is prop for node in nodes[:-1]))
+        assert_equals(list(nodes[-2].children), [None, None])
+        assert_equals(len(data.get_ref_index()[id(prop)]), 39)
+
+
+class TestFind:
+    """Tests for tree, find and find_chain of NifFormat.NiObject, and
+    for the name and type index of NifFormat.Data"""
+
+    def test_tree(self):
+        data, nodes = _chain(40)
+        root = nodes[0]
+        assert_equals(list(root.tree(unique=True)), nodes)
+        assert_equals(list(root.tree(block_type=NifFormat.NiTriShape,
+                                     unique=True)), [])
+        shape = NifFormat.NiTriShape()
+        nodes[3].add_child(shape)
+        assert_equals(
+            list(root.tree(block_type=NifFormat.NiAVObject,
+                           follow_all=False, unique=True)),
+            nodes + [shape])
+
+    def test_find(self):
+        data, nodes = _chain(40)
+        root = nodes[0]
+        assert_true(root.find(block_name=b"Node39") is nodes[-1])
+        assert_true(root.find(block_name=b"Node40") is None)
+        assert_equals(root.find_chain(nodes[-1]), nodes)
+        assert_equals(root.find_chain(NifFormat.NiNode()), [])
+
+    def test_index(self):
+        data, nodes = _chain(40)
+        assert_true(data.find_by_name(b"Node39") is nodes[-1])
+        assert_equals(data.find_all_of_type(NifFormat.NiNode), nodes)
+        # the index follows changes to the tree
+        shape = NifFormat.NiTriShape()
+        shape.name = b"Node39"
+        nodes[3].add_child(shape)
+        assert_true(data.find_by_name(b"Node39") is nodes[-1])
+        assert_true(data.find_by_name(b"Node39", NifFormat.NiTriShape)
+                    is shape)
+        assert_equals(data.find_all_of_type(NifFormat.NiTriShape), [shape])
+        nodes[3].remove_child(shape)
+        assert_equals(data.find_all_of_type(NifFormat.NiTriShape), [])
+        data.replace_global_node(nodes[20], None)
+        assert_equals(data.find_all_of_type(NifFormat.NiNode), nodes[:20])
+        data.roots = [nodes[10]]
+        assert_true(data.find_by_name(b"Node0") is None)
+
+    def test_index_changes(self):
+        data, nodes = _chain(40)
+        index = data._get_name_type_index()
+        # other values do not invalidate the index
+        nodes[5].translation.x = 1.0
+        nodes[5].flags = 8
+        assert_true(data._get_name_type_index() is index)
+        # names do
+        nodes[5].name = b"Bip01"
+        assert_true(data.find_by_name(b"Bip01") is nodes[5])
+        assert_true(data.find_by_name(b"Node5") is None)
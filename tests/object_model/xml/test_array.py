@@ -0,0 +1,155 @@
+import io
+import unittest
+
+from nose.tools import assert_equals, assert_true, assert_false
+
+import pyffi.object_models.common
+from pyffi.object_models import FileFormat
+from pyffi.object_models.xml import StructAttribute as Attr
+from pyffi.object_models.xml.array import Array
+from pyffi.object_models.xml.struct_ import StructBase
+
+
+class MeshFormat(object):
+    UInt = pyffi.object_models.common.UInt
+    Float = pyffi.object_models.common.Float
+
+    @staticmethod
+    def name_attribute(name):
+        return name
+
+    @staticmethod
+    def version_number(version_str):
+        return int(version_str)
+
+
+class Vec(StructBase):
+    _is_template = False
+    _attrs = [
+        Attr(MeshFormat, dict(name='x', type='Float')),
+        Attr(MeshFormat, dict(name='y', type='Float')),
+        Attr(MeshFormat, dict(name='z', type='Float')),
+    ]
+
+MeshFormat.Vec = Vec
+
+
+class Mesh(StructBase):
+    _is_template = False
+    _attrs = [
+        Attr(MeshFormat, dict(name='num_vertices', type='UInt')),
+        Attr(MeshFormat, dict(name='vertices', type='Vec',
+                              arr1='num_vertices')),
+        Attr(MeshFormat, dict(name='weights', type='Float',
+                              arr1='num_vertices')),
+    ]
+
+
+class MeshData(FileFormat.Data):
+    def __init__(self, byte_order='<', use_packed_arrays=True):
+        self.version = 0
+        self.user_version = 0
+        self._byte_order = byte_order
+        self.use_packed_arrays = use_packed_arrays
+
+
+class TestPackedArray(unittest.TestCase):
+
+    def setUp(self):
+        mesh = Mesh()
+        mesh.num_vertices = 3
+        mesh.vertices.update_size()
+        mesh.weights.update_size()
+        for i, vert in enumerate(mesh.vertices):
+            vert.x = i
+            vert.y = i + 0.5
+            vert.z = -i
+            mesh.weights[i] = 0.25 * i
+        self.raw = self._write(mesh, MeshData())
+        self.mesh = self._read(self.raw, MeshData())
+
+    def _read(self, raw, data):
+        mesh = Mesh()
+        mesh.read(io.BytesIO(raw), data)
+        return mesh
+
+    def _write(self, mesh, data):
+        stream = io.BytesIO()
+        mesh.write(stream, data)
+        return stream.getvalue()
+
+    def _is_packed(self, arr):
+        return arr.__class__ is not Array
+
+    def test_read_packed(self):
+        assert_true(self._is_packed(self.mesh.vertices))
+        assert_true(self._is_packed(self.mesh.weights))
+        assert_equals(len(self.mesh.vertices), 3)
+        assert_equals(self.mesh.get_size(MeshData()), len(self.raw))
+        generic_mesh = self._read(self.raw, MeshData(use_packed_arrays=False))
+        assert_false(self._is_packed(generic_mesh.vertices))
+
+    def test_write_packed(self):
+        # written without unpacking
+        assert_equals(self._write(self.mesh, MeshData()), self.raw)
+        assert_true(self._is_packed(self.mesh.vertices))
+        # other byte order
+        assert_equals(
+            self._write(self.mesh, MeshData('>')),
+            self._write(self._read(self.raw, MeshData(use_packed_arrays=False)),
+                        MeshData('>')))
+        assert_false(self._is_packed(self.mesh.vertices))
+
+    def test_write_size_check(self):
+        self.mesh.num_vertices = 2
+        self.assertRaises(ValueError, self._write, self.mesh, MeshData())
+
+    def test_access(self):
+        vert = self.mesh.vertices[2]
+        assert_false(self._is_packed(self.mesh.vertices))
+        assert_equals((vert.x, vert.y, vert.z), (2.0, 2.5, -2.0))
+        assert_equals(list(self.mesh.weights), [0.0, 0.25, 0.5])
+        assert_false(self._is_packed(self.mesh.weights))
+        # changes are written
+        vert.x = 7
+        mesh = self._read(self._write(self.mesh, MeshData()), MeshData())
+        assert_equals(mesh.vertices[2].x, 7.0)
+
+    def test_list_methods(self):
+        assert_true(0.25 in self._read(self.raw, MeshData()).weights)
+        weights = self._read(self.raw, MeshData()).weights
+        weights.append(pyffi.object_models.common.Float())
+        assert_equals(len(weights), 4)
+        assert_equals(self.mesh.get_hash(MeshData()),
+                      self._read(self.raw, MeshData()).get_hash(MeshData()))
+        assert_equals(
+            sorted(self._read(self.raw, MeshData()).weights, reverse=True),
+            [0.5, 0.25, 0.0])
+
+    def test_deepcopy(self):
+        mesh = Mesh().deepcopy(self.mesh)
+        # packed bytes are copied without unpacking
+        assert_true(self._is_packed(self.mesh.vertices))
+        assert_true(self._is_packed(mesh.vertices))
+        assert_equals(self._write(mesh, MeshData()), self.raw)
+        # the copy does not change with the original
+        self.mesh.vertices[0].x = 7
+        self.mesh.weights[0] = 3
+        assert_equals(self._write(mesh, MeshData()), self.raw)
+        # unpacked elements are copied too
+        mesh = Mesh().deepcopy(self.mesh)
+        assert_false(self._is_packed(mesh.vertices))
+        assert_equals((mesh.vertices[0].x, mesh.weights[0]), (7.0, 3.0))
+        assert_equals(self._write(mesh, MeshData()),
+                      self._write(self.mesh, MeshData()))
+        # a packed copy is not unpacked first
+        mesh = self._read(self.raw, MeshData())
+        mesh.deepcopy(self._read(self.raw, MeshData()))
+        assert_true(self._is_packed(mesh.vertices))
+        assert_equals(self._write(mesh, MeshData()), self.raw)
+        # the source can have more elements
+        mesh = Mesh()
+        mesh.num_vertices = 2
+        mesh.vertices.update_size()
+        mesh.vertices.deepcopy(self._read(self.raw, MeshData()).vertices)
+        assert_equals(mesh.vertices.get_size(MeshData()), 24)
@@ -1,6 +1,11 @@
+import os
 import unittest
 
+from pyffi.formats.kfm import KfmFormat
+from pyffi.formats.nif import NifFormat
+from pyffi.formats.tga import TgaFormat
 from pyffi.object_models.xml.expression import Expression
+from pyffi.object_models.xml.struct_ import StructBase
 from nose.tools import assert_equals, assert_false, assert_true, raises
 
 
@@ -50,10 +55,55 @@ class TestExpression(unittest.TestCase):
         assert_false(bool(Expression('!((1 <= 2) && (2 <= 3))').eval()))
         assert_true(bool(Expression('(1 <= 2) && (2 <= 3) && (3 <= 4)').eval()))
 
+    def test_integer_division(self):
+        # expressions act on integers, as in the tga Pixel size ARG / 8
+        self.a.z = 12
+        assert_equals(Expression('z / 8').eval(self.a), 1)
+        assert_true(isinstance(Expression('z / 8').eval(self.a), int))
+        assert_equals(Expression('z / 8')._eval_tree(self.a), 1)
+        assert_equals(Expression('(z / 5) * 5').eval(self.a), 10)
+
     def test_implicit_cast(self):
         self.a.x = B()
         assert_equals(Expression('x * 10').eval(self.a), 70)
 
+class TestCompile(unittest.TestCase):
+
+    def setUp(self):
+        self.a = A()
+
+    def test_compile_matches_tree(self):
+        self.a.z = 5
+        self.a.b = B()
+        for expr_str in ('x || y', '99 & 15', '(99&15)&&y', '!x', 'z - 2',
+                         '(z * 3) % 4', 'z / 2', '(z >= 5) && (z < 6)',
+                         'b * 2', '!((1 <= 2) && (2 <= 3))'):
+            expr = Expression(expr_str)
+            assert_equals(expr.compile()(self.a), expr._eval_tree(self.a))
+
+    def test_compile_dotted_names(self):
+        self.a.b = A()
+        self.a.b.x = 4
+        assert_equals(Expression('b.x + 1').eval(self.a), 5)
+        assert_equals(Expression('1 + b.x').eval(self.a), 5)
+
+    def test_compile_types(self):
+        expr = Expression('!a')
+        expr.map_(lambda x: A if x == 'a' else x)
+        assert_false(expr.eval(self.a))
+        assert_true(expr.eval(B()))
+
+    def test_compile_cached(self):
+        expr = Expression('x || y')
+        assert_true(expr.compile() is expr.compile())
+
+    def test_map_recompiles(self):
+        expr = Expression('x || y')
+        assert_true(expr.eval(self.a))
+        expr.map_(lambda x: 0 if x == 'y' else x)
+        assert_false(expr.eval(self.a))
+
+
 class TestPartition:
 
     def test_partition_empty(self):
@@ -103,4 +153,41 @@ class TestBraces:
 
         s = '  (abc(dd efy 442))xxg'
         start_pos, end_pos = Expression._scan_brackets(s)
-        assert_equals(s[start_pos + 1:end_pos], "abc(dd efy 442)")
\ No newline at end of file
+        assert_equals(s[start_pos + 1:end_pos], "abc(dd efy 442)")
+
+
+def _divisions(fileformat):
+    """Get all expressions of a format which divide."""
+    result = []
+    for name, cls in sorted(vars(fileformat).items()):
+        if isinstance(cls, type) and issubclass(cls, StructBase):
+            for attr in cls._attrs:
+                for expr in (attr.arr1, attr.arr2, attr.cond, attr.vercond):
+                    if isinstance(expr, Expression) and '/' in str(expr):
+                        result.append((name, attr.name, str(expr)))
+    return result
+
+
+class TestFormatExpressions(unittest.TestCase):
+    """Division in the expressions of the xml formats"""
+
+    def test_tga(self):
+        assert_equals(_divisions(TgaFormat),
+                      [('ColorMapEntry', 'data', 'arg / 8'),
+                       ('Pixel', 'data', 'arg / 8')])
+        # the number of bytes of a pixel, from its number of bits
+        pixel = TgaFormat.Pixel(argument=24)
+        assert_equals(len(pixel.data), 3)
+        assert_equals(pixel.get_size(), 3)
+        data = TgaFormat.Data()
+        with open(os.path.join(os.path.dirname(__file__), '..', '..',
+                               'formats', 'tga', 'test.tga'), 'rb') as stream:
+            data.read(stream)
+        assert_equals(len(data.image.children), 60 * 20)
+        assert_equals(len(data.image.children[0].data), 3)
+
+    def test_nif_kfm(self):
+        # no expressions of nif.xml and kfm.xml divide, so integer
+        # division does not change them
+        assert_equals(_divisions(NifFormat), [])
+        assert_equals(_divisions(KfmFormat), [])
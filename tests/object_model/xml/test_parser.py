@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from nose.tools import assert_equals, assert_true, assert_false
+
+import pyffi.object_models.common
+import pyffi.object_models.xml
+
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<niftoolsxml version="0.9">
+    <token name="operator" attrs="cond">
+        <operator token="#EQ#" string="==" />
+    </token>
+    <basic name="Int">A signed 32-bit integer.</basic>
+    <struct name="Example">
+        <add name="Num Integers" type="Int">Number of integers.</add>
+        <add name="Integers" type="Int" arr1="Num Integers" />
+        <add name="Extra Int" type="Int" cond="Num Integers #EQ# 2" />
+    </struct>
+</niftoolsxml>
+"""
+
+
+class TestXmlCache(unittest.TestCase):
+
+    def setUp(self):
+        self.xml_path = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.xml_path, "cache")
+        with open(os.path.join(self.xml_path, "example.xml"), "w") as f:
+            f.write(XML)
+
+    def tearDown(self):
+        shutil.rmtree(self.xml_path)
+
+    def _format(self):
+        class ExampleFormat(pyffi.object_models.xml.FileFormat):
+            xml_file_name = "example.xml"
+            xml_file_path = [self.xml_path]
+            xml_cache_path = self.cache_path
+            Int = pyffi.object_models.common.Int
+        return ExampleFormat
+
+    def _check(self, fmt):
+        names = [attr.name for attr in fmt.Example._attrs]
+        assert_equals(names, ["num_integers", "integers", "extra_int"])
+        assert_equals(fmt.Example.__doc__, "")
+        example = fmt.Example()
+        example.num_integers = 2
+        assert_true(fmt.Example._attrs[2].cond.eval(example))
+
+    def test_cache(self):
+        self._check(self._format())
+        cache_files = os.listdir(self.cache_path)
+        assert_equals(len(cache_files), 1)
+        assert_true(cache_files[0].startswith("exampleformat_"))
+        # second time the cache is used
+        fmt = self._format()
+        self._check(fmt)
+        assert_equals(fmt._attribute_names["Extra Int"], "extra_int")
+        assert_equals(os.listdir(self.cache_path), cache_files)
+
+    def test_xml_changed(self):
+        self._format()
+        with open(os.path.join(self.xml_path, "example.xml"), "w") as f:
+            f.write(XML.replace("Extra Int", "Other Int"))
+        fmt = self._format()
+        assert_equals([attr.name for attr in fmt.Example._attrs],
+                      ["num_integers", "integers", "other_int"])
+        assert_equals(len(os.listdir(self.cache_path)), 2)
+
+    def test_invalid_cache(self):
+        self._format()
+        cache_file, = os.listdir(self.cache_path)
+        with open(os.path.join(self.cache_path, cache_file), "wb") as f:
+            f.write(b"garbage")
+        self._check(self._format())
+
+    def test_no_cache(self):
+        self.cache_path = None
+        self._check(self._format())
+        assert_false(os.path.exists(os.path.join(self.xml_path, "cache")))
+
+    def test_default_no_cache(self):
+        # the cache is only used if asked for
+        if not os.getenv("PYFFICACHEPATH"):
+            assert_equals(pyffi.object_models.xml.FileFormat.xml_cache_path,
+                          None)
@@ -0,0 +1,298 @@
+import io
+import math
+import unittest
+
+from nose.tools import assert_equals, assert_true, assert_false
+
+import pyffi.object_models.common
+from pyffi.object_models import FileFormat
+from pyffi.object_models.xml import StructAttribute as Attr
+from pyffi.object_models.xml import BitStructAttribute as BitAttr
+from pyffi.object_models.xml.basic import BasicBase
+from pyffi.object_models.xml.bit_struct import BitStructBase
+from pyffi.object_models.xml.struct_ import StructBase
+
+
+class SimpleFormat(object):
+    class UInt(BasicBase):
+        _is_template = False
+
+        def __init__(self, **kwargs):
+            BasicBase.__init__(self, **kwargs)
+            self.__value = 0
+
+        def get_value(self):
+            return self.__value
+
+        def set_value(self, value):
+            self.__value = int(value)
+
+    @staticmethod
+    def name_attribute(name):
+        return name
+
+    @staticmethod
+    def version_number(version_str):
+        return int(version_str)
+
+
+class Data(object):
+    def __init__(self, version, user_version, user_version_2=0):
+        self.version = version
+        self.user_version = user_version
+        self.user_version_2 = user_version_2
+
+
+class X(StructBase):
+    _is_template = False
+    _attrs = [
+        Attr(SimpleFormat, dict(name='a', type='UInt')),
+        Attr(SimpleFormat, dict(name='b', type='UInt', ver1='2')),
+        Attr(SimpleFormat, dict(name='c', type='UInt', ver2='3')),
+        Attr(SimpleFormat, dict(name='d', type='UInt', userver='1')),
+        Attr(SimpleFormat, dict(name='e', type='UInt', cond='a == 1')),
+        Attr(SimpleFormat, dict(name='f', type='UInt',
+                                vercond='user_version_2 == 5')),
+        Attr(SimpleFormat, dict(name='g', type='UInt', cond='a == 1')),
+        Attr(SimpleFormat, dict(name='g', type='UInt', cond='a != 1')),
+    ]
+
+
+def _names(struct, data=None):
+    return [attr.name for attr in struct._get_filtered_attribute_list(data)]
+
+
+class TestAttributePlan(unittest.TestCase):
+
+    def setUp(self):
+        X._attribute_plans.clear()
+        self.x = X()
+
+    def test_no_data(self):
+        assert_equals(_names(self.x), ['a', 'b', 'c', 'd', 'f', 'g'])
+        self.x.a = 1
+        assert_equals(_names(self.x), ['a', 'b', 'c', 'd', 'e', 'f', 'g'])
+
+    def test_version(self):
+        assert_equals(_names(self.x, Data(1, 0)), ['a', 'c', 'g'])
+        assert_equals(_names(self.x, Data(2, 1)), ['a', 'b', 'c', 'd', 'g'])
+        assert_equals(_names(self.x, Data(4, 1, 5)),
+                      ['a', 'b', 'd', 'f', 'g'])
+
+    def test_plan_cache(self):
+        _names(self.x, Data(2, 1))
+        _names(self.x, Data(2, 1))
+        _names(self.x, Data(2, 1, 5))
+        assert_equals(sorted(X._attribute_plans), [(2, 1, 0), (2, 1, 5)])
+        attrs, unique = X._get_attribute_plan(Data(2, 1, 5))
+        assert_equals([attr.name for attr, cond in attrs],
+                      ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'g'])
+        assert_false(unique)
+
+    def test_duplicate_names(self):
+        # the first 'g' whose condition holds is used
+        self.x.a = 1
+        attrs = list(self.x._get_filtered_attribute_list(Data(2, 1)))
+        assert_true(attrs[-1] is X._attrs[6])
+        self.x.a = 0
+        attrs = list(self.x._get_filtered_attribute_list(Data(2, 1)))
+        assert_true(attrs[-1] is X._attrs[7])
+
+
+class RunFormat(object):
+    UInt = pyffi.object_models.common.UInt
+    UShort = pyffi.object_models.common.UShort
+    Float = pyffi.object_models.common.Float
+    ULittle32 = pyffi.object_models.common.ULittle32
+
+    @staticmethod
+    def name_attribute(name):
+        return name
+
+    @staticmethod
+    def version_number(version_str):
+        return int(version_str)
+
+
+class Vec(StructBase):
+    _is_template = False
+    _attrs = [
+        Attr(RunFormat, dict(name='x', type='Float')),
+        Attr(RunFormat, dict(name='y', type='Float')),
+        Attr(RunFormat, dict(name='z', type='Float')),
+    ]
+
+RunFormat.Vec = Vec
+
+
+class Thing(StructBase):
+    _is_template = False
+    _attrs = [
+        Attr(RunFormat, dict(name='a', type='UInt')),
+        Attr(RunFormat, dict(name='v', type='Vec')),
+        Attr(RunFormat, dict(name='b', type='UShort', cond='a == 1')),
+        Attr(RunFormat, dict(name='c', type='UShort')),
+        Attr(RunFormat, dict(name='d', type='Float', ver1='2')),
+        Attr(RunFormat, dict(name='e', type='ULittle32')),
+        Attr(RunFormat, dict(name='f', type='UShort')),
+    ]
+
+
+class RunData(FileFormat.Data):
+    def __init__(self, version, byte_order='<', use_struct_runs=True):
+        self.version = version
+        self.user_version = 0
+        self.user_version_2 = 0
+        self._byte_order = byte_order
+        self.use_struct_runs = use_struct_runs
+
+
+def _values(thing):
+    return ([thing.v.x, thing.v.y, thing.v.z]
+            + [getattr(thing, name) for name in "abcdef"])
+
+
+class TestStructRuns(unittest.TestCase):
+
+    def setUp(self):
+        self.thing = Thing()
+        self.thing.a = 1
+        self.thing.v.x = 1.5
+        self.thing.v.y = -2.0
+        self.thing.v.z = 0.25
+        self.thing.b = 7
+        self.thing.c = 65535
+        self.thing.d = 3.0
+        self.thing.e = 123456
+        self.thing.f = 9
+
+    def _steps(self, data):
+        return [run.size if run else attr.name
+                for attr, cond, run in Thing._get_struct_steps(data)]
+
+    def test_steps(self):
+        assert_equals(self._steps(RunData(1)), [16, 'b', 2, 'e', 2])
+        assert_equals(self._steps(RunData(2)), [16, 'b', 6, 'e', 2])
+        assert_equals(
+            Thing._get_struct_steps(RunData(2, use_struct_runs=False)), None)
+        # duplicate names disable runs
+        assert_equals(X._get_struct_steps(RunData(2)), None)
+
+    def _write(self, data):
+        stream = io.BytesIO()
+        self.thing.write(stream, data)
+        assert_equals(len(stream.getvalue()), self.thing.get_size(data))
+        return stream.getvalue()
+
+    def test_write_matches_generic(self):
+        for version in (1, 2):
+            for byte_order in "<>":
+                assert_equals(
+                    self._write(RunData(version, byte_order)),
+                    self._write(RunData(version, byte_order, False)))
+        self.thing.a = 0
+        assert_equals(self._write(RunData(2)),
+                      self._write(RunData(2, use_struct_runs=False)))
+
+    def test_read_matches_generic(self):
+        for version in (1, 2):
+            for byte_order in "<>":
+                data = RunData(version, byte_order)
+                raw = self._write(data)
+                thing = Thing()
+                thing.read(io.BytesIO(raw), data)
+                assert_equals(thing.get_hash(data), self.thing.get_hash(data))
+                generic_thing = Thing()
+                generic_thing.read(
+                    io.BytesIO(raw), RunData(version, byte_order, False))
+                assert_equals(_values(thing), _values(generic_thing))
+
+    def test_write_overflow(self):
+        # float overflow falls back on the generic code, which writes NaN
+        self.thing.v.y = 1e100
+        data = RunData(2)
+        raw = self._write(data)
+        assert_equals(raw, self._write(RunData(2, use_struct_runs=False)))
+        thing = Thing()
+        thing.read(io.BytesIO(raw), data)
+        assert_true(math.isnan(thing.v.y))
+        assert_equals(thing.c, 65535)
+
+
+class CachedThing(Thing):
+    _cache_hash = True
+
+
+class Flags(BitStructBase):
+    _numbytes = 1
+    _attrs = [BitAttr(RunFormat, dict(name='a', numbits='3')),
+              BitAttr(RunFormat, dict(name='b', numbits='1'))]
+
+RunFormat.Flags = Flags
+
+
+class FlaggedThing(StructBase):
+    _is_template = False
+    _cache_hash = True
+    _attrs = [
+        Attr(RunFormat, dict(name='a', type='UInt')),
+        Attr(RunFormat, dict(name='flags', type='Flags')),
+    ]
+
+
+class TestHashCache(unittest.TestCase):
+
+    def setUp(self):
+        self.thing = CachedThing()
+        self.thing.a = 1
+
+    def test_cache(self):
+        hsh = self.thing.get_hash()
+        assert_true(self.thing.get_hash() is hsh)
+        # nested values invalidate the cache
+        self.thing.v.y = 3.5
+        assert_false(self.thing.get_hash() is hsh)
+        other = Thing()
+        other.a = 1
+        other.v.y = 3.5
+        assert_equals(self.thing.get_hash(), other.get_hash())
+        # the hash depends on the version
+        hsh = self.thing.get_hash(RunData(1))
+        assert_equals(len(self.thing.get_hash(RunData(2))), len(hsh) + 1)
+        assert_equals(self.thing.get_hash(RunData(1)), hsh)
+        # reading invalidates the cache
+        data = RunData(2)
+        stream = io.BytesIO()
+        Thing().write(stream, data)
+        self.thing.read(io.BytesIO(stream.getvalue()), data)
+        assert_equals(self.thing.get_hash(data), Thing().get_hash(data))
+
+    def test_basic_value(self):
+        hsh = self.thing.get_hash()
+        # setting a basic value directly invalidates the cache
+        self.thing._c_value_.set_value(7)
+        assert_false(self.thing.get_hash() is hsh)
+        other = Thing()
+        other.a = 1
+        other.c = 7
+        assert_equals(self.thing.get_hash(), other.get_hash())
+
+    def test_bit_struct(self):
+        thing = FlaggedThing()
+        hsh = thing.get_hash()
+        # so does setting a bit of a bit structure
+        thing.flags.b = 1
+        assert_false(thing.get_hash() == hsh)
+        hsh = thing.get_hash()
+        thing.flags._a_value_.set_value(5)
+        assert_false(thing.get_hash() == hsh)
+        assert_equals(thing.get_hash(), (0, (5, 1)))
+
+    def test_digest(self):
+        digest = self.thing.get_digest()
+        assert_equals(self.thing.get_digest(), digest)
+        other = Thing()
+        other.a = 1
+        assert_equals(other.get_digest(), digest)
+        self.thing.c = 7
+        assert_false(self.thing.get_digest() == digest)
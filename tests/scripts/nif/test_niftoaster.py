@@ -44,6 +44,23 @@ def test_check_readwrite():
         assert_equal(sorted(toaster.files_done), [file_path])
 
 
+def test_check_readwrite_only_types():
+    """Test read nif parsing only some block types"""
+    file_path = nif_dir + "test_check_tangentspace2.nif"
+    toaster = call_niftoaster(
+        "--raise", "--only-types", "NiTriStripsData", "check_readwrite",
+        file_path)
+    assert_equal(sorted(toaster.files_done), [file_path])
+
+
+def test_check_readwrite_in_memory():
+    """Test read and write nif files loaded into memory"""
+    file_path = nif_dir + "test_check_tangentspace2.nif"
+    toaster = call_niftoaster(
+        "--raise", "--in-memory", "check_readwrite", file_path)
+    assert_equal(sorted(toaster.files_done), [file_path])
+
+
 def test_check_skip_only():
     """Test skip NIF files using filters and type"""
     toaster = call_niftoaster(
@@ -0,0 +1,35 @@
+"""Tests for the dump_python spell"""
+import os.path
+
+from nose.tools import assert_equals
+
+from pyffi.formats.nif import NifFormat
+from tests.scripts.nif import call_niftoaster
+from tests.utils import BaseNifFileTestCase, assert_tuple_values
+
+
+class TestDumpPythonNif(BaseNifFileTestCase):
+    """Invoke the dump_python spell through nif toaster"""
+
+    def setUp(self):
+        super(TestDumpPythonNif, self).setUp()
+        self.src_name = "test_vertexcolor.nif"
+        super(TestDumpPythonNif, self).copyFile()
+        super(TestDumpPythonNif, self).readNifData()
+
+    def test_packed_arrays(self):
+        """Test that the vertices, which are read packed, are dumped"""
+
+        call_niftoaster("--raise", "dump_python", self.dest_file)
+        dump_file = os.path.splitext(self.dest_file)[0] + "_dump.py"
+        with open(dump_file) as stream:
+            code = stream.read()
+        namespace = {}
+        exec(code, namespace)
+        data = namespace["n_create_data"]()
+        geomdata, = data.roots[0].tree(block_type=NifFormat.NiGeometryData)
+        orig_geomdata, = self.data.roots[0].tree(
+            block_type=NifFormat.NiGeometryData)
+        assert_equals(len(geomdata.vertices), 24)
+        for vert, orig_vert in zip(geomdata.vertices, orig_geomdata.vertices):
+            assert_tuple_values(vert.as_tuple(), orig_vert.as_tuple())
@@ -0,0 +1,108 @@
+from pyffi.utils.withref import ref
+from pyffi.formats.nif import NifFormat
+
+
+def n_create_data():
+    n_data = NifFormat.Data()
+    n_data.version = 0x14000005
+    n_data.user_version = 11
+    n_data.user_version_2 = 11
+    n_create_blocks(n_data)
+    return n_data
+
+def n_create_blocks(n_data):
+    n_ninode_1 = NifFormat.NiNode()
+    n_nitristrips_1 = NifFormat.NiTriStrips()
+    n_nistencilproperty_1 = NifFormat.NiStencilProperty()
+    n_nispecularproperty_1 = NifFormat.NiSpecularProperty()
+    n_nimaterialproperty_1 = NifFormat.NiMaterialProperty()
+    n_nivertexcolorproperty_1 = NifFormat.NiVertexColorProperty()
+    n_nitristripsdata_1 = NifFormat.NiTriStripsData()
+    n_data.roots = [n_ninode_1]
+
+    with ref(n_ninode_1) as n_ninode:
+        n_ninode.name = b'Scene Root'
+        n_ninode.flags = 14
+        n_ninode.num_children = 1
+        n_ninode.children.update_size()
+        n_ninode.children[0] = n_nitristrips_1
+    with ref(n_nitristrips_1) as n_nitristrips:
+        n_nitristrips.name = b'Cube'
+        n_nitristrips.flags = 14
+        n_nitristrips.num_properties = 4
+        n_nitristrips.properties.update_size()
+        n_nitristrips.properties[0] = n_nistencilproperty_1
+        n_nitristrips.properties[1] = n_nispecularproperty_1
+        n_nitristrips.properties[2] = n_nimaterialproperty_1
+        n_nitristrips.properties[3] = n_nivertexcolorproperty_1
+        n_nitristrips.data = n_nitristripsdata_1
+    with ref(n_nispecularproperty_1) as n_nispecularproperty:
+        n_nispecularproperty.flags = 1
+    with ref(n_nimaterialproperty_1) as n_nimaterialproperty:
+        n_nimaterialproperty.name = b'Material'
+        with ref(n_nimaterialproperty.ambient_color) as n_color3:
+            n_color3.r = 0.4
+            n_color3.g = 0.4
+            n_color3.b = 0.4
+        with ref(n_nimaterialproperty.diffuse_color) as n_color3:
+            n_color3.r = 0.8
+            n_color3.g = 0.8
+            n_color3.b = 0.8
+        with ref(n_nimaterialproperty.specular_color) as n_color3:
+            n_color3.r = 0.5
+            n_color3.g = 0.5
+            n_color3.b = 0.5
+        n_nimaterialproperty.glossiness = 12.5
+        n_nimaterialproperty.alpha = 1
+    with ref(n_nitristripsdata_1) as n_nitristripsdata:
+        n_nitristripsdata.num_vertices = 24
+        n_nitristripsdata.vertices.update_size()
+        n_nitristripsdata.has_normals = True
+        n_nitristripsdata.normals.update_size()
+        with ref(n_nitristripsdata.center) as n_vector3:
+            n_vector3.x = 5.96046e-07
+            n_vector3.y = -1.19209e-06
+        n_nitristripsdata.radius = 17.3205
+        n_nitristripsdata.has_vertex_colors = True
+        n_nitristripsdata.vertex_colors.update_size()
+        n_nitristripsdata.consistency_flags = 16384
+        n_nitristripsdata.num_triangles = 32
+        n_nitristripsdata.num_strips = 1
+        n_nitristripsdata.strip_lengths.update_size()
+        n_nitristripsdata.strip_lengths[0] = 34
+        n_nitristripsdata.has_points = True
+        n_nitristripsdata.points.update_size()
+        n_nitristripsdata.points[0][0] = 7
+        n_nitristripsdata.points[0][1] = 4
+        n_nitristripsdata.points[0][2] = 6
+        n_nitristripsdata.points[0][3] = 5
+        n_nitristripsdata.points[0][4] = 5
+        n_nitristripsdata.points[0][5] = 3
+        n_nitristripsdata.points[0][6] = 3
+        n_nitristripsdata.points[0][8] = 2
+        n_nitristripsdata.points[0][9] = 1
+        n_nitristripsdata.points[0][10] = 1
+        n_nitristripsdata.points[0][11] = 11
+        n_nitristripsdata.points[0][12] = 11
+        n_nitristripsdata.points[0][13] = 8
+        n_nitristripsdata.points[0][14] = 10
+        n_nitristripsdata.points[0][15] = 9
+        n_nitristripsdata.points[0][16] = 9
+        n_nitristripsdata.points[0][17] = 23
+        n_nitristripsdata.points[0][18] = 23
+        n_nitristripsdata.points[0][19] = 20
+        n_nitristripsdata.points[0][20] = 22
+        n_nitristripsdata.points[0][21] = 21
+        n_nitristripsdata.points[0][22] = 21
+        n_nitristripsdata.points[0][23] = 15
+        n_nitristripsdata.points[0][24] = 15
+        n_nitristripsdata.points[0][25] = 12
+        n_nitristripsdata.points[0][26] = 14
+        n_nitristripsdata.points[0][27] = 13
+        n_nitristripsdata.points[0][28] = 13
+        n_nitristripsdata.points[0][29] = 19
+        n_nitristripsdata.points[0][30] = 19
+        n_nitristripsdata.points[0][31] = 16
+        n_nitristripsdata.points[0][32] = 18
+        n_nitristripsdata.points[0][33] = 17
+    return n_data
@@ -80,4 +80,29 @@ class TestExplicitMergeDuplicatesGeomOptimisationNif(BaseNifFileTestCase):
         spell = pyffi.spells.nif.optimize.SpellMergeDuplicates(data=self.data)
         spell.recurse()
 
-        assert_false(has_duplicates(self.data.roots[0]))
\ No newline at end of file
+        assert_false(has_duplicates(self.data.roots[0]))
+
+def test_merge_duplicate_properties():
+    from pyffi.formats.nif import NifFormat
+    root = NifFormat.NiNode()
+    materials = []
+    for i in range(50):
+        shape = NifFormat.NiTriShape()
+        root.add_child(shape)
+        material = NifFormat.NiMaterialProperty()
+        # names are ignored, except for special names
+        material.name = ("Material%i" % i).encode("ascii")
+        material.glossiness = i % 2
+        shape.add_property(material)
+        materials.append(material)
+    # a special name is not merged with the other materials
+    materials[-1].name = b"skin"
+    data = NifFormat.Data()
+    data.roots = [root]
+    spell = pyffi.spells.nif.optimize.SpellMergeDuplicates(data=data)
+    spell.recurse()
+    properties = [shape.properties[0] for shape in root.children]
+    assert_true(all(prop is materials[i % 2]
+                    for i, prop in enumerate(properties[:-1])))
+    assert_true(properties[-1] is materials[-1])
+    assert_false(has_duplicates(root))
@@ -3,10 +3,11 @@ import tempfile
 import os
 import shutil
 
-from nose.tools import assert_true, assert_false
+from nose.tools import assert_true, assert_false, assert_equal, assert_raises
 
 from pyffi.formats.nif import NifFormat
 from pyffi.spells import Toaster
+from pyffi.spells.nif import NifSpell
 
 
 class MyToaster(Toaster):
@@ -58,6 +59,383 @@ class TestToaster:
         assert_true(toaster.is_admissible_branch_class(NifFormat.NiAlphaProperty))
 
 
+    def test_toaster_only_types(self):
+        """Test that --only-types skips files without such blocks"""
+        file_path = os.path.join(TestIniParser.input_files,
+                                 'test_check_tangentspace2.nif')
+        for only_types, result in (([], True),
+                                   (["NiSkinInstance"], False),
+                                   (["NiGeometryData"], True)):
+            toaster = MyToaster(options={"onlytypes": only_types})
+            data = NifFormat.Data()
+            with open(file_path, 'rb') as stream:
+                data.inspect(stream)
+                spell = NifSpell(toaster=toaster, data=data, stream=stream)
+                assert_equal(spell._datainspect(), result)
+
+    def test_toaster_only_types_unsupported(self):
+        """Test that --only-types is refused for formats which cannot
+        skip blocks"""
+        from pyffi.formats.cgf import CgfFormat
+
+        class CgfToaster(Toaster):
+            FILEFORMAT = CgfFormat
+
+        try:
+            CgfToaster(options={"onlytypes": ["MeshChunk"]})
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError")
+        CgfToaster(options={"onlytypes": []})
+
+    def test_toaster_target_types(self):
+        """Test that spells with target types only skip branches that
+        cannot lead to a target"""
+        class VisitSpell(NifSpell):
+            def dataentry(self):
+                self.visited = []
+                return True
+
+            def branchentry(self, branch):
+                self.visited.append(branch)
+                return True
+
+        class TargetSpell(VisitSpell):
+            TARGET_TYPES = (NifFormat.NiMaterialProperty,)
+
+        data = NifFormat.Data()
+        file_path = os.path.join(TestIniParser.input_files,
+                                 'test_vertexcolor.nif')
+        with open(file_path, 'rb') as stream:
+            data.read(stream)
+        toaster = MyToaster()
+        spell = VisitSpell(toaster=toaster, data=data)
+        spell.recurse()
+        target_spell = TargetSpell(toaster=toaster, data=data)
+        target_spell.recurse()
+        assert_true(len(target_spell.visited) < len(spell.visited))
+        assert_equal(
+            [branch for branch in spell.visited
+             if isinstance(branch, NifFormat.NiMaterialProperty)],
+            [branch for branch in target_spell.visited
+             if isinstance(branch, NifFormat.NiMaterialProperty)])
+        assert_true(any(isinstance(branch, NifFormat.NiMaterialProperty)
+                        for branch in target_spell.visited))
+        assert_false(any(isinstance(branch, NifFormat.NiTriShapeData)
+                         for branch in target_spell.visited))
+
+    def test_spell_group_fused(self):
+        """Test that fused spells see the same branches as when they are
+        cast on their own, in a single traversal"""
+        import pyffi.spells
+
+        class VisitSpell(NifSpell):
+            SPELLNAME = "visit"
+
+            def dataentry(self):
+                self.visited = []
+                return True
+
+            def branchentry(self, branch):
+                self.visited.append(branch)
+                return True
+
+        class VisitAVObjectSpell(VisitSpell):
+            SPELLNAME = "visit_avobject"
+
+            def branchinspect(self, branch):
+                return isinstance(branch, NifFormat.NiAVObject)
+
+        class VisitMaterialSpell(VisitSpell):
+            SPELLNAME = "visit_material"
+            TARGET_TYPES = (NifFormat.NiMaterialProperty,)
+
+            def branchentry(self, branch):
+                VisitSpell.branchentry(self, branch)
+                return not isinstance(branch, NifFormat.NiMaterialProperty)
+
+        class TopologySpell(VisitSpell):
+            SPELLNAME = "topology"
+            CHANGES_TOPOLOGY = True
+
+        data = NifFormat.Data()
+        file_path = os.path.join(TestIniParser.input_files,
+                                 'test_vertexcolor.nif')
+        with open(file_path, 'rb') as stream:
+            data.read(stream)
+        toaster = MyToaster()
+        spellclasses = (VisitSpell, VisitAVObjectSpell, TopologySpell,
+                        VisitMaterialSpell)
+        group = pyffi.spells.SpellGroupFused(*spellclasses)
+        group.toastentry(toaster)
+        spell = group(toaster=toaster, data=data)
+        assert_equal([[type(run_spell) for run_spell in run]
+                      for run in spell._get_runs()],
+                     [[VisitSpell, VisitAVObjectSpell], [TopologySpell],
+                      [VisitMaterialSpell]])
+        assert_true(group.CHANGES_TOPOLOGY)
+        spell.recurse()
+        for spellclass, fused_spell in zip(spellclasses, spell.spells):
+            single_spell = spellclass(toaster=toaster, data=data)
+            single_spell.recurse()
+            assert_equal(fused_spell.visited, single_spell.visited)
+
+    def test_spell_group_fused_nested(self):
+        """Test that fused spells refuse to be cast through the hooks of
+        a parallel group, which would silently skip them"""
+        import pyffi.spells
+
+        class VisitSpell(NifSpell):
+            SPELLNAME = "visit"
+
+        data = NifFormat.Data()
+        toaster = MyToaster()
+        group = pyffi.spells.SpellGroupParallel(
+            VisitSpell, pyffi.spells.SpellGroupFused(VisitSpell, VisitSpell))
+        group.toastentry(toaster)
+        spell = group(toaster=toaster, data=data)
+        assert_raises(RuntimeError, spell.recurse)
+
+    def test_toaster_quiet(self):
+        """Test that branch messages and their indentation are skipped if
+        info messages are not logged"""
+        import pyffi.spells
+
+        class IndentSpell(NifSpell):
+            SPELLNAME = "indent"
+
+            def dataentry(self):
+                self.indents = []
+                return True
+
+            def branchentry(self, branch):
+                self.indents.append(self.toaster.indent)
+                return True
+
+        data = NifFormat.Data()
+        file_path = os.path.join(TestIniParser.input_files,
+                                 'test_vertexcolor.nif')
+        with open(file_path, 'rb') as stream:
+            data.read(stream)
+        group = pyffi.spells.SpellGroupFused(IndentSpell, IndentSpell)
+        for verbose, logged in ((1, True), (0, False)):
+            toaster = MyToaster(options={"verbose": verbose})
+            assert_equal(toaster.is_logging(), logged)
+            group.toastentry(toaster)
+            single_spell = IndentSpell(toaster=toaster, data=data)
+            single_spell.recurse()
+            fused_spell = group(toaster=toaster, data=data)
+            fused_spell.recurse()
+            for spell in [single_spell] + fused_spell.spells:
+                assert_true(spell.indents)
+                assert_equal(all(spell.indents), logged)
+            assert_equal(toaster.indent, 0)
+
+    def test_toaster_worker(self):
+        """Test that a worker toaster is reused for all its files, and that
+        its results are merged into the main toaster"""
+        import pyffi.spells
+        import pyffi.spells.nif.check
+
+        class WorkerToaster(Toaster):
+            FILEFORMAT = NifFormat
+            SPELLS = [pyffi.spells.nif.check.SpellCheckVersion]
+
+        options = dict(WorkerToaster.DEFAULT_OPTIONS, dryrun=True)
+        toaster = WorkerToaster(options=options, spellnames=["check_version"])
+        toaster.spellclass.toastentry(toaster)
+        pyffi.spells._toaster_init(
+            WorkerToaster, options, ["check_version"])
+        try:
+            worker_toaster = pyffi.spells._toaster
+            for name in ('test_check_tangentspace2.nif',
+                         'test_vertexcolor.nif',
+                         'test_check_tangentspace1.nif'):
+                toaster.merge(pyffi.spells._toaster_job(
+                    os.path.join(TestIniParser.input_files, name)))
+            assert_true(pyffi.spells._toaster is worker_toaster)
+        finally:
+            pyffi.spells._toaster = None
+        assert_equal(len(toaster.files_done), 3)
+        assert_equal(worker_toaster.files_done, {})
+        assert_equal(worker_toaster.versions, {})
+        assert_equal(toaster.versions, {0x14000005: 2, 0x14020007: 1})
+        assert_equal(toaster.user_version_2s[0x14000005], [11])
+
+    def test_toaster_jobs(self):
+        """Test that a worker pool toasts all files, and that the expected
+        and actual times are recorded"""
+        import pyffi.spells.nif.check
+
+        class JobsToaster(Toaster):
+            FILEFORMAT = NifFormat
+            SPELLS = [pyffi.spells.nif.check.SpellCheckVersion]
+
+        top = tempfile.mkdtemp()
+        try:
+            for name in ('test_check_tangentspace2.nif',
+                         'test_vertexcolor.nif',
+                         'test_check_tangentspace1.nif'):
+                shutil.copy(os.path.join(TestIniParser.input_files, name),
+                            top)
+            options = dict(JobsToaster.DEFAULT_OPTIONS, jobs=2, dryrun=True)
+            toaster = JobsToaster(options=options,
+                                  spellnames=["check_version"])
+            toaster.toast(top)
+        finally:
+            shutil.rmtree(top)
+        assert_equal(len(toaster.files_done), 3)
+        assert_equal(set(toaster.file_times), set(toaster.files_done))
+        expected_times = [expected for expected, elapsed
+                          in toaster.file_times.values()]
+        # no estimate for the first file
+        assert_equal(expected_times.count(None), 1)
+        assert_equal(toaster.versions, {0x14000005: 2, 0x14020007: 1})
+
+
+    def test_toaster_manifest(self):
+        """Test that files are not toasted again if neither they nor the
+        spells have changed since they were recorded in the manifest"""
+        import pyffi.spells.nif.check
+
+        class ManifestToaster(Toaster):
+            FILEFORMAT = NifFormat
+            SPELLS = [pyffi.spells.nif.check.SpellCheckVersion,
+                      pyffi.spells.nif.check.SpellCheckTriangles]
+
+        names = ('test_check_tangentspace2.nif', 'test_vertexcolor.nif',
+                 'test_check_tangentspace1.nif')
+        top = tempfile.mkdtemp()
+
+        def toast(jobs=1, spellnames=("check_version",)):
+            options = dict(ManifestToaster.DEFAULT_OPTIONS, jobs=jobs,
+                           dryrun=True,
+                           manifest=os.path.join(top, "manifest.db"))
+            toaster = ManifestToaster(options=options,
+                                      spellnames=list(spellnames))
+            toaster.toast(os.path.join(top, "files"))
+            return sorted(os.path.basename(filename)
+                          for filename in toaster.files_done)
+
+        try:
+            os.mkdir(os.path.join(top, "files"))
+            for name in names:
+                shutil.copy(os.path.join(TestIniParser.input_files, name),
+                            os.path.join(top, "files"))
+            assert_equal(toast(), sorted(names))
+            assert_equal(toast(), [])
+            assert_equal(toast(jobs=2), [])
+            # only the modification time changed
+            os.utime(os.path.join(top, "files", names[0]), (0, 0))
+            assert_equal(toast(), [])
+            # contents changed
+            shutil.copy(os.path.join(TestIniParser.input_files, names[2]),
+                        os.path.join(top, "files", names[0]))
+            assert_equal(toast(jobs=2), [names[0]])
+            assert_equal(toast(), [])
+            # spells changed
+            assert_equal(toast(spellnames=["check_triangles"]),
+                         sorted(names))
+        finally:
+            shutil.rmtree(top)
+
+
+    def test_toaster_profile(self):
+        """Test that every file is profiled, also by worker processes, and
+        that the cProfile statistics are merged"""
+        import json
+        import pstats
+        import pyffi.spells.nif.check
+
+        class ProfileToaster(Toaster):
+            FILEFORMAT = NifFormat
+            SPELLS = [pyffi.spells.nif.check.SpellCheckVersion,
+                      pyffi.spells.nif.check.SpellCheckTriangles]
+
+        names = ('test_check_tangentspace2.nif', 'test_vertexcolor.nif',
+                 'test_check_tangentspace1.nif')
+        top = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(top, "files"))
+            for name in names:
+                shutil.copy(os.path.join(TestIniParser.input_files, name),
+                            os.path.join(top, "files"))
+            for jobs in (1, 2):
+                options = dict(
+                    ProfileToaster.DEFAULT_OPTIONS, jobs=jobs, dryrun=True,
+                    profile=os.path.join(top, "profile.jsonl"),
+                    profilestats=os.path.join(top, "profile.stats"))
+                toaster = ProfileToaster(
+                    options=options,
+                    spellnames=["check_version", "check_triangles"])
+                toaster.toast(os.path.join(top, "files"))
+                with open(os.path.join(top, "profile.jsonl")) as stream:
+                    records = [json.loads(line) for line in stream]
+                assert_equal(sorted(os.path.basename(record["file"])
+                                    for record in records), sorted(names))
+                for record in records:
+                    assert_equal(sorted(record["times"]),
+                                 ["inspect", "read", "recurse", "total"])
+                    # both spells are cast in a single traversal
+                    assert_equal(list(record["spells"]),
+                                 ["check_version & check_triangles"])
+                    assert_true(record["blocks"] > 0)
+                    assert_false(record["failed"])
+                stats = pstats.Stats(os.path.join(top, "profile.stats"))
+                assert_true(any(name == "recurse" for _, _, name
+                                in stats.stats))
+                assert_true(toaster.profiler is None)
+        finally:
+            shutil.rmtree(top)
+
+
+    def test_toaster_write(self):
+        """Test that files are replaced only once they are completely
+        written, and are left untouched if writing fails"""
+
+        class ChangeSpell(NifSpell):
+            SPELLNAME = "change"
+            READONLY = False
+            fail = False
+
+            def dataentry(self):
+                self.changed = True
+                if self.fail:
+                    def write(stream):
+                        stream.write(b"junk")
+                        raise ValueError("write failed")
+                    self.data.write = write
+                return False
+
+        class WriteToaster(Toaster):
+            FILEFORMAT = NifFormat
+            SPELLS = [ChangeSpell]
+
+        name = 'test_vertexcolor.nif'
+        top = tempfile.mkdtemp()
+        filename = os.path.join(top, name)
+        try:
+            shutil.copy(os.path.join(TestIniParser.input_files, name), top)
+            os.chmod(filename, 0o640)
+            with open(filename, 'rb') as stream:
+                original = stream.read()
+            options = dict(WriteToaster.DEFAULT_OPTIONS, jobs=1,
+                           interactive=False)
+            for fail in (False, True):
+                ChangeSpell.fail = fail
+                toaster = WriteToaster(options=options, spellnames=["change"])
+                toaster.toast(top)
+                assert_equal(os.listdir(top), [name])
+                assert_equal(os.stat(filename).st_mode & 0o777, 0o640)
+                assert_equal(len(toaster.files_failed), int(fail))
+                with open(filename, 'rb') as stream:
+                    assert_equal(stream.read(), original)
+        finally:
+            ChangeSpell.fail = False
+            shutil.rmtree(top)
+
+
 class TestIniParser:
     """Test the Ini parser"""
 
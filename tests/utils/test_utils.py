@@ -1,6 +1,6 @@
 """Tests for pyffi.utils module."""
 
-from pyffi.utils import unique_map, hex_dump
+from pyffi.utils import unique_map, hex_dump, MemoryFile, walk, walk_sizes
 import nose.tools
 
 
@@ -25,3 +25,63 @@ def test_unique_map():
     nose.tools.assert_equals(unique_map([3, 2, 6, None, 1]), ([0, 1, 2, None, 3], [0, 1, 2, 4]))
     nose.tools.assert_equals(unique_map([3, 1, 6, 1]), ([0, 1, 2, 1], [0, 1, 2]))
     nose.tools.assert_equals(unique_map([3, 1, 6, 1, 2, 2, 9, 3, 2]), ([0, 1, 2, 1, 3, 3, 4, 0, 3], [0, 1, 2, 4, 6]))
+
+
+def test_memory_file():
+    """Test memory file reads like a file and refuses write only modes"""
+    from tempfile import NamedTemporaryFile
+    import os
+    with NamedTemporaryFile(delete=False) as f:
+        f.write(b'abcdefg')
+    try:
+        with MemoryFile(f.name) as stream:
+            nose.tools.assert_equals(stream.name, f.name)
+            stream.seek(2)
+            nose.tools.assert_equals(stream.read(3), b'cde')
+            nose.tools.assert_equals(stream.read(), b'fg')
+        nose.tools.assert_raises(ValueError, MemoryFile, f.name, 'wb')
+    finally:
+        os.remove(f.name)
+
+
+def test_walk_sizes():
+    """Test walk_sizes finds the same files as walk, with their sizes"""
+    import os
+    import re
+    from tests.utils import test_root
+    top = os.path.join(test_root, 'spells', 'nif', 'files')
+    re_filename = re.compile(r'^.*\.nif$')
+    files = list(walk_sizes(top, re_filename=re_filename))
+    nose.tools.assert_equals(
+        [filename for filename, size in files],
+        list(walk(top, re_filename=re_filename)))
+    for filename, size in files:
+        nose.tools.assert_equals(size, os.path.getsize(filename))
+    # a single file
+    nose.tools.assert_equals(list(walk_sizes(files[0][0])), files[:1])
+
+
+def test_walk_sizes_symlinks():
+    """Test walk_sizes does not follow links to folders, like walk"""
+    import os
+    import shutil
+    import tempfile
+    top = tempfile.mkdtemp()
+    try:
+        os.mkdir(os.path.join(top, "sub"))
+        with open(os.path.join(top, "sub", "a.nif"), "wb") as f:
+            f.write(b"abc")
+        try:
+            # a cycle
+            os.symlink(top, os.path.join(top, "sub", "loop"))
+            os.symlink(os.path.join(top, "sub", "a.nif"),
+                       os.path.join(top, "b.nif"))
+        except (OSError, NotImplementedError):
+            # no symlinks on this platform
+            return
+        nose.tools.assert_equals(
+            [filename for filename, size in walk_sizes(top)],
+            list(walk(top)))
+        nose.tools.assert_equals(len(list(walk_sizes(top))), 2)
+    finally:
+        shutil.rmtree(top)